@@ -0,0 +1,101 @@
+import json
+import threading
+from collections import OrderedDict
+from fastapi import Response
+
+# Every cache registers itself here so /api/health/cache can report on all of them
+caches = {}
+
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU map with hit/miss/eviction counters.
+
+    Caches live in one worker process, so writes must invalidate them from
+    the same process. Readers take `generation()` before querying and pass
+    it to `set()`. If any invalidation ran in between, the possibly stale
+    value is dropped instead of being cached.
+    """
+
+    def __init__(self, name, max_size):
+        self.name = name
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        caches[name] = self
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def set(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def update(self, key, fn):
+        """Replace the entry for `key` (if cached) with `fn(entry)`. Values should be immutable, so readers never see a half-applied change."""
+        with self._lock:
+            self._generation += 1
+            if key in self._entries:
+                self._entries[key] = fn(self._entries[key])
+
+    def update_all(self, fn):
+        with self._lock:
+            self._generation += 1
+            for key, value in self._entries.items():
+                self._entries[key] = fn(value)
+
+    def invalidate(self, *keys):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+
+def encode_json(content):
+    """Serialize exactly as FastAPI's JSONResponse does, so cached and fresh bodies are byte-identical"""
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def json_body_response(body, response):
+    """Return an already-serialized JSON body, keeping headers dependencies set on `response` (e.g. ETag)"""
+    return Response(content=body, media_type="application/json", headers=dict(response.headers))
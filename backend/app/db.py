@@ -1,15 +1,349 @@
 import sqlite3
 import os
+import queue
+import threading
+import time
+import asyncio
+from collections import namedtuple
+from concurrent.futures import Future
+from contextlib import contextmanager
+from fastapi import HTTPException
 
 # Get the absolute path to the database file
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_NAME = os.path.join(BASE_DIR, "pickle.db")
+SCHEMA_PATH = os.path.join(BASE_DIR, "app", "schema.sql")
 
-def get_db():
-    conn = sqlite3.connect(DB_NAME)
+# Pool sizing - override with env vars when running more worker threads
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+# The routers issue well under a hundred distinct statements, so keep them all prepared
+STATEMENT_CACHE_SIZE = 256
+
+# Group commit - how long the writer waits to collect more writes into one transaction
+GROUP_COMMIT_WINDOW = float(os.getenv("DB_GROUP_COMMIT_MS", "2")) / 1000
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("DB_GROUP_COMMIT_MAX_BATCH", "64"))
+WRITE_TIMEOUT = float(os.getenv("DB_WRITE_TIMEOUT", "30"))
+
+# Applied once when a connection is opened. WAL lets readers keep working
+# against a snapshot while the writer thread holds the write lock.
+CONNECTION_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -8000",
+]
+
+
+def connect():
+    """Open a new connection with the app's row factory and pragmas applied"""
+    conn = sqlite3.connect(
+        DB_NAME,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
     conn.row_factory = sqlite3.Row
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
     return conn
 
-# Global connection for routes that use it
-db = sqlite3.connect(DB_NAME, check_same_thread=False)
-db.row_factory = sqlite3.Row
+
+def ensure_schema():
+    """Apply schema.sql - every statement is idempotent, so this also brings older databases up to date"""
+    conn = connect()
+    try:
+        with open(SCHEMA_PATH, 'r') as f:
+            conn.executescript(f.read())
+    finally:
+        conn.close()
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection frees up within the timeout"""
+
+
+class ConnectionPool:
+    """Bounded pool of reusable SQLite connections.
+
+    Connections are opened lazily up to `size`. Once the pool is full,
+    callers block for up to `timeout` seconds waiting for one to be released.
+    """
+
+    def __init__(self, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.size = size
+        self.timeout = timeout
+        # LIFO keeps the most recently used (warmest) connections in rotation
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+
+    def acquire(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._grow() or self._wait()
+
+        with self._lock:
+            self._checkouts += 1
+            self._in_use += 1
+        return conn
+
+    def release(self, conn):
+        with self._lock:
+            self._in_use -= 1
+
+        try:
+            # Never hand out a connection with a half-finished transaction
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+            }
+
+    def close(self):
+        """Close every idle connection (call on shutdown)"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def _grow(self):
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            self._created += 1
+
+        try:
+            return connect()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def _wait(self):
+        with self._lock:
+            self._waits += 1
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeout(f"No database connection available after {self.timeout}s")
+
+    def _discard(self, conn):
+        with self._lock:
+            self._created -= 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+WriteResult = namedtuple("WriteResult", ["lastrowid", "rowcount"])
+
+_STOP = object()
+
+
+def _statement(sql, params):
+    def op(conn):
+        cursor = conn.execute(sql, params)
+        return WriteResult(cursor.lastrowid, cursor.rowcount)
+    return op
+
+
+class Writer:
+    """Single writer thread that group-commits writes from every route.
+
+    Each operation is a callable taking the writer's connection. Operations
+    queued within `window` seconds of each other share one transaction; each
+    runs inside its own savepoint so a failing operation is rolled back and
+    reported to its caller without affecting the rest of the batch.
+    Operations must not call commit() or rollback() themselves.
+    """
+
+    def __init__(self, window=GROUP_COMMIT_WINDOW, max_batch=GROUP_COMMIT_MAX_BATCH):
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._operations = 0
+        self._batches = 0
+        self._largest_batch = 0
+        self._failed_commits = 0
+
+    def submit(self, fn):
+        """Queue `fn(conn)` and return a Future for its result"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((fn, future))
+        return future
+
+    def run(self, fn, timeout=WRITE_TIMEOUT):
+        """Queue `fn(conn)` and block until its batch commits"""
+        return self.submit(fn).result(timeout=timeout)
+
+    async def run_async(self, fn):
+        return await asyncio.wrap_future(self.submit(fn))
+
+    def execute(self, sql, params=()):
+        """Run a single write statement"""
+        return self.run(_statement(sql, params))
+
+    async def execute_async(self, sql, params=()):
+        return await self.run_async(_statement(sql, params))
+
+    def execute_all(self, statements):
+        """Run several (sql, params) statements atomically, in order"""
+        def op(conn):
+            results = []
+            for sql, params in statements:
+                cursor = conn.execute(sql, params)
+                results.append(WriteResult(cursor.lastrowid, cursor.rowcount))
+            return results
+        return self.run(op)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "operations": self._operations,
+                "batches": self._batches,
+                "largest_batch": self._largest_batch,
+                "failed_commits": self._failed_commits,
+            }
+
+    def close(self):
+        """Flush pending writes and stop the writer thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="sqlite-writer", daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        conn = connect()
+        # Transactions are managed explicitly below
+        conn.isolation_level = None
+
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._commit(conn, batch)
+
+        conn.close()
+
+    def _commit(self, conn, batch):
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT op")
+                try:
+                    result = fn(conn)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO op")
+                    conn.execute("RELEASE op")
+                    outcomes.append((future, None, e))
+                else:
+                    conn.execute("RELEASE op")
+                    outcomes.append((future, result, None))
+            conn.execute("COMMIT")
+        except Exception as e:
+            # Anything escaping here would end the writer thread, and every later caller would wait out WRITE_TIMEOUT
+            try:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            with self._lock:
+                self._failed_commits += 1
+            for fn, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        with self._lock:
+            self._operations += len(outcomes)
+            self._batches += 1
+            self._largest_batch = max(self._largest_batch, len(outcomes))
+
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+pool = ConnectionPool()
+writer = Writer()
+
+
+def get_db():
+    """FastAPI dependency - checks a connection out of the pool for one request"""
+    try:
+        conn = pool.acquire()
+    except PoolTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
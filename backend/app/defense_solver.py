@@ -0,0 +1,270 @@
+import heapq
+import itertools
+import os
+import time
+from typing import Dict, List, Optional
+from fastapi import HTTPException
+from pydantic import BaseModel, Field
+
+# The nine spots in app/Lineups/types.ts POSITIONS
+POSITIONS = ["C", "P", "1B", "3B", "2B", "SS", "LF", "CF", "RF"]
+BENCH = "BENCH"
+MAX_DEFENSE_PLAYERS = 20
+MAX_INNINGS = 12
+# Assignment solves one request may spend backtracking across innings before giving up
+MAX_DEFENSE_SOLVES = int(os.getenv("MAX_DEFENSE_SOLVES", "2000"))
+# Cost of a disallowed pairing; far above any sum of real scores, small enough to keep float arithmetic exact-ish
+FORBIDDEN = 1e9
+
+
+class FieldingPlayer(BaseModel):
+    player_id: int
+    # Fielding score per position the player can play; positions left out are not allowed
+    scores: Dict[str, float]
+
+
+class DefenseRequest(BaseModel):
+    players: List[FieldingPlayer]
+    innings: int = Field(1, ge=1, le=MAX_INNINGS)
+    # Most innings in a row a player may sit; no limit when omitted
+    max_consecutive_bench: Optional[int] = Field(None, ge=1)
+    # Most innings any one player may spend at a position, e.g. {"P": 2}
+    max_innings_at_position: Dict[str, int] = {}
+    # When set, the first inning's positions are written to this lineup's lineup_players rows
+    lineup_id: Optional[int] = None
+
+
+def hungarian(cost):
+    """Minimum-cost perfect matching on a square matrix; returns assignment[row] = column.
+
+    Shortest augmenting paths with row/column potentials, O(n^3).
+    """
+    n = len(cost)
+    u = [0.0] * (n + 1)
+    v = [0.0] * (n + 1)
+    match = [0] * (n + 1)  # match[column] = row, 1-based; 0 is the virtual start
+    way = [0] * (n + 1)
+
+    for row in range(1, n + 1):
+        match[0] = row
+        col0 = 0
+        minv = [float("inf")] * (n + 1)
+        used = [False] * (n + 1)
+        while True:
+            used[col0] = True
+            row0 = match[col0]
+            delta = float("inf")
+            col1 = 0
+            costs = cost[row0 - 1]
+            for col in range(1, n + 1):
+                if not used[col]:
+                    reduced = costs[col - 1] - u[row0] - v[col]
+                    if reduced < minv[col]:
+                        minv[col] = reduced
+                        way[col] = col0
+                    if minv[col] < delta:
+                        delta = minv[col]
+                        col1 = col
+            for col in range(n + 1):
+                if used[col]:
+                    u[match[col]] += delta
+                    v[col] -= delta
+                else:
+                    minv[col] -= delta
+            col0 = col1
+            if match[col0] == 0:
+                break
+        while col0:
+            col1 = way[col0]
+            match[col0] = match[col1]
+            col0 = col1
+
+    assignment = [0] * n
+    for col in range(1, n + 1):
+        assignment[match[col] - 1] = col - 1
+    return assignment
+
+
+def ranked_assignments(cost, labels, counter):
+    """Yield (cost, assignment) for `cost`'s feasible assignments, cheapest first (Murty's algorithm).
+
+    Two assignments count as the same when every row gets a column with the
+    same label, so with labels like "field"/"bench" each distinct choice of
+    bench is yielded once, with its best positions. Solutions with a
+    FORBIDDEN pairing are never yielded. `counter` is a one-item list
+    incremented per Hungarian solve, for the caller's search budget.
+    """
+    n = len(cost)
+
+    def solve(fixed, excluded):
+        counter[0] += 1
+        constrained = [
+            [FORBIDDEN if (i in fixed and labels[j] != fixed[i]) or (i, labels[j]) in excluded else cost[i][j]
+             for j in range(n)]
+            for i in range(n)
+        ]
+        assignment = hungarian(constrained)
+        if any(constrained[i][j] >= FORBIDDEN for i, j in enumerate(assignment)):
+            return None
+        return sum(cost[i][j] for i, j in enumerate(assignment)), assignment
+
+    heap = []
+    tie = itertools.count()
+    first = solve({}, frozenset())
+    if first is not None:
+        heapq.heappush(heap, (first[0], next(tie), first[1], {}, frozenset()))
+    while heap:
+        total, _, assignment, fixed, excluded = heapq.heappop(heap)
+        yield total, assignment
+        # Partition the rest of this subproblem: child k keeps the first k free rows' labels and changes row k's
+        free = [i for i in range(n) if i not in fixed]
+        child_fixed = dict(fixed)
+        for row in free:
+            child_excluded = excluded | {(row, labels[assignment[row]])}
+            child = solve(child_fixed, child_excluded)
+            if child is not None:
+                heapq.heappush(heap, (child[0], next(tie), child[1], dict(child_fixed), child_excluded))
+            child_fixed[row] = labels[assignment[row]]
+
+
+def solve_defense(request: DefenseRequest):
+    """Highest fielding score inning by inning, backtracking when a choice leaves a later inning stuck.
+
+    Each inning is an assignment problem: the nine positions plus one bench
+    seat per extra player, against the players. Rotation rules enter as
+    forbidden pairings, so a player who has sat `max_consecutive_bench`
+    innings in a row must take a position, and one who has reached a
+    position's cap can't be put there again.
+
+    Every inning takes its best assignment unless that leaves some later
+    inning with no valid one; then the search backs up and tries that
+    inning's next best, distinct choices of bench first and, with position
+    caps, other position maps for the same bench. When nothing has to be
+    undone this is one solve per inning. The search gives up after
+    MAX_DEFENSE_SOLVES solves.
+    """
+    players = request.players
+    if len(players) < len(POSITIONS):
+        raise HTTPException(status_code=400, detail=f"Need at least {len(POSITIONS)} players")
+    if len(players) > MAX_DEFENSE_PLAYERS:
+        raise HTTPException(status_code=400, detail=f"Too many players (max {MAX_DEFENSE_PLAYERS})")
+
+    ids = [p.player_id for p in players]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="Players must be unique")
+
+    for position in set(request.max_innings_at_position) | {pos for p in players for pos in p.scores}:
+        if position not in POSITIONS:
+            raise HTTPException(status_code=400, detail=f"Unknown position '{position}' (expected one of {POSITIONS})")
+
+    uncovered = [pos for pos in POSITIONS if not any(pos in p.scores for p in players)]
+    if uncovered:
+        raise HTTPException(status_code=400, detail=f"No player can play {uncovered}")
+
+    bench_limit = request.max_consecutive_bench
+    # Everyone plays at least once in any bench_limit + 1 innings in a row, nine at a time
+    if bench_limit is not None and request.innings > bench_limit and len(players) > len(POSITIONS) * (bench_limit + 1):
+        raise HTTPException(
+            status_code=400,
+            detail=f"{len(players)} players can't each sit at most {bench_limit} innings in a row with {len(POSITIONS)} positions"
+        )
+
+    caps = request.max_innings_at_position
+    for position, cap in caps.items():
+        coverable = sum(min(cap, request.innings) for p in players if position in p.scores)
+        if coverable < request.innings:
+            raise HTTPException(
+                status_code=400,
+                detail=f"{position} needs {request.innings} innings but its players can cover only {coverable} at {cap} each"
+            )
+
+    started = time.perf_counter()
+    seats = POSITIONS + [BENCH] * (len(players) - len(POSITIONS))
+    bench_labels = ["bench" if seat == BENCH else "field" for seat in seats]
+    solves = [0]
+
+    def inning_cost(sat_in_a_row, played):
+        cost = []
+        for i, player in enumerate(players):
+            row = []
+            for seat in seats:
+                if seat == BENCH:
+                    must_play = bench_limit is not None and sat_in_a_row[i] >= bench_limit
+                    row.append(FORBIDDEN if must_play else 0.0)
+                elif seat not in player.scores or played[i][seat] >= caps.get(seat, MAX_INNINGS):
+                    row.append(FORBIDDEN)
+                else:
+                    row.append(-player.scores[seat])
+            cost.append(row)
+        return cost
+
+    def choices(cost):
+        """An inning's assignments, best first: each choice of bench with its best positions,
+        then (with caps, where the positions matter later) that bench's other position maps"""
+        for _, by_bench in ranked_assignments(cost, bench_labels, solves):
+            yield by_bench
+            if not caps:
+                continue
+            on_bench = {i for i, seat in enumerate(by_bench) if seats[seat] == BENCH}
+            bench_fixed = [
+                [value if (seats[j] == BENCH) == (i in on_bench) else FORBIDDEN for j, value in enumerate(row)]
+                for i, row in enumerate(cost)
+            ]
+            alternatives = ranked_assignments(bench_fixed, seats, solves)
+            next(alternatives, None)  # the same map as by_bench
+            for _, assignment in alternatives:
+                yield assignment
+
+    schedule = []
+
+    def search(sat_in_a_row, played):
+        """True once every inning is assigned; False when no choice from here works"""
+        if len(schedule) == request.innings:
+            return True
+        for assignment in choices(inning_cost(sat_in_a_row, played)):
+            if solves[0] > MAX_DEFENSE_SOLVES:
+                raise HTTPException(
+                    status_code=400,
+                    detail="No valid assignment found for every inning within the search limit; try looser rotation rules"
+                )
+            next_sat = list(sat_in_a_row)
+            next_played = [dict(counts) for counts in played]
+            for i, seat_index in enumerate(assignment):
+                seat = seats[seat_index]
+                if seat == BENCH:
+                    next_sat[i] += 1
+                else:
+                    next_sat[i] = 0
+                    next_played[i][seat] += 1
+            schedule.append(assignment)
+            if search(next_sat, next_played):
+                return True
+            schedule.pop()
+        return False
+
+    if not search([0] * len(players), [dict.fromkeys(POSITIONS, 0) for _ in players]):
+        raise HTTPException(status_code=400, detail="No valid assignment for every inning under the rotation constraints")
+
+    innings = []
+    total = 0.0
+    for inning, assignment in enumerate(schedule, start=1):
+        positions = {}
+        score = 0.0
+        for i, seat_index in enumerate(assignment):
+            seat = seats[seat_index]
+            if seat != BENCH:
+                positions[seat] = ids[i]
+                score += players[i].scores[seat]
+        total += score
+        innings.append({
+            "inning": inning,
+            "positions": {pos: positions[pos] for pos in POSITIONS},
+            "bench": [ids[i] for i, seat_index in enumerate(assignment) if seats[seat_index] == BENCH],
+            "score": round(score, 4),
+        })
+
+    return {
+        "innings": innings,
+        "score": round(total, 4),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
@@ -0,0 +1,50 @@
+import hashlib
+import sqlite3
+from fastapi import Depends, HTTPException, Request, Response
+from app.db import get_db
+
+
+def table_versions(conn, tables):
+    placeholders = ", ".join("?" for _ in tables)
+    rows = conn.execute(
+        f"SELECT table_name, version FROM table_versions WHERE table_name IN ({placeholders}) ORDER BY table_name",
+        list(tables)
+    ).fetchall()
+    return [(row[0], row[1]) for row in rows]
+
+
+def compute_etag(versions, request):
+    """Strong ETag for a read whose result depends only on the tables in `versions` and the request URL"""
+    versions = ",".join(f"{name}:{version}" for name, version in versions)
+    key = f"{request.url.path}?{request.url.query}|{versions}"
+    return '"' + hashlib.sha1(key.encode()).hexdigest() + '"'
+
+
+def etag_matches(etag, if_none_match):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in [tag.strip() for tag in if_none_match.split(",")]
+
+
+def conditional_get(*tables):
+    """Route dependency: answer If-None-Match with 304 when none of `tables` changed.
+
+    The version lookup is a primary-key read on table_versions, so an
+    unchanged resource is answered without querying the data tables. It runs
+    before the handler's own reads, so a write landing in between can only
+    make the ETag older than the data - never newer - and the next request
+    simply misses. The versions are left on `request.state.table_versions`;
+    a handler that serves a cached body must key it by them (see
+    drill_cache), or a body cached before a write could go out under the
+    ETag from after it.
+    """
+    def check(request: Request, response: Response, conn: sqlite3.Connection = Depends(get_db)):
+        versions = table_versions(conn, tables)
+        request.state.table_versions = dict(versions)
+        etag = compute_etag(versions, request)
+        if etag_matches(etag, request.headers.get("if-none-match")):
+            raise HTTPException(status_code=304, headers={"ETag": etag})
+        response.headers["ETag"] = etag
+    return check
@@ -0,0 +1,147 @@
+import json
+import os
+from datetime import datetime
+from typing import List
+from fastapi import HTTPException
+from pydantic import BaseModel
+from app.db import writer
+from app.cache import LRUCache
+
+# Most ids one bulk request may touch
+MAX_BULK_FAVORITES = 500
+# Users whose favorite sets are held in memory at once
+FAVORITE_CACHE_USERS = int(os.getenv("FAVORITE_CACHE_USERS", "1024"))
+
+# kind -> (item table, favorites table, favorites column pointing at the item)
+FAVORITE_TABLES = {
+    "drills": ("drills", "drill_favorites", "drill_id"),
+    "equipment": ("equipment", "equipment_favorites", "equipment_id"),
+    "practice_plans": ("practice_plans", "practice_plan_favorites", "practice_plan_id"),
+}
+
+
+class FavoriteSets:
+    """Per-user favorite ids for every kind, loaded on first request and kept current by the favorite routes.
+
+    Each user's entry is a dict of frozensets that is replaced, never mutated,
+    so a reader can sort it without holding the lock. Routes must call
+    add/discard after their write commits.
+    """
+
+    def __init__(self, max_users=FAVORITE_CACHE_USERS):
+        self._cache = LRUCache("favorite_sets", max_users)
+
+    def get(self, conn, user_id):
+        """Sorted favorite ids per kind for `user_id`"""
+        sets = self._cache.get(user_id)
+        if sets is None:
+            generation = self._cache.generation()
+            sets = {
+                kind: frozenset(row[0] for row in conn.execute(
+                    f"SELECT {column} FROM {favorites_table} WHERE user_id = ?", (user_id,)
+                ))
+                for kind, (_, favorites_table, column) in FAVORITE_TABLES.items()
+            }
+            self._cache.set(user_id, sets, generation)
+        return {kind: sorted(ids) for kind, ids in sets.items()}
+
+    def add(self, user_id, kind, ids):
+        self._cache.update(user_id, lambda sets: {**sets, kind: sets[kind] | frozenset(ids)})
+
+    def discard(self, user_id, kind, ids):
+        self._cache.update(user_id, lambda sets: {**sets, kind: sets[kind] - frozenset(ids)})
+
+    def discard_item(self, kind, item_id):
+        """Drop a deleted item from every cached user"""
+        self._cache.update_all(
+            lambda sets: {**sets, kind: sets[kind] - {item_id}} if item_id in sets[kind] else sets
+        )
+
+
+favorite_sets = FavoriteSets()
+
+
+class BulkFavoriteRequest(BaseModel):
+    user_id: int
+    add: List[int] = []
+    remove: List[int] = []
+
+
+def bulk_update_favorites(kind, request):
+    """Apply a batch of favorites and unfavorites for one user in a single transaction.
+
+    Existence and current membership are each read with one set-based query,
+    then inserts and deletes go through executemany. Every requested id gets
+    an outcome:
+      add:    "added", "already_favorited" or "not_found"
+      remove: "removed" or "not_favorited"
+    """
+    if request.user_id <= 0:
+        raise HTTPException(status_code=400, detail="Invalid user ID")
+
+    add = list(dict.fromkeys(request.add))
+    remove = list(dict.fromkeys(request.remove))
+
+    if not add and not remove:
+        raise HTTPException(status_code=400, detail="Nothing to add or remove")
+
+    if len(add) + len(remove) > MAX_BULK_FAVORITES:
+        raise HTTPException(status_code=400, detail=f"Too many ids (max {MAX_BULK_FAVORITES} per request)")
+
+    both = set(add) & set(remove)
+    if both:
+        raise HTTPException(status_code=400, detail=f"Ids both added and removed: {sorted(both)}")
+
+    table, favorites_table, column = FAVORITE_TABLES[kind]
+    now = datetime.now().isoformat()
+
+    def op(conn):
+        existing = {row[0] for row in conn.execute(
+            f"SELECT id FROM {table} WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(add),)
+        )}
+        favorited = {row[0] for row in conn.execute(
+            f"""SELECT {column} FROM {favorites_table}
+                WHERE user_id = ? AND {column} IN (SELECT value FROM json_each(?))""",
+            (request.user_id, json.dumps(add + remove))
+        )}
+
+        results = []
+        to_add = []
+        for item_id in add:
+            if item_id not in existing:
+                status = "not_found"
+            elif item_id in favorited:
+                status = "already_favorited"
+            else:
+                status = "added"
+                to_add.append((request.user_id, item_id, now))
+            results.append({"id": item_id, "action": "add", "status": status})
+
+        to_remove = []
+        for item_id in remove:
+            if item_id in favorited:
+                status = "removed"
+                to_remove.append((request.user_id, item_id))
+            else:
+                status = "not_favorited"
+            results.append({"id": item_id, "action": "remove", "status": status})
+
+        conn.executemany(
+            f"INSERT INTO {favorites_table} (user_id, {column}, created_at) VALUES (?, ?, ?)",
+            to_add
+        )
+        conn.executemany(
+            f"DELETE FROM {favorites_table} WHERE user_id = ? AND {column} = ?",
+            to_remove
+        )
+        return results
+
+    results = writer.run(op)
+    favorite_sets.add(request.user_id, kind, [r["id"] for r in results if r["status"] == "added"])
+    favorite_sets.discard(request.user_id, kind, [r["id"] for r in results if r["status"] == "removed"])
+    return {
+        "added": sum(r["status"] == "added" for r in results),
+        "removed": sum(r["status"] == "removed" for r in results),
+        "results": results,
+    }
@@ -0,0 +1,45 @@
+import os
+import re
+from fastapi import HTTPException
+
+# Marks around matched terms in snippet() output
+SNIPPET_OPEN = "<b>"
+SNIPPET_CLOSE = "</b>"
+SNIPPET_TOKENS = 12
+# BM25 has to score every match before it can sort, so a term found in most rows costs a full pass.
+# Ranking is limited to the newest RANK_WINDOW matches to keep common terms as cheap as rare ones.
+RANK_WINDOW = int(os.getenv("FTS_RANK_WINDOW", "1000"))
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def match_expression(text):
+    """Turn free text into an FTS5 MATCH expression where every word is a prefix term.
+
+    Words are quoted so user input can never be parsed as FTS5 syntax
+    (AND/OR/NEAR, column filters, stray quotes).
+    """
+    terms = _TERM.findall(text)
+    if not terms:
+        raise HTTPException(status_code=400, detail="Search query must contain letters or numbers")
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def snippet_sql(table):
+    """snippet() over whichever column matched best"""
+    return f"snippet({table}, -1, '{SNIPPET_OPEN}', '{SNIPPET_CLOSE}', '…', {SNIPPET_TOKENS})"
+
+
+def rank_window(table, source, conditions, params):
+    """WHERE fragment and params restricting a search to the newest RANK_WINDOW rows it returns.
+
+    `source` and `conditions` are the search's own FROM and WHERE, MATCH and
+    filters alike, so the window counts only rows the search would return
+    and a filter can never empty it. FTS5 walks matches in rowid order
+    without scoring them, so finding the cut-off rowid is cheap. Searches
+    with fewer results than the window are ranked in full; beyond it, older
+    results are not ranked at all, however well they would score.
+    """
+    fragment = (f"{table}.rowid >= COALESCE((SELECT {table}.rowid FROM {source} WHERE {conditions} "
+                f"ORDER BY {table}.rowid DESC LIMIT 1 OFFSET ?), 0)")
+    return fragment, list(params) + [RANK_WINDOW - 1]
@@ -0,0 +1,117 @@
+import asyncio
+import os
+import httpx
+from fastapi import Request
+
+# Outbound connection pool, shared by every request in this worker
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+# Requests in flight to any one host - keeps one slow upstream from taking the whole pool
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "8"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+
+# Overridable so the routes can be pointed at a local stub server
+YOUTUBE_SEARCH_URL = os.getenv("YOUTUBE_SEARCH_URL", "https://www.googleapis.com/youtube/v3/search")
+GOOGLE_SEARCH_URL = os.getenv("GOOGLE_SEARCH_URL", "https://www.googleapis.com/customsearch/v1")
+
+
+class MeteredTransport(httpx.AsyncBaseTransport):
+    """Wraps the pooled transport with a per-host concurrency cap and connection reuse counters"""
+
+    def __init__(self, transport, max_per_host=HTTP_MAX_PER_HOST):
+        self._transport = transport
+        self._max_per_host = max_per_host
+        self._host_slots = {}
+        self._requests = 0
+        self._connections_opened = 0
+        self._tls_handshakes = 0
+        self._host_waits = 0
+        self._in_flight = 0
+
+    async def handle_async_request(self, request):
+        slots = self._host_slots.setdefault(request.url.host, asyncio.Semaphore(self._max_per_host))
+        if slots.locked():
+            self._host_waits += 1
+        await slots.acquire()
+
+        self._requests += 1
+        self._in_flight += 1
+        request.extensions = {**request.extensions, "trace": self._trace(request.extensions.get("trace"))}
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            self._done(slots)
+            raise
+
+        # The slot is held until the body is read or closed, not just until the headers arrive
+        response.stream = _ReleasingStream(response.stream, lambda: self._done(slots))
+        return response
+
+    def _trace(self, chained):
+        async def trace(event_name, info):
+            if event_name == "connection.connect_tcp.complete":
+                self._connections_opened += 1
+            elif event_name == "connection.start_tls.complete":
+                self._tls_handshakes += 1
+            if chained is not None:
+                await chained(event_name, info)
+        return trace
+
+    def _done(self, slots):
+        self._in_flight -= 1
+        slots.release()
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+    def stats(self):
+        return {
+            "requests": self._requests,
+            "connections_opened": self._connections_opened,
+            "connections_reused": self._requests - self._connections_opened,
+            "tls_handshakes": self._tls_handshakes,
+            "in_flight": self._in_flight,
+            "host_waits": self._host_waits,
+            "max_connections": HTTP_MAX_CONNECTIONS,
+            "max_keepalive": HTTP_MAX_KEEPALIVE,
+            "max_per_host": self._max_per_host,
+        }
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._release is not None:
+                self._release()
+                self._release = None
+
+
+def create_http_client(transport=None, max_per_host=HTTP_MAX_PER_HOST):
+    """Build the worker's outbound client; returns (client, its MeteredTransport), the second for stats().
+    Pass `transport` to swap out the network, e.g. in a check script."""
+    if transport is None:
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+    metered = MeteredTransport(transport, max_per_host)
+    return httpx.AsyncClient(transport=metered, timeout=HTTP_TIMEOUT), metered
+
+
+def get_http_client(request: Request) -> httpx.AsyncClient:
+    """FastAPI dependency for the client created in the app lifespan"""
+    return request.app.state.http_client
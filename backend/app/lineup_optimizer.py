@@ -0,0 +1,256 @@
+import heapq
+import itertools
+import time
+from decimal import Decimal, ROUND_HALF_UP
+from typing import List, Literal, Optional
+from fastapi import HTTPException
+from pydantic import BaseModel, Field
+
+# Same constants as app/Lineups/LineupAlgorithm.ts - keep the two in step
+EPS = 1e-9
+# Batting order weights for positions 1..9; later slots weigh 1.0
+BATTER_WEIGHTS = [1.05, 1.10, 1.12, 1.15, 1.08, 1.00, 0.95, 0.92, 0.97]
+MAX_LINEUP_SIZE = 15
+MAX_ROSTER_SIZE = 40
+# Most explicit candidate lineups one scoring request may send
+MAX_CANDIDATES = 10_000
+MAX_TOP_K = 100
+
+
+class PlayerStats(BaseModel):
+    obp: float = 0
+    slg: float = 0
+    ba: float = 0
+    rbi: float = 0
+    games: int = 0
+    qab: float = 0
+
+
+class RosterPlayer(BaseModel):
+    player_id: int
+    stats: PlayerStats = PlayerStats()
+
+
+class SlotLock(BaseModel):
+    player_id: int
+    batting_order: int
+
+
+class CandidateGenerator(BaseModel):
+    """Candidates derived from a base order instead of listed one by one.
+
+    swaps: every order with two slots of `base` exchanged
+    bench: every order with one player of `base` replaced by a roster player not in it
+    """
+    kind: Literal["swaps", "bench"]
+    base: List[int]
+
+
+class ScoreLineupsRequest(BaseModel):
+    players: List[RosterPlayer]
+    candidates: List[List[int]] = []
+    generate: Optional[CandidateGenerator] = None
+    top_k: int = Field(10, ge=1, le=MAX_TOP_K)
+
+
+def rcv(stats):
+    """Run-creation value, rounded to cents like the app's Number(x.toFixed(2))"""
+    raw = (0.35 * stats.obp + 0.25 * stats.slg + 0.15 * stats.ba
+           + (stats.rbi / stats.games if stats.games > 0 else 0) + 0.10 * stats.qab)
+    return float(Decimal(raw).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
+
+
+def slot_weight(slot):
+    """Weight of 0-based batting slot `slot`"""
+    return BATTER_WEIGHTS[slot] if slot < len(BATTER_WEIGHTS) else 1.0
+
+
+def optimize_lineup(players: List[RosterPlayer], lineup_size: Optional[int] = None, locked: List[SlotLock] = ()):
+    """Highest-scoring batting order, where a lineup scores sum(weight[slot] * rcv[player]).
+
+    Locked players are pinned to their slot; the remaining slots are filled
+    from the rest of the roster by branch-and-bound. Open slots are visited
+    heaviest first and candidates tried best-rcv first, and a branch is cut
+    when pairing the remaining weights and rcvs in sorted order (the most it
+    could still add) cannot beat the best lineup found so far.
+    """
+    if not players:
+        raise HTTPException(status_code=400, detail="Roster is empty")
+    if len(players) > MAX_ROSTER_SIZE:
+        raise HTTPException(status_code=400, detail=f"Too many players (max {MAX_ROSTER_SIZE})")
+
+    ids = [p.player_id for p in players]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="Roster lists a player more than once")
+
+    size = min(lineup_size or len(BATTER_WEIGHTS), len(players))
+    if size > MAX_LINEUP_SIZE:
+        raise HTTPException(status_code=400, detail=f"Lineup size cannot exceed {MAX_LINEUP_SIZE}")
+
+    scores = {p.player_id: rcv(p.stats) for p in players}
+
+    fixed = {}
+    for lock in locked:
+        if lock.player_id not in scores:
+            raise HTTPException(status_code=400, detail=f"Locked player {lock.player_id} is not on the roster")
+        if not 1 <= lock.batting_order <= size:
+            raise HTTPException(status_code=400, detail=f"Batting order must be between 1 and {size}")
+        if lock.batting_order - 1 in fixed:
+            raise HTTPException(status_code=400, detail=f"Slot {lock.batting_order} is locked more than once")
+        if lock.player_id in fixed.values():
+            raise HTTPException(status_code=400, detail=f"Player {lock.player_id} is locked to more than one slot")
+        fixed[lock.batting_order - 1] = lock.player_id
+
+    started = time.perf_counter()
+    open_slots = sorted((s for s in range(size) if s not in fixed), key=lambda s: -slot_weight(s))
+    weights = [slot_weight(s) for s in open_slots]
+    # Stable sort keeps roster order among equal rcvs, matching the app's tie-breaking
+    candidates = sorted((pid for pid in ids if pid not in fixed.values()), key=lambda pid: -scores[pid])
+    used = [False] * len(candidates)
+    chosen = [None] * len(open_slots)
+    best = {"score": -float("inf"), "order": None}
+
+    def bound(depth):
+        """Most the open slots from `depth` on can still add"""
+        total = 0.0
+        slot = depth
+        for i, pid in enumerate(candidates):
+            if slot == len(weights):
+                break
+            if not used[i]:
+                total += weights[slot] * scores[pid]
+                slot += 1
+        return total
+
+    def search(depth, score):
+        nodes_seen = 1
+        if depth == len(weights):
+            if score > best["score"] + EPS:
+                best["score"] = score
+                best["order"] = list(chosen)
+            return nodes_seen
+        if score + bound(depth) <= best["score"] + EPS:
+            return nodes_seen
+        for i, pid in enumerate(candidates):
+            if used[i]:
+                continue
+            used[i] = True
+            chosen[depth] = pid
+            nodes_seen += search(depth + 1, score + weights[depth] * scores[pid])
+            used[i] = False
+        return nodes_seen
+
+    locked_score = sum(slot_weight(s) * scores[pid] for s, pid in fixed.items())
+    nodes = search(0, locked_score)
+
+    order = dict(fixed)
+    order.update(zip(open_slots, best["order"]))
+    lineup = [
+        {"batting_order": s + 1, "player_id": order[s], "rcv": scores[order[s]], "weight": slot_weight(s)}
+        for s in range(size)
+    ]
+    in_lineup = set(order.values())
+    return {
+        "lineup": lineup,
+        "bench": [pid for pid in ids if pid not in in_lineup],
+        "score": round(best["score"], 4),
+        "reason": "branch-and-bound",
+        "nodes": nodes,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
+
+
+def check_order(order, scores):
+    if not order or len(order) > MAX_LINEUP_SIZE:
+        raise HTTPException(status_code=400, detail=f"A lineup needs 1 to {MAX_LINEUP_SIZE} players")
+    unknown = [player_id for player_id in order if player_id not in scores]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Players not on the roster: {unknown}")
+    if len(set(order)) != len(order):
+        raise HTTPException(status_code=400, detail=f"Lineup {order} lists a player more than once")
+
+
+def lineup_score(order, scores):
+    return sum(slot_weight(s) * scores[player_id] for s, player_id in enumerate(order))
+
+
+def generated_candidates(generate, scores):
+    """Yield (score, build) for every order the generator describes, where build() returns the order.
+
+    Each candidate differs from the base in one or two slots, so its score is
+    the base score plus that difference - O(1) per candidate - and the order
+    itself is only built for the ones that make the top k.
+    """
+    base = generate.base
+    base_score = lineup_score(base, scores)
+
+    if generate.kind == "swaps":
+        for i, j in itertools.combinations(range(len(base)), 2):
+            a, b = scores[base[i]], scores[base[j]]
+            delta = (slot_weight(i) - slot_weight(j)) * (b - a)
+
+            def build(i=i, j=j):
+                order = list(base)
+                order[i], order[j] = order[j], order[i]
+                return order
+            yield base_score + delta, build
+    else:
+        in_base = set(base)
+        bench = [player_id for player_id in scores if player_id not in in_base]
+        for i, player_id in enumerate(base):
+            for substitute in bench:
+                delta = slot_weight(i) * (scores[substitute] - scores[player_id])
+
+                def build(i=i, substitute=substitute):
+                    order = list(base)
+                    order[i] = substitute
+                    return order
+                yield base_score + delta, build
+
+
+def score_lineups(request: ScoreLineupsRequest):
+    """Score many candidate batting orders with the RCV/batter-weight model and keep the best `top_k`.
+
+    Candidates stream through heapq.nlargest, so memory stays O(top_k)
+    however many the generator produces. Ties keep submission order.
+    """
+    if not request.players:
+        raise HTTPException(status_code=400, detail="Roster is empty")
+    if len(request.players) > MAX_ROSTER_SIZE:
+        raise HTTPException(status_code=400, detail=f"Too many players (max {MAX_ROSTER_SIZE})")
+    if not request.candidates and request.generate is None:
+        raise HTTPException(status_code=400, detail="Send candidates, a generator, or both")
+    if len(request.candidates) > MAX_CANDIDATES:
+        raise HTTPException(status_code=400, detail=f"Too many candidates (max {MAX_CANDIDATES})")
+
+    scores = {p.player_id: rcv(p.stats) for p in request.players}
+    if len(scores) != len(request.players):
+        raise HTTPException(status_code=400, detail="Roster lists a player more than once")
+
+    for order in request.candidates:
+        check_order(order, scores)
+
+    started = time.perf_counter()
+    streams = [((lineup_score(order, scores), lambda order=order: order) for order in request.candidates)]
+    result = {}
+    if request.generate is not None:
+        check_order(request.generate.base, scores)
+        result["base_score"] = round(lineup_score(request.generate.base, scores), 4)
+        streams.append(generated_candidates(request.generate, scores))
+
+    evaluated = 0
+
+    def keyed():
+        nonlocal evaluated
+        for index, (score, build) in enumerate(itertools.chain(*streams)):
+            evaluated = index + 1
+            yield score, -index, build
+
+    top = heapq.nlargest(request.top_k, keyed(), key=lambda entry: entry[:2])
+    result.update({
+        "evaluated": evaluated,
+        "top": [{"rank": rank, "order": build(), "score": round(score, 4)}
+                for rank, (score, _, build) in enumerate(top, start=1)],
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+    })
+    return result
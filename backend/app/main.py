@@ -1,12 +1,31 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from app.routes import users, teams, players, lineups, lineup_players, drills, practice_plans, equipment
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
+# Load environment variables from .env file - before the app modules, which read their settings at import
 load_dotenv()
 
-app = FastAPI(title="Pickle API")
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from app.routes import users, teams, players, lineups, lineup_players, drills, practice_plans, equipment, stats
+from app.db import pool, writer, ensure_schema
+from app.cache import caches
+from app.http_client import create_http_client
+from app.run_simulator import shutdown_pool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    ensure_schema()
+    # One pooled client per worker so outbound calls reuse keep-alive connections
+    app.state.http_client, app.state.http_transport = create_http_client()
+    yield
+    await app.state.http_client.aclose()
+    shutdown_pool()
+    writer.close()
+    pool.close()
+
+
+app = FastAPI(title="Pickle API", lifespan=lifespan)
 
 # Enable CORS - required for frontend to connect
 app.add_middleware(
@@ -15,6 +34,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Dropped-Pages"],
 )
 
 app.include_router(users.router, prefix="/api/users")
@@ -24,4 +44,23 @@ app.include_router(lineups.router, prefix="/api/lineups")
 app.include_router(lineup_players.router, prefix="/api/lineup_players")
 app.include_router(drills.router, prefix="/api/drills")
 app.include_router(practice_plans.router, prefix="/api/practice-plans")
-app.include_router(equipment.router, prefix="/api/equipment")
\ No newline at end of file
+app.include_router(equipment.router, prefix="/api/equipment")
+app.include_router(stats.router, prefix="/api/stats")
+
+
+@app.get("/api/health/db")
+def db_health():
+    """Connection pool and writer stats for monitoring"""
+    return {"pool": pool.stats(), "writer": writer.stats()}
+
+
+@app.get("/api/health/cache")
+def cache_health():
+    """Hit/miss counters for each response cache, for sizing and tuning them"""
+    return {name: cache.stats() for name, cache in caches.items()}
+
+
+@app.get("/api/health/http")
+def http_health():
+    """Outbound request and connection reuse counters for the shared HTTP client"""
+    return app.state.http_transport.stats()
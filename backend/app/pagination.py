@@ -0,0 +1,82 @@
+import base64
+import binascii
+import json
+from fastapi import HTTPException
+
+# Page size used when a client passes a cursor without a limit
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def encode_cursor(values):
+    """Pack the sort key of the last row on a page into an opaque token"""
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, size):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Only scalars bind as SQL parameters; anything else is a forged cursor
+    if (not isinstance(values, list) or len(values) != size
+            or not all(value is None or isinstance(value, (str, int, float)) for value in values)):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def is_paginated(limit, cursor):
+    """Pagination is opt-in so existing clients keep getting the full list"""
+    return limit is not None or cursor is not None
+
+
+def keyset(cursor, columns, descending=True):
+    """Build the WHERE fragment that seeks past `cursor` on `columns`.
+
+    `columns` must match the query's ORDER BY so the comparison lines up with
+    an index and each page is a seek rather than an OFFSET walk.
+    Returns ("", []) for the first page.
+    """
+    if cursor is None:
+        return "", []
+
+    values = decode_cursor(cursor, len(columns))
+    op = "<" if descending else ">"
+    placeholders = ", ".join("?" for _ in columns)
+    return f"({', '.join(columns)}) {op} ({placeholders})", values
+
+
+def page_size(limit):
+    return limit if limit is not None else DEFAULT_LIMIT
+
+
+def paged_query(query, params, order, limit, cursor, descending=True):
+    """Extend `query` with the seek, ORDER BY and LIMIT for one page.
+
+    `query` must already end in a WHERE clause ("WHERE 1=1" is fine). One
+    extra row is fetched so build_page can tell whether another page exists.
+    """
+    seek, values = keyset(cursor, order, descending)
+    if seek:
+        query += f" AND {seek}"
+
+    direction = " DESC" if descending else ""
+    query += " ORDER BY " + ", ".join(column + direction for column in order) + " LIMIT ?"
+    return query, list(params) + values + [page_size(limit) + 1]
+
+
+def build_page(rows, limit, key, serialize):
+    """Turn `limit + 1` fetched rows into a page and its next cursor.
+
+    `key(row)` returns the row's sort key values; `serialize(row)` its JSON shape.
+    """
+    limit = page_size(limit)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "items": [serialize(row) for row in rows],
+        "next_cursor": encode_cursor(key(rows[-1])) if has_more else None,
+    }
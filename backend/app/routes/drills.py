@@ -1,38 +1,58 @@
 from datetime import datetime
-from fastapi import APIRouter, HTTPException, Query, Body
+from fastapi import APIRouter, HTTPException, Query, Body, Depends, Request, Response
 from pydantic import BaseModel
 import sqlite3
 import os
-from typing import Optional
+from typing import Optional, Literal
 import httpx
-from app.db import DB_NAME
+from app.db import get_db, writer
+from app.pagination import MAX_LIMIT, is_paginated, paged_query, build_page
+from app.streaming import check_stream_args, stream_query
+from app.etag import conditional_get
+from app.cache import LRUCache, encode_json, json_body_response
+from app.search_cache import search_cache, cache_key, normalize_query
+from app.http_client import get_http_client, YOUTUBE_SEARCH_URL
+from app.fts import match_expression, snippet_sql, rank_window
+from app.favorites import BulkFavoriteRequest, bulk_update_favorites, favorite_sets
 
 router = APIRouter()
 
-def get_db_connection():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    return conn
+# Serialized catalog responses, keyed ("list", skill_focus or None, drills version) and
+# ("drill", id, drills version). The version is the one the request's ETag was built from and
+# is read before the body, so a cached body is never older than the ETag it is served with.
+drill_cache = LRUCache("drills", max_size=int(os.getenv("DRILL_CACHE_SIZE", "256")))
+
+
+def invalidate_drill_cache():
+    """Free the responses cached under older drills versions. Not needed for correctness - the
+    version in every key already retires them - so running after the commit is fine."""
+    drill_cache.clear()
 
 class FavoriteRequest(BaseModel):
     user_id: int
 
+def drill_to_dict(d):
+    return {
+        "id": d[0],
+        "title": d[1],
+        "description": d[2],
+        "skill_focus": d[3],
+        "video_url": d[4] if len(d) > 4 else None,
+        "created_at": d[5] if len(d) > 5 else None,
+        "created_by": d[6] if len(d) > 6 else None
+    }
+
 @router.post("/add")
 def add_drill(name: str, description: str = None):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    cursor.execute(
+    result = writer.execute(
         """
         INSERT INTO drills (title, description)
         VALUES (?, ?)
         """,
         (name, description)
     )
-
-    conn.commit()
-    drill_id = cursor.lastrowid
-    conn.close()
+    drill_id = result.lastrowid
+    invalidate_drill_cache()
 
     return {
         "id": drill_id,
@@ -41,38 +61,53 @@ def add_drill(name: str, description: str = None):
     }
 
 # GET /api/drills/favorites - must come before /{drill_id}
-@router.get("/favorites")
-def get_favorite_drills(user_id: int = Query(...)):
-    """Get all drills favorited by a user"""
-    conn = get_db_connection()
+@router.get("/favorites", dependencies=[Depends(conditional_get("drills", "drill_favorites"))])
+def get_favorite_drills(
+    user_id: int = Query(...),
+    limit: int = Query(None, ge=1, le=MAX_LIMIT),
+    page_cursor: str = Query(None, alias="cursor"),
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    """Get all drills favorited by a user, most recently favorited first"""
     cursor = conn.cursor()
 
-    cursor.execute(
-        """SELECT d.* FROM drills d
-           JOIN drill_favorites df ON d.id = df.drill_id
-           WHERE df.user_id = ?""",
-        (user_id,)
-    )
-    drills = cursor.fetchall()
-    conn.close()
-
-    return [
-        {
-            "id": d[0],
-            "title": d[1],
-            "description": d[2],
-            "skill_focus": d[3],
-            "video_url": d[4] if len(d) > 4 else None,
-            "created_at": d[5] if len(d) > 5 else None,
-            "created_by": d[6] if len(d) > 6 else None
-        }
-        for d in drills
-    ]
+    query = """SELECT d.*, df.created_at AS favorited_at, df.id AS favorite_id FROM drills d
+               JOIN drill_favorites df ON d.id = df.drill_id
+               WHERE df.user_id = ?"""
+    params = [user_id]
+    order = ["df.created_at", "df.id"]
+
+    if is_paginated(limit, page_cursor):
+        query, params = paged_query(query, params, order, limit, page_cursor)
+        cursor.execute(query, params)
+        return build_page(cursor.fetchall(), limit, lambda d: [d["favorited_at"], d["favorite_id"]], drill_to_dict)
+
+    query += " ORDER BY df.created_at DESC, df.id DESC"
+    cursor.execute(query, params)
+    return [drill_to_dict(d) for d in cursor.fetchall()]
+
+
+# POST /api/drills/favorites/bulk
+@router.post("/favorites/bulk")
+def bulk_favorite_drills(request: BulkFavoriteRequest):
+    """Favorite and unfavorite many drills for a user in one transaction"""
+    try:
+        return bulk_update_favorites("drills", request)
+    except HTTPException:
+        raise
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
 # GET /api/drills/search/youtube - must come before /{drill_id}
 @router.get("/search/youtube")
-async def search_youtube_drills(query: str, max_results: int = 10):
+async def search_youtube_drills(
+    query: str,
+    max_results: int = 10,
+    client: httpx.AsyncClient = Depends(get_http_client),
+):
     """Search YouTube for baseball drills"""
     if not query or len(query.strip()) == 0:
         raise HTTPException(status_code=400, detail="Search query is required")
@@ -91,40 +126,45 @@ async def search_youtube_drills(query: str, max_results: int = 10):
             detail="YouTube API key not configured. Please set YOUTUBE_API_KEY environment variable."
         )
 
-    try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            response = await client.get(
-                "https://www.googleapis.com/youtube/v3/search",
-                params={
-                    "part": "snippet",
-                    "q": f"{query.strip()} baseball drill",
-                    "type": "video",
-                    "maxResults": max_results,
-                    "key": api_key
-                }
-            )
+    async def fetch_videos():
+        response = await client.get(
+            YOUTUBE_SEARCH_URL,
+            params={
+                "part": "snippet",
+                "q": f"{query.strip()} baseball drill",
+                "type": "video",
+                "maxResults": max_results,
+                "key": api_key
+            }
+        )
+
+        if response.status_code == 403:
+            raise HTTPException(status_code=403, detail="YouTube API quota exceeded or invalid API key")
+        elif response.status_code != 200:
+            raise HTTPException(status_code=response.status_code, detail="YouTube API error")
+
+        data = response.json()
 
-            if response.status_code == 403:
-                raise HTTPException(status_code=403, detail="YouTube API quota exceeded or invalid API key")
-            elif response.status_code != 200:
-                raise HTTPException(status_code=response.status_code, detail="YouTube API error")
-
-            data = response.json()
-
-            if not data.get("items"):
-                return []
-
-            return [
-                {
-                    "video_id": item["id"]["videoId"],
-                    "title": item["snippet"]["title"][:255],
-                    "description": item["snippet"]["description"][:1000],
-                    "thumbnail": item["snippet"]["thumbnails"]["medium"]["url"],
-                    "channel_title": item["snippet"]["channelTitle"][:255]
-                }
-                for item in data.get("items", [])
-                if "videoId" in item.get("id", {})
-            ]
+        if not data.get("items"):
+            return []
+
+        return [
+            {
+                "video_id": item["id"]["videoId"],
+                "title": item["snippet"]["title"][:255],
+                "description": item["snippet"]["description"][:1000],
+                "thumbnail": item["snippet"]["thumbnails"]["medium"]["url"],
+                "channel_title": item["snippet"]["channelTitle"][:255]
+            }
+            for item in data.get("items", [])
+            if "videoId" in item.get("id", {})
+        ]
+
+    try:
+        key = cache_key("youtube", q=normalize_query(query), max_results=max_results)
+        return await search_cache.get_or_fetch(key, fetch_videos)
+    except HTTPException:
+        raise
     except httpx.TimeoutException:
         raise HTTPException(status_code=504, detail="YouTube search request timed out")
     except httpx.HTTPError as e:
@@ -133,14 +173,59 @@ async def search_youtube_drills(query: str, max_results: int = 10):
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+# GET /api/drills/search - must come before /{drill_id}
+@router.get("/search", dependencies=[Depends(conditional_get("drills"))])
+def search_drills(
+    q: str = Query(..., min_length=1, max_length=200),
+    skill_focus: str = None,
+    limit: int = Query(20, ge=1, le=MAX_LIMIT),
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    """Full-text search over drill titles and descriptions, best matches first"""
+    try:
+        source = "drills_fts JOIN drills d ON d.id = drills_fts.rowid"
+        conditions = "drills_fts MATCH ?"
+        params = [match_expression(q)]
+
+        if skill_focus:
+            valid_skills = ["hitting", "fielding", "pitching", "baserunning"]
+            if skill_focus.lower() not in valid_skills:
+                raise HTTPException(status_code=400, detail=f"Invalid skill focus. Must be one of: {', '.join(valid_skills)}")
+            conditions += " AND d.skill_focus = ?"
+            params.append(skill_focus.lower())
+
+        # The window repeats the filters so it holds the newest rows that match all of them
+        window, window_params = rank_window("drills_fts", source, conditions, params)
+        # rank is bm25 with the column weights configured in schema.sql; lower is better
+        query = f"""SELECT d.*, {snippet_sql("drills_fts")} AS snippet, rank FROM {source}
+                    WHERE {conditions} AND {window}
+                    ORDER BY rank LIMIT ?"""
+        params += window_params + [limit]
+
+        rows = conn.execute(query, params).fetchall()
+        return [{**drill_to_dict(d), "snippet": d["snippet"], "score": -d["rank"]} for d in rows]
+    except HTTPException:
+        raise
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
 # GET /api/drills (no param)
-@router.get("")
+@router.get("", dependencies=[Depends(conditional_get("drills"))])
 def list_drills(
+    request: Request,
+    response: Response,
     skill_focus: str = None,  # Optional filter by skill
+    limit: int = Query(None, ge=1, le=MAX_LIMIT),
+    page_cursor: str = Query(None, alias="cursor"),
+    stream: Optional[Literal["json", "ndjson"]] = None,
+    conn: sqlite3.Connection = Depends(get_db),
 ):
     """Get all drills, optionally filtered by skill focus"""
+    check_stream_args(stream, is_paginated(limit, page_cursor))
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
 
         query = "SELECT * FROM drills WHERE 1=1"
@@ -154,24 +239,25 @@ def list_drills(
             query += " AND skill_focus = ?"
             params.append(skill_focus.lower())
 
-        query += " ORDER BY created_at DESC"
+        if is_paginated(limit, page_cursor):
+            # Keyset on (created_at, id) so each page is an index seek
+            query, params = paged_query(query, params, ["created_at", "id"], limit, page_cursor)
+            cursor.execute(query, params)
+            return build_page(cursor.fetchall(), limit, lambda d: [d["created_at"], d["id"]], drill_to_dict)
 
-        cursor.execute(query, params)
-        drills = cursor.fetchall()
-        conn.close()
+        query += " ORDER BY created_at DESC, id DESC"
 
-        return [
-            {
-                "id": d[0],
-                "title": d[1],
-                "description": d[2],
-                "skill_focus": d[3],
-                "video_url": d[4] if len(d) > 4 else None,
-                "created_at": d[5] if len(d) > 5 else None,
-                "created_by": d[6] if len(d) > 6 else None
-            }
-            for d in drills
-        ]
+        if stream:
+            return stream_query(conn, query, params, drill_to_dict, stream)
+
+        key = ("list", skill_focus.lower() if skill_focus else None, request.state.table_versions["drills"])
+        body = drill_cache.get(key)
+        if body is None:
+            cursor.execute(query, params)
+            body = encode_json([drill_to_dict(d) for d in cursor.fetchall()])
+            drill_cache.set(key, body)
+
+        return json_body_response(body, response)
     except HTTPException:
         raise
     except sqlite3.Error as e:
@@ -188,23 +274,19 @@ def create_drill(
     user_id: int,
 ):
     """Create a new drill"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
+    result = writer.execute(
         """INSERT INTO drills (title, description, skill_focus, created_by, created_at)
            VALUES (?, ?, ?, ?, ?)""",
         (title, description, skill_focus, user_id, datetime.now().isoformat())
     )
-    conn.commit()
-    drill_id = cursor.lastrowid
-    conn.close()
+    drill_id = result.lastrowid
+    invalidate_drill_cache()
 
     return {"id": drill_id, "message": "Drill created successfully"}
 
 
 @router.post("/{drill_id}/favorite")
-def favorite_drill(drill_id: int, request: FavoriteRequest):
+def favorite_drill(drill_id: int, request: FavoriteRequest, conn: sqlite3.Connection = Depends(get_db)):
     """Add a drill to user's favorites"""
     if drill_id <= 0:
         raise HTTPException(status_code=400, detail="Invalid drill ID")
@@ -213,28 +295,24 @@ def favorite_drill(drill_id: int, request: FavoriteRequest):
         raise HTTPException(status_code=400, detail="Invalid user ID")
 
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
 
         # Check if drill exists
         cursor.execute("SELECT id FROM drills WHERE id = ?", (drill_id,))
         drill = cursor.fetchone()
         if not drill:
-            conn.close()
             raise HTTPException(status_code=404, detail="Drill not found")
 
         try:
-            cursor.execute(
+            writer.execute(
                 """INSERT INTO drill_favorites (user_id, drill_id, created_at)
                    VALUES (?, ?, ?)""",
                 (request.user_id, drill_id, datetime.now().isoformat())
             )
-            conn.commit()
-            conn.close()
+            favorite_sets.add(request.user_id, "drills", [drill_id])
             return {"message": "Drill favorited"}
         except sqlite3.IntegrityError:
             # Already favorited - return success anyway (idempotent operation)
-            conn.close()
             return {"message": "Drill favorited"}
     except HTTPException:
         raise
@@ -247,45 +325,40 @@ def favorite_drill(drill_id: int, request: FavoriteRequest):
 @router.delete("/{drill_id}/favorite")
 def unfavorite_drill(drill_id: int, user_id: int):
     """Remove a drill from user's favorites"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
+    writer.execute(
         """DELETE FROM drill_favorites
            WHERE user_id = ? AND drill_id = ?""",
         (user_id, drill_id)
     )
-    conn.commit()
-    conn.close()
+    favorite_sets.discard(user_id, "drills", [drill_id])
     return {"message": "Drill removed from favorites"}
 
 
 @router.delete("/{drill_id}")
-def delete_drill(drill_id: int):
+def delete_drill(drill_id: int, conn: sqlite3.Connection = Depends(get_db)):
     """Delete a drill permanently"""
     if drill_id <= 0:
         raise HTTPException(status_code=400, detail="Invalid drill ID")
 
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
 
         # Check if drill exists
-        cursor.execute("SELECT id FROM drills WHERE id = ?", (drill_id,))
-        if not cursor.fetchone():
-            conn.close()
+        cursor.execute("SELECT id, skill_focus FROM drills WHERE id = ?", (drill_id,))
+        drill = cursor.fetchone()
+        if not drill:
             raise HTTPException(status_code=404, detail="Drill not found")
 
-        # Delete from practice plan drills first
-        cursor.execute("DELETE FROM practice_plan_drills WHERE drill_id = ?", (drill_id,))
-
-        # Delete any favorites for this drill
-        cursor.execute("DELETE FROM drill_favorites WHERE drill_id = ?", (drill_id,))
-
-        # Delete the drill
-        cursor.execute("DELETE FROM drills WHERE id = ?", (drill_id,))
-        conn.commit()
-        conn.close()
+        writer.execute_all([
+            # Delete from practice plan drills first
+            ("DELETE FROM practice_plan_drills WHERE drill_id = ?", (drill_id,)),
+            # Delete any favorites for this drill
+            ("DELETE FROM drill_favorites WHERE drill_id = ?", (drill_id,)),
+            # Delete the drill
+            ("DELETE FROM drills WHERE id = ?", (drill_id,)),
+        ])
+        invalidate_drill_cache()
+        favorite_sets.discard_item("drills", drill_id)
 
         return {"message": "Drill deleted successfully"}
     except HTTPException:
@@ -327,17 +400,14 @@ async def create_drill_from_youtube(drill: CreateDrillRequest):
         raise HTTPException(status_code=400, detail="Invalid user ID")
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute(
+        # Await the writer so the event loop isn't blocked while the batch commits
+        result = await writer.execute_async(
             """INSERT INTO drills (title, description, skill_focus, created_by, created_at, video_url)
                VALUES (?, ?, ?, ?, ?, ?)""",
             (drill.title.strip(), drill.description, drill.skill_focus, drill.user_id, datetime.now().isoformat(), f"https://youtube.com/watch?v={drill.video_id.strip()}")
         )
-        conn.commit()
-        drill_id = cursor.lastrowid
-        conn.close()
+        drill_id = result.lastrowid
+        invalidate_drill_cache()
 
         return {"id": drill_id, "message": "Drill created successfully from YouTube video"}
     except sqlite3.Error as e:
@@ -355,10 +425,14 @@ def test_endpoint(data: TestRequest):
 
 
 # GET /api/drills/{drill_id} - must come last to avoid conflicts
-@router.get("/{drill_id}")
-def get_drill(drill_id: int):
+@router.get("/{drill_id}", dependencies=[Depends(conditional_get("drills"))])
+def get_drill(drill_id: int, request: Request, response: Response, conn: sqlite3.Connection = Depends(get_db)):
     """Get a single drill by its ID"""
-    conn = get_db_connection()
+    key = ("drill", drill_id, request.state.table_versions["drills"])
+    body = drill_cache.get(key)
+    if body is not None:
+        return json_body_response(body, response)
+
     cursor = conn.cursor()
 
     cursor.execute(
@@ -366,17 +440,10 @@ def get_drill(drill_id: int):
         (drill_id,)
     )
     drill = cursor.fetchone()
-    conn.close()
 
     if not drill:
         raise HTTPException(status_code=404, detail="Drill not found")
 
-    return {
-        "id": drill[0],
-        "title": drill[1],
-        "description": drill[2],
-        "skill_focus": drill[3],
-        "video_url": drill[4] if len(drill) > 4 else None,
-        "created_at": drill[5] if len(drill) > 5 else None,
-        "created_by": drill[6] if len(drill) > 6 else None
-    }
+    body = encode_json(drill_to_dict(drill))
+    drill_cache.set(key, body)
+    return json_body_response(body, response)
@@ -1,31 +1,61 @@
-from fastapi import APIRouter, HTTPException, Query, Body
+from fastapi import APIRouter, HTTPException, Query, Body, Depends, Response
 from pydantic import BaseModel
 import sqlite3
 from datetime import datetime
 import os
+import asyncio
 import httpx
-from typing import Optional
-from app.db import DB_NAME
+from typing import Optional, Literal
+from app.db import get_db, writer
+from app.pagination import MAX_LIMIT, is_paginated, paged_query, build_page
+from app.streaming import check_stream_args, stream_query
+from app.etag import conditional_get
+from app.search_cache import STALE_ON_STATUS, search_cache, cache_key, normalize_query
+from app.http_client import get_http_client, GOOGLE_SEARCH_URL
+from app.fts import match_expression, snippet_sql, rank_window
+from app.favorites import BulkFavoriteRequest, bulk_update_favorites, favorite_sets
 
 router = APIRouter()
 
+# Custom Search start indexes fetched per web search (10 results each)
+WEB_SEARCH_PAGES = [1, 11]
+# Seconds the web search waits for Google before answering with what it has
+WEB_SEARCH_BUDGET = float(os.getenv("WEB_SEARCH_BUDGET", "4"))
+
 class FavoriteRequest(BaseModel):
     user_id: int
 
-def get_db_connection():
-    conn = sqlite3.connect(DB_NAME)  
-    conn.row_factory = sqlite3.Row
-    return conn
-
-@router.get("")
-def list_equipment():
+def favorite_to_dict(e):
+    """Equipment row without the favorite's own sort columns"""
+    item = dict(e)
+    del item["favorited_at"], item["favorite_id"]
+    return item
+
+@router.get("", dependencies=[Depends(conditional_get("equipment"))])
+def list_equipment(
+    limit: int = Query(None, ge=1, le=MAX_LIMIT),
+    page_cursor: str = Query(None, alias="cursor"),
+    stream: Optional[Literal["json", "ndjson"]] = None,
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    check_stream_args(stream, is_paginated(limit, page_cursor))
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
 
-        cursor.execute("SELECT id, name as title, link, created_at FROM equipment ORDER BY created_at DESC")
+        query = "SELECT id, name as title, link, created_at FROM equipment WHERE 1=1"
+
+        if is_paginated(limit, page_cursor):
+            query, params = paged_query(query, [], ["created_at", "id"], limit, page_cursor)
+            cursor.execute(query, params)
+            return build_page(cursor.fetchall(), limit, lambda e: [e["created_at"], e["id"]], dict)
+
+        query += " ORDER BY created_at DESC, id DESC"
+
+        if stream:
+            return stream_query(conn, query, [], dict, stream)
+
+        cursor.execute(query)
         equipment = cursor.fetchall()
-        conn.close()
 
         return [dict(e) for e in equipment]
     except sqlite3.Error as e:
@@ -50,16 +80,11 @@ def create_equipment(equipment: CreateEquipmentRequest):
         raise HTTPException(status_code=400, detail="Equipment link is required")
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute(
+        result = writer.execute(
             "INSERT INTO equipment (name, link, created_at) VALUES (?, ?, ?)",
             (equipment.title.strip(), equipment.link.strip(), datetime.now().isoformat())
         )
-        conn.commit()
-        equipment_id = cursor.lastrowid
-        conn.close()
+        equipment_id = result.lastrowid
 
         return {"message": "Equipment added", "id": equipment_id}
     except sqlite3.Error as e:
@@ -68,8 +93,99 @@ def create_equipment(equipment: CreateEquipmentRequest):
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+# ORDER BY for each sort, with id as the tie-breaker so equal values come back in a stable order
+SEARCH_SORTS = {
+    "relevance": "rank",
+    "price_asc": "e.price ASC, e.id ASC",
+    "price_desc": "e.price DESC, e.id DESC",
+    "rating": "e.rating DESC, e.id DESC",
+    "newest": "e.created_at DESC, e.id DESC",
+}
+
+@router.get("/search", dependencies=[Depends(conditional_get("equipment"))])
+def search_equipment(
+    q: str = Query(None, max_length=200),
+    min_price: float = Query(None, ge=0),
+    max_price: float = Query(None, ge=0),
+    min_rating: float = Query(None, ge=0),
+    max_rating: float = Query(None, ge=0),
+    sort: Optional[Literal["relevance", "price_asc", "price_desc", "rating", "newest"]] = None,
+    limit: int = Query(20, ge=1, le=MAX_LIMIT),
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    """Search the local equipment catalog by text, price and rating, returning the top `limit` matches"""
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(status_code=400, detail="min_price cannot be greater than max_price")
+
+    if min_rating is not None and max_rating is not None and min_rating > max_rating:
+        raise HTTPException(status_code=400, detail="min_rating cannot be greater than max_rating")
+
+    text = q.strip() if q else None
+    sort = sort or ("relevance" if text else "rating")
+    if sort == "relevance" and not text:
+        raise HTTPException(status_code=400, detail="sort=relevance requires a search query")
+
+    try:
+        columns = "e.id, e.name AS title, e.description, e.link, e.price, e.where_to_buy, e.image_url, e.rating, e.created_at"
+
+        if text:
+            source = "equipment_fts JOIN equipment e ON e.id = equipment_fts.rowid"
+            conditions = "equipment_fts MATCH ?"
+            params = [match_expression(text)]
+        else:
+            source = "equipment e"
+            conditions = "1=1"
+            params = []
+
+        for clause, value in [("e.price >= ?", min_price), ("e.price <= ?", max_price),
+                              ("e.rating >= ?", min_rating), ("e.rating <= ?", max_rating)]:
+            if value is not None:
+                conditions += f" AND {clause}"
+                params.append(value)
+
+        # Unpriced items have no place in a price ordering (and would otherwise sort first ascending)
+        if sort.startswith("price") and min_price is None and max_price is None:
+            conditions += " AND e.price IS NOT NULL"
+
+        if text:
+            query = f"SELECT {columns}, {snippet_sql('equipment_fts')} AS snippet"
+            if sort == "relevance":
+                # Filters included, so sorting by relevance never changes which rows match
+                window, window_params = rank_window("equipment_fts", source, conditions, params)
+                query += f", rank FROM {source} WHERE {conditions} AND {window}"
+                params = params + window_params
+            else:
+                query += f" FROM {source} WHERE {conditions}"
+        else:
+            query = f"SELECT {columns} FROM {source} WHERE {conditions}"
+
+        # With LIMIT, SQLite keeps only the best `limit` rows while sorting, or stops early when an index supplies the order
+        query += f" ORDER BY {SEARCH_SORTS[sort]} LIMIT ?"
+        params.append(limit)
+
+        rows = conn.execute(query, params).fetchall()
+
+        results = []
+        for row in rows:
+            item = dict(row)
+            if "rank" in item:
+                item["score"] = -item.pop("rank")
+            results.append(item)
+        return results
+    except HTTPException:
+        raise
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
 @router.get("/search/web")
-async def search_equipment_web(query: str):
+async def search_equipment_web(
+    query: str,
+    response: Response,
+    client: httpx.AsyncClient = Depends(get_http_client),
+):
     """Search reputable sports equipment sites for baseball gear using Google Custom Search"""
     if not query or len(query.strip()) == 0:
         raise HTTPException(status_code=400, detail="Search query is required")
@@ -108,62 +224,96 @@ async def search_equipment_web(query: str):
         "bigfivestore.com"
     ]
 
+    # Build site restriction query to search only trusted sites
+    site_query = " OR ".join([f"site:{site}" for site in trusted_sites])
+    full_query = f"{search_term} baseball ({site_query})"
+
+    async def fetch_page(start_index):
+        response = await client.get(
+            GOOGLE_SEARCH_URL,
+            params={
+                "key": api_key,
+                "cx": search_engine_id,
+                "q": full_query,
+                "num": 10,
+                "start": start_index
+            }
+        )
+        if response.status_code != 200:
+            raise HTTPException(status_code=response.status_code, detail="Google search error")
+
+        page = []
+        for item in response.json().get("items", []):
+            # Extract domain from link
+            link = item.get("link", "")
+            display_link = item.get("displayLink", "")
+
+            # Verify the result is from a trusted site
+            is_trusted = any(trusted in display_link.lower() for trusted in trusted_sites)
+            if not is_trusted:
+                continue
+
+            page.append({
+                "title": item.get("title", ""),
+                "description": item.get("snippet", ""),
+                "link": link,
+                "display_link": display_link,
+                "image_url": item.get("pagemap", {}).get("cse_image", [{}])[0].get("src") if item.get("pagemap") else None
+            })
+        return page
+
+    async def fetch_google_results():
+        # Request every page at once and keep whatever arrives inside the budget
+        tasks = {start_index: asyncio.create_task(fetch_page(start_index)) for start_index in WEB_SEARCH_PAGES}
+        done, pending = await asyncio.wait(tasks.values(), timeout=WEB_SEARCH_BUDGET)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        found = []
+        dropped = []
+        statuses = []
+        for start_index, task in tasks.items():
+            if task in done and task.exception() is None:
+                found.extend(task.result())
+                continue
+
+            dropped.append(start_index)
+            if task not in done:
+                statuses.append(504)
+            elif isinstance(task.exception(), HTTPException):
+                statuses.append(task.exception().status_code)
+            else:
+                statuses.append(502)
+
+        # Nothing came back because upstream failed - raise so the empty result isn't cached. A quota
+        # status on any page wins, so the cache can serve a stale entry instead.
+        if not found and statuses:
+            status = next((s for s in statuses if s in STALE_ON_STATUS), statuses[0])
+            raise HTTPException(status_code=status, detail="Google search error",
+                                headers={"X-Dropped-Pages": ",".join(str(page) for page in dropped)})
+        return {"results": found, "dropped_pages": dropped}
+
     if api_key and search_engine_id:
         # Use Google Custom Search API for better results
         try:
-            # Build site restriction query to search only trusted sites
-            site_query = " OR ".join([f"site:{site}" for site in trusted_sites])
-            full_query = f"{search_term} baseball ({site_query})"
-
-            async with httpx.AsyncClient(timeout=15.0) as client:
-                # Make two API calls to get up to 20 results
-                for start_index in [1, 11]:
-                    try:
-                        response = await client.get(
-                            "https://www.googleapis.com/customsearch/v1",
-                            params={
-                                "key": api_key,
-                                "cx": search_engine_id,
-                                "q": full_query,
-                                "num": 10,
-                                "start": start_index
-                            }
-                        )
-
-                        if response.status_code == 200:
-                            data = response.json()
-                            items = data.get("items", [])
-
-                            for item in items:
-                                # Extract domain from link
-                                link = item.get("link", "")
-                                display_link = item.get("displayLink", "")
-
-                                # Verify the result is from a trusted site
-                                is_trusted = any(trusted in display_link.lower() for trusted in trusted_sites)
-                                if not is_trusted:
-                                    continue
-
-                                results.append({
-                                    "title": item.get("title", ""),
-                                    "description": item.get("snippet", ""),
-                                    "link": link,
-                                    "display_link": display_link,
-                                    "image_url": item.get("pagemap", {}).get("cse_image", [{}])[0].get("src") if item.get("pagemap") else None
-                                })
-                        elif response.status_code == 429:
-                            # Rate limited, break out of pagination loop
-                            break
-                    except Exception:
-                        continue
-
-                # If Google API returned results, return them
-                if results:
-                    return results
-
-        except Exception:
-            # Fall through to fallback method if Google API fails
-            pass
+            key = cache_key("equipment_web", q=normalize_query(search_term), pages=WEB_SEARCH_PAGES)
+            # Partial results are returned but not cached, so the next search retries the missing pages
+            search = await search_cache.get_or_fetch(key, fetch_google_results, cache_if=lambda s: not s["dropped_pages"])
+
+            if search["dropped_pages"]:
+                response.headers["X-Dropped-Pages"] = ",".join(str(page) for page in search["dropped_pages"])
+
+            # If Google API returned results, return them
+            if search["results"]:
+                return search["results"]
+
+        except Exception as e:
+            # Fall through to fallback method if Google API fails or the budget runs out,
+            # naming only the pages the failed search actually lost
+            dropped = (getattr(e, "headers", None) or {}).get("X-Dropped-Pages")
+            if dropped:
+                response.headers["X-Dropped-Pages"] = dropped
 
     # Fallback: Generate direct links to trusted retailer search pages
     fallback_sites = [
@@ -243,27 +393,47 @@ async def search_equipment_web(query: str):
     return results
 
 
-@router.get("/favorites")
-def get_favorite_equipment(user_id: int = Query(...)):
+@router.get("/favorites", dependencies=[Depends(conditional_get("equipment", "equipment_favorites"))])
+def get_favorite_equipment(
+    user_id: int = Query(...),
+    limit: int = Query(None, ge=1, le=MAX_LIMIT),
+    page_cursor: str = Query(None, alias="cursor"),
+    conn: sqlite3.Connection = Depends(get_db),
+):
     """Get all equipment favorited by a user"""
     if user_id <= 0:
         raise HTTPException(status_code=400, detail="Invalid user ID")
 
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
 
-        cursor.execute(
-            """SELECT e.* FROM equipment e
-               JOIN equipment_favorites ef ON e.id = ef.equipment_id
-               WHERE ef.user_id = ?
-               ORDER BY ef.created_at DESC""",
-            (user_id,)
-        )
+        query = """SELECT e.*, ef.created_at AS favorited_at, ef.id AS favorite_id FROM equipment e
+                   JOIN equipment_favorites ef ON e.id = ef.equipment_id
+                   WHERE ef.user_id = ?"""
+        params = [user_id]
+
+        if is_paginated(limit, page_cursor):
+            query, params = paged_query(query, params, ["ef.created_at", "ef.id"], limit, page_cursor)
+            cursor.execute(query, params)
+            return build_page(cursor.fetchall(), limit, lambda e: [e["favorited_at"], e["favorite_id"]], favorite_to_dict)
+
+        cursor.execute(query + " ORDER BY ef.created_at DESC, ef.id DESC", params)
         equipment = cursor.fetchall()
-        conn.close()
 
-        return [dict(e) for e in equipment]
+        return [favorite_to_dict(e) for e in equipment]
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.post("/favorites/bulk")
+def bulk_favorite_equipment(request: BulkFavoriteRequest):
+    """Favorite and unfavorite many equipment items for a user in one transaction"""
+    try:
+        return bulk_update_favorites("equipment", request)
+    except HTTPException:
+        raise
     except sqlite3.Error as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
@@ -271,7 +441,7 @@ def get_favorite_equipment(user_id: int = Query(...)):
 
 
 @router.post("/{equipment_id}/favorite")
-def favorite_equipment(equipment_id: int, request: FavoriteRequest):
+def favorite_equipment(equipment_id: int, request: FavoriteRequest, conn: sqlite3.Connection = Depends(get_db)):
     """Add equipment to user's favorites"""
     if equipment_id <= 0:
         raise HTTPException(status_code=400, detail="Invalid equipment ID")
@@ -280,26 +450,22 @@ def favorite_equipment(equipment_id: int, request: FavoriteRequest):
         raise HTTPException(status_code=400, detail="Invalid user ID")
 
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
 
         # Check if equipment exists
         cursor.execute("SELECT id FROM equipment WHERE id = ?", (equipment_id,))
         if not cursor.fetchone():
-            conn.close()
             raise HTTPException(status_code=404, detail="Equipment not found")
 
         try:
-            cursor.execute(
+            writer.execute(
                 "INSERT INTO equipment_favorites (user_id, equipment_id, created_at) VALUES (?, ?, ?)",
                 (request.user_id, equipment_id, datetime.now().isoformat())
             )
-            conn.commit()
-            conn.close()
+            favorite_sets.add(request.user_id, "equipment", [equipment_id])
             return {"message": "Equipment favorited"}
         except sqlite3.IntegrityError:
             # Already favorited - return success anyway (idempotent operation)
-            conn.close()
             return {"message": "Equipment favorited"}
     except HTTPException:
         raise
@@ -319,16 +485,12 @@ def unfavorite_equipment(equipment_id: int, user_id: int):
         raise HTTPException(status_code=400, detail="Invalid user ID")
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute(
+        result = writer.execute(
             "DELETE FROM equipment_favorites WHERE user_id = ? AND equipment_id = ?",
             (user_id, equipment_id)
         )
-        deleted_count = cursor.rowcount
-        conn.commit()
-        conn.close()
+        deleted_count = result.rowcount
+        favorite_sets.discard(user_id, "equipment", [equipment_id])
 
         if deleted_count == 0:
             raise HTTPException(status_code=404, detail="Favorite not found")
@@ -343,28 +505,26 @@ def unfavorite_equipment(equipment_id: int, user_id: int):
 
 
 @router.delete("/{equipment_id}")
-def delete_equipment(equipment_id: int):
+def delete_equipment(equipment_id: int, conn: sqlite3.Connection = Depends(get_db)):
     """Delete an equipment item permanently"""
     if equipment_id <= 0:
         raise HTTPException(status_code=400, detail="Invalid equipment ID")
 
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
 
         # Check if equipment exists
         cursor.execute("SELECT id FROM equipment WHERE id = ?", (equipment_id,))
         if not cursor.fetchone():
-            conn.close()
             raise HTTPException(status_code=404, detail="Equipment not found")
 
-        # Delete any favorites for this equipment first
-        cursor.execute("DELETE FROM equipment_favorites WHERE equipment_id = ?", (equipment_id,))
-
-        # Delete the equipment
-        cursor.execute("DELETE FROM equipment WHERE id = ?", (equipment_id,))
-        conn.commit()
-        conn.close()
+        writer.execute_all([
+            # Delete any favorites for this equipment first
+            ("DELETE FROM equipment_favorites WHERE equipment_id = ?", (equipment_id,)),
+            # Delete the equipment
+            ("DELETE FROM equipment WHERE id = ?", (equipment_id,)),
+        ])
+        favorite_sets.discard_item("equipment", equipment_id)
 
         return {"message": "Equipment deleted successfully"}
     except HTTPException:
@@ -1,25 +1,19 @@
 import sqlite3
-from fastapi import APIRouter
-from app.db import DB_NAME
+from fastapi import APIRouter, Depends
+from app.db import get_db, writer
 
 router = APIRouter()
 
 @router.post("/")
 def add_player_to_lineup(lineup_id: int, player_id: int, batting_order: int = None, field_position: str = None):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    cursor.execute(
+    result = writer.execute(
         """
         INSERT INTO lineup_players (lineup_id, player_id, batting_order, field_position)
         VALUES (?, ?, ?, ?)
         """,
         (lineup_id, player_id, batting_order, field_position)
     )
-
-    conn.commit()
-    lp_id = cursor.lastrowid
-    conn.close()
+    lp_id = result.lastrowid
 
     return {
         "id": lp_id,
@@ -30,8 +24,7 @@ def add_player_to_lineup(lineup_id: int, player_id: int, batting_order: int = No
     }
 
 @router.get("/{lineup_id}")
-def get_lineup_players(lineup_id: int):
-    conn = sqlite3.connect(DB_NAME)
+def get_lineup_players(lineup_id: int, conn: sqlite3.Connection = Depends(get_db)):
     cursor = conn.cursor()
 
     cursor.execute(
@@ -56,5 +49,4 @@ def get_lineup_players(lineup_id: int):
         } for row in cursor.fetchall()
     ]
 
-    conn.close()
     return result
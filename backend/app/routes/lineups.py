@@ -1,33 +1,308 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+import datetime
+import itertools
+import json
 import sqlite3
-from app.db import DB_NAME
+from typing import List, Optional, Literal
+from app.db import get_db, writer
+from app.lineup_optimizer import (
+    MAX_LINEUP_SIZE, RosterPlayer, ScoreLineupsRequest, SlotLock, optimize_lineup, score_lineups,
+)
+from app.run_simulator import SimulateRequest, simulate
+from app.defense_solver import POSITIONS, DefenseRequest, solve_defense
+from app.pagination import MAX_LIMIT, is_paginated, paged_query, build_page
+from app.streaming import check_stream_args, stream_query
 
 router = APIRouter()
 
+class OptimizeLineupRequest(BaseModel):
+    players: List[RosterPlayer]
+    lineup_size: Optional[int] = Field(None, ge=1, le=MAX_LINEUP_SIZE)
+    locked: List[SlotLock] = []
+    # When set, the result is saved as a new lineup for this team
+    team_id: Optional[int] = None
+    game_date: Optional[str] = None
+
+class LineupSlot(BaseModel):
+    player_id: int
+    batting_order: Optional[int] = Field(None, ge=1)
+    field_position: Optional[str] = None
+
+class CreateLineupRequest(BaseModel):
+    team_id: int
+    game_date: str
+    is_optimal: int = Field(0, ge=0, le=1)
+    players: List[LineupSlot]
+
+# Most player slots one lineup may hold
+MAX_LINEUP_PLAYERS = 30
+
 @router.post("/")
 def create_lineup(team_id: int, game_date: str, is_optimal: int = 0):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute(
+    result = writer.execute(
         "INSERT INTO lineups (team_id, game_date, is_optimal) VALUES (?, ?, ?)",
         (team_id, game_date, is_optimal)
     )
-    conn.commit()
-    lineup_id = cursor.lastrowid
-    conn.close()
+    lineup_id = result.lastrowid
     return {"id": lineup_id, "team_id": team_id, "game_date": game_date, "is_optimal": is_optimal}
 
+def lineup_to_dict(row):
+    return {"id": row[0], "team_id": row[1], "game_date": row[2], "is_optimal": row[3], "created_at": row[4]}
+
 @router.get("/")
-def list_lineups(team_id: int = None):
-    conn = sqlite3.connect(DB_NAME)
+def list_lineups(
+    team_id: int = None,
+    limit: int = Query(None, ge=1, le=MAX_LIMIT),
+    page_cursor: str = Query(None, alias="cursor"),
+    stream: Optional[Literal["json", "ndjson"]] = None,
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    check_stream_args(stream, is_paginated(limit, page_cursor))
     cursor = conn.cursor()
+    query = "SELECT id, team_id, game_date, is_optimal, created_at FROM lineups WHERE 1=1"
+    params = []
     if team_id:
-        cursor.execute("SELECT id, team_id, game_date, is_optimal, created_at FROM lineups WHERE team_id = ?", (team_id,))
-    else:
-        cursor.execute("SELECT id, team_id, game_date, is_optimal, created_at FROM lineups")
-    lineups = [
-        {"id": row[0], "team_id": row[1], "game_date": row[2], "is_optimal": row[3], "created_at": row[4]}
-        for row in cursor.fetchall()
-    ]
-    conn.close()
-    return lineups
+        query += " AND team_id = ?"
+        params.append(team_id)
+
+    if is_paginated(limit, page_cursor):
+        query, params = paged_query(query, params, ["id"], limit, page_cursor, descending=False)
+        cursor.execute(query, params)
+        return build_page(cursor.fetchall(), limit, lambda row: [row[0]], lineup_to_dict)
+
+    if stream:
+        return stream_query(conn, query + " ORDER BY id", params, lineup_to_dict, stream)
+
+    cursor.execute(query, params)
+    return [lineup_to_dict(row) for row in cursor.fetchall()]
+
+@router.get("/team/{team_id}")
+def get_team_lineups(
+    team_id: int,
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    """Every lineup for a team, oldest game first, each with its players in batting order.
+
+    One query: lineups are joined to their players and grouped back here.
+    `from` and `to` are inclusive game dates (YYYY-MM-DD).
+    """
+    query = "SELECT id, team_id, game_date, is_optimal, created_at FROM lineups WHERE team_id = ?"
+    params = [team_id]
+    if date_from:
+        query += " AND game_date >= ?"
+        params.append(date_from)
+    if date_to:
+        query += " AND game_date <= ?"
+        params.append(date_to)
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"""SELECT l.id, l.team_id, l.game_date, l.is_optimal, l.created_at,
+                       lp.id, lp.player_id, p.first_name, p.last_name, p.jersey_number, lp.field_position, lp.batting_order
+                FROM ({query}) l
+                LEFT JOIN lineup_players lp ON lp.lineup_id = l.id
+                LEFT JOIN players p ON p.id = lp.player_id
+                ORDER BY l.game_date, l.id, lp.batting_order, lp.id""",
+            params
+        )
+
+        lineups = []
+        for _, rows in itertools.groupby(cursor.fetchall(), key=lambda row: row[0]):
+            rows = list(rows)
+            lineup = lineup_to_dict(rows[0])
+            # A lineup with no players comes back as one row of NULL player columns
+            lineup["players"] = [
+                {
+                    "lineup_player_id": row[5],
+                    "player_id": row[6],
+                    "first_name": row[7],
+                    "last_name": row[8],
+                    "jersey_number": row[9],
+                    "field_position": row[10],
+                    "batting_order": row[11],
+                }
+                for row in rows if row[5] is not None
+            ]
+            lineups.append(lineup)
+        return lineups
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+def save_lineup(team_id, game_date, is_optimal, slots):
+    """Insert a lineup and its (player_id, batting_order, field_position) slots in one transaction.
+
+    Every player must be on `team_id`; the ones that aren't are named in a 400.
+    Returns the lineup id and the new lineup_players ids in slot order.
+    """
+    player_ids = [player_id for player_id, _, _ in slots]
+
+    def op(conn):
+        if conn.execute("SELECT 1 FROM teams WHERE id = ?", (team_id,)).fetchone() is None:
+            raise HTTPException(status_code=404, detail="Team not found")
+        on_team = {row[0] for row in conn.execute(
+            "SELECT id FROM players WHERE team_id = ? AND id IN (SELECT value FROM json_each(?))",
+            (team_id, json.dumps(player_ids))
+        )}
+        missing = [player_id for player_id in player_ids if player_id not in on_team]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Players not on team {team_id}: {missing}")
+
+        lineup_id = conn.execute(
+            "INSERT INTO lineups (team_id, game_date, is_optimal) VALUES (?, ?, ?)",
+            (team_id, game_date, is_optimal)
+        ).lastrowid
+        conn.executemany(
+            "INSERT INTO lineup_players (lineup_id, player_id, batting_order, field_position) VALUES (?, ?, ?, ?)",
+            [(lineup_id, *slot) for slot in slots]
+        )
+        slot_ids = dict(conn.execute(
+            "SELECT player_id, id FROM lineup_players WHERE lineup_id = ?", (lineup_id,)
+        ).fetchall())
+        return lineup_id, [slot_ids[player_id] for player_id in player_ids]
+
+    return writer.run(op)
+
+@router.post("/with-players")
+def create_lineup_with_players(request: CreateLineupRequest):
+    """Create a lineup and all of its player slots at once.
+
+    The players are checked against the team in one query and everything is
+    inserted in one transaction, so a failed request leaves nothing behind.
+    """
+    try:
+        datetime.date.fromisoformat(request.game_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="game_date must be a YYYY-MM-DD date")
+
+    slots = request.players
+    if not slots:
+        raise HTTPException(status_code=400, detail="A lineup needs at least one player")
+    if len(slots) > MAX_LINEUP_PLAYERS:
+        raise HTTPException(status_code=400, detail=f"Too many players (max {MAX_LINEUP_PLAYERS})")
+
+    for field, values in [
+        ("player_id", [slot.player_id for slot in slots]),
+        ("batting_order", [slot.batting_order for slot in slots if slot.batting_order is not None]),
+        # Only the nine field spots are one-player-only; bench and extra-hitter labels may repeat
+        ("field_position", [slot.field_position for slot in slots if slot.field_position in POSITIONS]),
+    ]:
+        seen = set()
+        repeated = sorted({value for value in values if value in seen or seen.add(value)})
+        if repeated:
+            raise HTTPException(status_code=400, detail=f"Duplicate {field} in lineup: {repeated}")
+
+    try:
+        lineup_id, slot_ids = save_lineup(
+            request.team_id, request.game_date, request.is_optimal,
+            [(slot.player_id, slot.batting_order, slot.field_position) for slot in slots]
+        )
+        return {
+            "id": lineup_id,
+            "team_id": request.team_id,
+            "game_date": request.game_date,
+            "is_optimal": request.is_optimal,
+            "players": [
+                {"lineup_player_id": slot_id, **slot.model_dump()}
+                for slot_id, slot in zip(slot_ids, slots)
+            ],
+        }
+    except HTTPException:
+        raise
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.post("/optimize")
+def optimize(request: OptimizeLineupRequest):
+    """Best batting order for a roster under the app's RCV/batter-weight model.
+
+    Slots in `locked` are kept as given. With `team_id` and `game_date` the
+    result is also stored as a lineup marked is_optimal.
+    """
+    if (request.team_id is None) != (request.game_date is None):
+        raise HTTPException(status_code=400, detail="team_id and game_date must be given together")
+
+    try:
+        result = optimize_lineup(request.players, request.lineup_size, request.locked)
+        if request.team_id is not None:
+            result["lineup_id"], _ = save_lineup(
+                request.team_id, request.game_date, 1,
+                [(slot["player_id"], slot["batting_order"], None) for slot in result["lineup"]]
+            )
+        return result
+    except HTTPException:
+        raise
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.post("/score")
+def score_candidates(request: ScoreLineupsRequest):
+    """Best `top_k` of many candidate batting orders under the RCV/batter-weight model"""
+    try:
+        return score_lineups(request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.post("/simulate")
+def simulate_orders(request: SimulateRequest):
+    """Monte Carlo expected runs per game for one or more batting orders, best first.
+
+    Pass `seed` to get the same numbers on every call.
+    """
+    try:
+        return simulate(request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+def save_field_positions(lineup_id, positions):
+    """Write {player_id: field_position or None} onto a lineup's lineup_players rows in one transaction"""
+    def op(conn):
+        if conn.execute("SELECT 1 FROM lineups WHERE id = ?", (lineup_id,)).fetchone() is None:
+            raise HTTPException(status_code=404, detail="Lineup not found")
+        in_lineup = {row[0] for row in conn.execute(
+            "SELECT player_id FROM lineup_players WHERE lineup_id = ? AND player_id IN (SELECT value FROM json_each(?))",
+            (lineup_id, json.dumps(list(positions)))
+        )}
+        missing = [player_id for player_id in positions if player_id not in in_lineup]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Players not in lineup {lineup_id}: {missing}")
+        conn.executemany(
+            "UPDATE lineup_players SET field_position = ? WHERE lineup_id = ? AND player_id = ?",
+            [(position, lineup_id, player_id) for player_id, position in positions.items()]
+        )
+        return len(positions)
+
+    return writer.run(op)
+
+@router.post("/defense")
+def assign_defense(request: DefenseRequest):
+    """Best field positions for each inning from per-position fielding scores.
+
+    With `lineup_id`, the first inning's positions (NULL for the bench) are
+    saved to that lineup's players.
+    """
+    try:
+        result = solve_defense(request)
+        if request.lineup_id is not None:
+            first = result["innings"][0]
+            positions = dict.fromkeys(first["bench"])
+            positions.update({player_id: position for position, player_id in first["positions"].items()})
+            result["updated"] = save_field_positions(request.lineup_id, positions)
+        return result
+    except HTTPException:
+        raise
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
@@ -1,33 +1,47 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Query
 import sqlite3
-from app.db import DB_NAME
+from typing import Optional, Literal
+from app.db import get_db, writer
+from app.pagination import MAX_LIMIT, is_paginated, paged_query, build_page
+from app.streaming import check_stream_args, stream_query
 
 router = APIRouter()
 
 @router.post("/")
 def create_player(team_id: int, first_name: str, last_name: str, jersey_number: int = None, position: str = None):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute(
+    result = writer.execute(
         "INSERT INTO players (team_id, first_name, last_name, jersey_number, position) VALUES (?, ?, ?, ?, ?)",
         (team_id, first_name, last_name, jersey_number, position)
     )
-    conn.commit()
-    player_id = cursor.lastrowid
-    conn.close()
+    player_id = result.lastrowid
     return {"id": player_id, "team_id": team_id, "first_name": first_name, "last_name": last_name, "jersey_number": jersey_number, "position": position}
 
+def player_to_dict(row):
+    return {"id": row[0], "team_id": row[1], "first_name": row[2], "last_name": row[3], "jersey_number": row[4], "position": row[5]}
+
 @router.get("/")
-def list_players(team_id: int = None):
-    conn = sqlite3.connect(DB_NAME)
+def list_players(
+    team_id: int = None,
+    limit: int = Query(None, ge=1, le=MAX_LIMIT),
+    page_cursor: str = Query(None, alias="cursor"),
+    stream: Optional[Literal["json", "ndjson"]] = None,
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    check_stream_args(stream, is_paginated(limit, page_cursor))
     cursor = conn.cursor()
+    query = "SELECT id, team_id, first_name, last_name, jersey_number, position FROM players WHERE 1=1"
+    params = []
     if team_id:
-        cursor.execute("SELECT id, team_id, first_name, last_name, jersey_number, position FROM players WHERE team_id = ?", (team_id,))
-    else:
-        cursor.execute("SELECT id, team_id, first_name, last_name, jersey_number, position FROM players")
-    players = [
-        {"id": row[0], "team_id": row[1], "first_name": row[2], "last_name": row[3], "jersey_number": row[4], "position": row[5]}
-        for row in cursor.fetchall()
-    ]
-    conn.close()
-    return players
+        query += " AND team_id = ?"
+        params.append(team_id)
+
+    if is_paginated(limit, page_cursor):
+        query, params = paged_query(query, params, ["id"], limit, page_cursor, descending=False)
+        cursor.execute(query, params)
+        return build_page(cursor.fetchall(), limit, lambda row: [row[0]], player_to_dict)
+
+    if stream:
+        return stream_query(conn, query + " ORDER BY id", params, player_to_dict, stream)
+
+    cursor.execute(query, params)
+    return [player_to_dict(row) for row in cursor.fetchall()]
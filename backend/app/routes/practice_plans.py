@@ -1,23 +1,46 @@
 import datetime
-from fastapi import APIRouter, HTTPException, Query, Body
+import itertools
+import json
+from fastapi import APIRouter, HTTPException, Query, Body, Depends
 from pydantic import BaseModel
 import sqlite3
-from app.db import DB_NAME
+from typing import List, Optional, Literal
+from app.db import get_db, writer
+from app.pagination import MAX_LIMIT, is_paginated, paged_query, build_page
+from app.etag import conditional_get
+from app.favorites import BulkFavoriteRequest, bulk_update_favorites, favorite_sets
 
 
 router = APIRouter()
 
-def get_db_connection():
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row
-    return conn
-
 class AddDrillRequest(BaseModel):
     order_number: int
 
 class FavoriteRequest(BaseModel):
     user_id: int
 
+class ReplaceDrillsRequest(BaseModel):
+    drill_ids: List[int]
+
+class DrillPlacement(BaseModel):
+    drill_id: int
+    position: Optional[int] = None  # 1-based; appended when omitted
+
+class PatchDrillsRequest(BaseModel):
+    remove: List[int] = []
+    insert: List[DrillPlacement] = []
+
+# Longest drill sequence a plan may hold
+MAX_PLAN_DRILLS = 200
+
+def plan_to_dict(plan):
+    return {
+        "id": plan[0],
+        "user_id": plan[1],
+        "name": plan[2],
+        "created_at": plan[3]
+    }
+
 
 @router.post("")
 def create_practice_plan(
@@ -25,17 +48,12 @@ def create_practice_plan(
     name: str,
 ):
     """Create a new practice plan"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
+    result = writer.execute(
         """INSERT INTO practice_plans (user_id, name, created_at)
            VALUES (?, ?, ?)""",
         (user_id, name, datetime.datetime.now().isoformat())
     )
-    conn.commit()
-    plan_id = cursor.lastrowid
-    conn.close()
+    plan_id = result.lastrowid
 
     return {"id": plan_id, "message": "Practice plan created"}
 
@@ -43,77 +61,246 @@ def create_practice_plan(
 def add_drill_to_plan(
     plan_id: int,
     drill_id: int,
-    request: AddDrillRequest
+    request: AddDrillRequest,
 ):
     """Add a drill to a practice plan"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
+    writer.execute(
         """INSERT INTO practice_plan_drills (practice_plan_id, drill_id, order_number)
            VALUES (?, ?, ?)""",
         (plan_id, drill_id, request.order_number)
     )
-    conn.commit()
-    conn.close()
     return {"message": "Drill added to practice plan"}
 
 
-@router.get("/user/{user_id}")
-def get_user_practice_plans(user_id: int):
-    """Get all practice plans for a specific user"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def duplicates(ids):
+    seen = set()
+    return sorted({i for i in ids if i in seen or seen.add(i)})
+
+
+def update_drill_sequence(plan_id, build):
+    """Rewrite a plan's drill sequence in one transaction.
+
+    `build(current)` gets the plan's drill ids in order and returns the new
+    sequence. The rows are rewritten with order_number 1..n, so gaps and ties
+    left by the single-drill endpoints are compacted away.
+    """
+    def op(conn):
+        if not conn.execute("SELECT id FROM practice_plans WHERE id = ?", (plan_id,)).fetchone():
+            raise HTTPException(status_code=404, detail="Practice plan not found")
+
+        current = [row[0] for row in conn.execute(
+            """SELECT drill_id FROM practice_plan_drills
+               WHERE practice_plan_id = ?
+               ORDER BY order_number, drill_id""",
+            (plan_id,)
+        )]
+        sequence = build(current)
+
+        if len(sequence) > MAX_PLAN_DRILLS:
+            raise HTTPException(status_code=400, detail=f"Too many drills (max {MAX_PLAN_DRILLS} per plan)")
+
+        # One set-based lookup for every drill new to the plan
+        new_ids = sorted(set(sequence) - set(current))
+        found = {row[0] for row in conn.execute(
+            "SELECT id FROM drills WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(new_ids),)
+        )}
+        missing = [i for i in new_ids if i not in found]
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Drills not found: {missing}")
+
+        conn.execute("DELETE FROM practice_plan_drills WHERE practice_plan_id = ?", (plan_id,))
+        conn.executemany(
+            "INSERT INTO practice_plan_drills (practice_plan_id, drill_id, order_number) VALUES (?, ?, ?)",
+            [(plan_id, drill_id, order) for order, drill_id in enumerate(sequence, start=1)]
+        )
+        return {"id": plan_id, "drill_ids": sequence, "duplicates_removed": duplicates(current)}
+
+    return writer.run(op)
+
+
+@router.put("/{plan_id}/drills")
+def replace_plan_drills(plan_id: int, request: ReplaceDrillsRequest):
+    """Replace a plan's whole drill sequence in one transaction"""
+    if plan_id <= 0:
+        raise HTTPException(status_code=400, detail="Invalid practice plan ID")
+
+    repeated = duplicates(request.drill_ids)
+    if repeated:
+        raise HTTPException(status_code=400, detail=f"Duplicate drills in sequence: {repeated}")
+
+    try:
+        return update_drill_sequence(plan_id, lambda current: list(request.drill_ids))
+    except HTTPException:
+        raise
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.patch("/{plan_id}/drills")
+def patch_plan_drills(plan_id: int, request: PatchDrillsRequest):
+    """Remove, insert and move drills in a plan in one transaction.
+
+    Removals apply first, then inserts in order. Inserting a drill already in
+    the plan moves it to the new position. Repeats of a drill already in the
+    plan are collapsed to its first occurrence.
+    """
+    if plan_id <= 0:
+        raise HTTPException(status_code=400, detail="Invalid practice plan ID")
+
+    inserted = [placement.drill_id for placement in request.insert]
+    repeated = duplicates(inserted)
+    if repeated:
+        raise HTTPException(status_code=400, detail=f"Duplicate drills in insert: {repeated}")
+
+    conflicting = sorted(set(inserted) & set(request.remove))
+    if conflicting:
+        raise HTTPException(status_code=400, detail=f"Drills both removed and inserted: {conflicting}")
 
+    def build(current):
+        sequence = list(dict.fromkeys(current))
+
+        not_in_plan = sorted(set(request.remove) - set(sequence))
+        if not_in_plan:
+            raise HTTPException(status_code=404, detail=f"Drills not in this practice plan: {not_in_plan}")
+        sequence = [drill_id for drill_id in sequence if drill_id not in set(request.remove)]
+
+        for placement in request.insert:
+            if placement.drill_id in sequence:
+                sequence.remove(placement.drill_id)
+            if placement.position is None:
+                sequence.append(placement.drill_id)
+            else:
+                sequence.insert(min(max(placement.position, 1), len(sequence) + 1) - 1, placement.drill_id)
+        return sequence
+
+    try:
+        return update_drill_sequence(plan_id, build)
+    except HTTPException:
+        raise
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+def expand_plans(cursor, plans_query, params, include):
+    """Run `plans_query` with every plan's drills joined on and group the rows back into plans.
+
+    One query regardless of how many plans there are. include="drills" adds
+    each plan's ordered drills; include="summary" adds only the drill count
+    and how many drills target each skill.
+    """
+    columns = "d.id, d.title, d.description, d.skill_focus" if include == "drills" else "d.id, d.skill_focus"
     cursor.execute(
-        "SELECT * FROM practice_plans WHERE user_id = ? ORDER BY created_at DESC",
-        (user_id,)
+        f"""SELECT p.id, p.user_id, p.name, p.created_at, {columns}
+            FROM ({plans_query}) p
+            LEFT JOIN practice_plan_drills ppd ON ppd.practice_plan_id = p.id
+            LEFT JOIN drills d ON d.id = ppd.drill_id
+            ORDER BY p.created_at DESC, p.id DESC, ppd.order_number, ppd.drill_id""",
+        params
     )
+
+    plans = []
+    for _, rows in itertools.groupby(cursor.fetchall(), key=lambda row: row[0]):
+        rows = list(rows)
+        plan = plan_to_dict(rows[0])
+        # A plan with no drills comes back as one row of NULL drill columns
+        drills = [row[4:] for row in rows if row[4] is not None]
+
+        if include == "drills":
+            plan["drills"] = [
+                {"id": d[0], "title": d[1], "description": d[2], "skill_focus": d[3]}
+                for d in drills
+            ]
+        else:
+            skill_mix = {}
+            for d in drills:
+                skill_mix[d[1]] = skill_mix.get(d[1], 0) + 1
+            plan["drill_count"] = len(drills)
+            plan["skill_mix"] = skill_mix
+        plans.append(plan)
+    return plans
+
+
+@router.get("/user/{user_id}", dependencies=[Depends(conditional_get("practice_plans", "practice_plan_drills", "drills"))])
+def get_user_practice_plans(
+    user_id: int,
+    include: Optional[Literal["drills", "summary"]] = None,
+    limit: int = Query(None, ge=1, le=MAX_LIMIT),
+    page_cursor: str = Query(None, alias="cursor"),
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    """Get all practice plans for a specific user, optionally with their drills or a drill summary"""
+    cursor = conn.cursor()
+
+    query = "SELECT * FROM practice_plans WHERE user_id = ?"
+    params = [user_id]
+    paginated = is_paginated(limit, page_cursor)
+
+    if paginated:
+        query, params = paged_query(query, params, ["created_at", "id"], limit, page_cursor)
+    else:
+        query += " ORDER BY created_at DESC, id DESC"
+
+    if include:
+        plans = expand_plans(cursor, query, params, include)
+        if paginated:
+            return build_page(plans, limit, lambda plan: [plan["created_at"], plan["id"]], lambda plan: plan)
+        return plans
+
+    cursor.execute(query, params)
     plans = cursor.fetchall()
-    conn.close()
-
-    return [
-        {
-            "id": plan[0],
-            "user_id": plan[1],
-            "name": plan[2],
-            "created_at": plan[3]
-        }
-        for plan in plans
-    ]
-
-
-@router.get("/favorites")
-def get_favorite_practice_plans(user_id: int = Query(...)):
-    """Get all practice plans favorited by a user"""
-    conn = get_db_connection()
+
+    if paginated:
+        return build_page(plans, limit, lambda plan: [plan["created_at"], plan["id"]], plan_to_dict)
+    return [plan_to_dict(plan) for plan in plans]
+
+
+@router.get("/favorites", dependencies=[Depends(conditional_get("practice_plans", "practice_plan_favorites"))])
+def get_favorite_practice_plans(
+    user_id: int = Query(...),
+    limit: int = Query(None, ge=1, le=MAX_LIMIT),
+    page_cursor: str = Query(None, alias="cursor"),
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    """Get all practice plans favorited by a user, most recently favorited first"""
     cursor = conn.cursor()
 
-    cursor.execute(
-        """SELECT p.* FROM practice_plans p
-           JOIN practice_plan_favorites pf ON p.id = pf.practice_plan_id
-           WHERE pf.user_id = ?
-           ORDER BY p.created_at DESC""",
-        (user_id,)
-    )
+    query = """SELECT p.*, pf.created_at AS favorited_at, pf.id AS favorite_id FROM practice_plans p
+               JOIN practice_plan_favorites pf ON p.id = pf.practice_plan_id
+               WHERE pf.user_id = ?"""
+    params = [user_id]
+
+    if is_paginated(limit, page_cursor):
+        query, params = paged_query(query, params, ["pf.created_at", "pf.id"], limit, page_cursor)
+        cursor.execute(query, params)
+        return build_page(cursor.fetchall(), limit, lambda p: [p["favorited_at"], p["favorite_id"]], plan_to_dict)
+
+    cursor.execute(query + " ORDER BY pf.created_at DESC, pf.id DESC", params)
     plans = cursor.fetchall()
-    conn.close()
 
-    return [
-        {
-            "id": p[0],
-            "user_id": p[1],
-            "name": p[2],
-            "created_at": p[3]
-        }
-        for p in plans
-    ]
+    return [plan_to_dict(p) for p in plans]
+
+
+@router.post("/favorites/bulk")
+def bulk_favorite_practice_plans(request: BulkFavoriteRequest):
+    """Favorite and unfavorite many practice plans for a user in one transaction"""
+    try:
+        return bulk_update_favorites("practice_plans", request)
+    except HTTPException:
+        raise
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
-@router.get("/{plan_id}")
-def get_practice_plan(plan_id: int):
+@router.get("/{plan_id}", dependencies=[Depends(conditional_get("practice_plans", "practice_plan_drills", "drills"))])
+def get_practice_plan(plan_id: int, conn: sqlite3.Connection = Depends(get_db)):
     """Get a practice plan with all its drills"""
-    conn = get_db_connection()
     cursor = conn.cursor()
 
     cursor.execute(
@@ -123,7 +310,6 @@ def get_practice_plan(plan_id: int):
     plan = cursor.fetchone()
 
     if not plan:
-        conn.close()
         raise HTTPException(status_code=404, detail="Practice plan not found")
 
     cursor.execute(
@@ -134,7 +320,6 @@ def get_practice_plan(plan_id: int):
         (plan_id,)
     )
     drills = cursor.fetchall()
-    conn.close()
 
     return {
         "id": plan[0],
@@ -154,7 +339,7 @@ def get_practice_plan(plan_id: int):
 
 
 @router.post("/{plan_id}/favorite")
-def favorite_practice_plan(plan_id: int, request: FavoriteRequest):
+def favorite_practice_plan(plan_id: int, request: FavoriteRequest, conn: sqlite3.Connection = Depends(get_db)):
     """Add a practice plan to user's favorites"""
     if plan_id <= 0:
         raise HTTPException(status_code=400, detail="Invalid practice plan ID")
@@ -163,27 +348,23 @@ def favorite_practice_plan(plan_id: int, request: FavoriteRequest):
         raise HTTPException(status_code=400, detail="Invalid user ID")
 
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
 
         # Check if plan exists
         cursor.execute("SELECT id FROM practice_plans WHERE id = ?", (plan_id,))
         plan = cursor.fetchone()
         if not plan:
-            conn.close()
             raise HTTPException(status_code=404, detail="Practice plan not found")
 
         try:
-            cursor.execute(
+            writer.execute(
                 """INSERT INTO practice_plan_favorites (user_id, practice_plan_id, created_at)
                    VALUES (?, ?, ?)""",
                 (request.user_id, plan_id, datetime.datetime.now().isoformat())
             )
-            conn.commit()
-            conn.close()
+            favorite_sets.add(request.user_id, "practice_plans", [plan_id])
             return {"message": "Practice plan favorited"}
         except sqlite3.IntegrityError:
-            conn.close()
             raise HTTPException(status_code=400, detail="Practice plan already favorited")
     except HTTPException:
         raise
@@ -196,45 +377,38 @@ def favorite_practice_plan(plan_id: int, request: FavoriteRequest):
 @router.delete("/{plan_id}/favorite")
 def unfavorite_practice_plan(plan_id: int, user_id: int):
     """Remove a practice plan from user's favorites"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
+    writer.execute(
         """DELETE FROM practice_plan_favorites
            WHERE user_id = ? AND practice_plan_id = ?""",
         (user_id, plan_id)
     )
-    conn.commit()
-    conn.close()
+    favorite_sets.discard(user_id, "practice_plans", [plan_id])
     return {"message": "Practice plan removed from favorites"}
 
 
 @router.delete("/{plan_id}")
-def delete_practice_plan(plan_id: int):
+def delete_practice_plan(plan_id: int, conn: sqlite3.Connection = Depends(get_db)):
     """Delete a practice plan permanently"""
     if plan_id <= 0:
         raise HTTPException(status_code=400, detail="Invalid practice plan ID")
 
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
 
         # Check if plan exists
         cursor.execute("SELECT id FROM practice_plans WHERE id = ?", (plan_id,))
         if not cursor.fetchone():
-            conn.close()
             raise HTTPException(status_code=404, detail="Practice plan not found")
 
-        # Delete drills associated with this plan
-        cursor.execute("DELETE FROM practice_plan_drills WHERE practice_plan_id = ?", (plan_id,))
-
-        # Delete any favorites for this plan
-        cursor.execute("DELETE FROM practice_plan_favorites WHERE practice_plan_id = ?", (plan_id,))
-
-        # Delete the practice plan
-        cursor.execute("DELETE FROM practice_plans WHERE id = ?", (plan_id,))
-        conn.commit()
-        conn.close()
+        writer.execute_all([
+            # Delete drills associated with this plan
+            ("DELETE FROM practice_plan_drills WHERE practice_plan_id = ?", (plan_id,)),
+            # Delete any favorites for this plan
+            ("DELETE FROM practice_plan_favorites WHERE practice_plan_id = ?", (plan_id,)),
+            # Delete the practice plan
+            ("DELETE FROM practice_plans WHERE id = ?", (plan_id,)),
+        ])
+        favorite_sets.discard_item("practice_plans", plan_id)
 
         return {"message": "Practice plan deleted successfully"}
     except HTTPException:
@@ -254,16 +428,11 @@ def remove_drill_from_plan(plan_id: int, drill_id: int):
         raise HTTPException(status_code=400, detail="Invalid drill ID")
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute(
+        result = writer.execute(
             "DELETE FROM practice_plan_drills WHERE practice_plan_id = ? AND drill_id = ?",
             (plan_id, drill_id)
         )
-        deleted_count = cursor.rowcount
-        conn.commit()
-        conn.close()
+        deleted_count = result.rowcount
 
         if deleted_count == 0:
             raise HTTPException(status_code=404, detail="Drill not found in this practice plan")
@@ -0,0 +1,312 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+import datetime
+import json
+import sqlite3
+import tempfile
+from typing import Literal, Optional
+from app.db import get_db, pool, writer
+from app.etag import conditional_get
+from app.pagination import MAX_LIMIT, is_paginated, paged_query, build_page
+from app.stat_lines import (
+    LEADERBOARD_STATS, STAT_COLUMNS, StatCounts, StatLine, check_stat_line, line_values, season_to_dict,
+)
+from app.stat_import import IMPORT_SPOOL_BYTES, MAX_IMPORT_BYTES, import_stat_csv
+
+router = APIRouter()
+
+LINE_COLUMNS = ", ".join(["id", "player_id", "game_date", "game_number", "season"] + STAT_COLUMNS)
+SEASON_COLUMNS = ", ".join(["player_id", "season", "games"] + STAT_COLUMNS)
+
+
+def line_to_dict(row):
+    return {
+        "id": row[0],
+        "player_id": row[1],
+        "game_date": row[2],
+        "game_number": row[3],
+        "season": row[4],
+        **dict(zip(STAT_COLUMNS, row[5:])),
+    }
+
+
+def checked_season(line):
+    try:
+        return check_stat_line(line)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/games")
+def add_stat_line(line: StatLine):
+    """Record one player's batting line for one game; the season rollup follows via triggers"""
+    season = checked_season(line)
+
+    def op(conn):
+        if conn.execute("SELECT 1 FROM players WHERE id = ?", (line.player_id,)).fetchone() is None:
+            raise HTTPException(status_code=404, detail="Player not found")
+        try:
+            return conn.execute(
+                f"""INSERT INTO player_game_stats (player_id, game_date, game_number, season, {", ".join(STAT_COLUMNS)})
+                    VALUES ({", ".join("?" for _ in range(4 + len(STAT_COLUMNS)))})""",
+                line_values(line, season)
+            ).lastrowid
+        except sqlite3.IntegrityError:
+            raise HTTPException(status_code=409, detail="A line for this player and game already exists")
+
+    try:
+        line_id = writer.run(op)
+        return {"id": line_id, "season": season, **line.model_dump()}
+    except HTTPException:
+        raise
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@router.put("/games/{line_id}")
+def update_stat_line(line_id: int, counts: StatCounts):
+    """Replace the counting stats of a game line"""
+    def op(conn):
+        row = conn.execute(
+            "SELECT player_id, game_date, game_number FROM player_game_stats WHERE id = ?", (line_id,)
+        ).fetchone()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Stat line not found")
+        line = StatLine(player_id=row[0], game_date=row[1], game_number=row[2], **counts.model_dump())
+        checked_season(line)
+        conn.execute(
+            f"UPDATE player_game_stats SET {', '.join(f'{c} = ?' for c in STAT_COLUMNS)} WHERE id = ?",
+            [getattr(line, c) for c in STAT_COLUMNS] + [line_id]
+        )
+        return line
+
+    try:
+        line = writer.run(op)
+        return {"id": line_id, **line.model_dump()}
+    except HTTPException:
+        raise
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@router.delete("/games/{line_id}")
+def delete_stat_line(line_id: int):
+    result = writer.execute("DELETE FROM player_game_stats WHERE id = ?", (line_id,))
+    if result.rowcount == 0:
+        raise HTTPException(status_code=404, detail="Stat line not found")
+    return {"message": "Stat line deleted"}
+
+
+@router.get("/games", dependencies=[Depends(conditional_get("player_game_stats"))])
+def list_stat_lines(
+    player_id: int,
+    season: int = None,
+    limit: int = Query(None, ge=1, le=MAX_LIMIT),
+    page_cursor: str = Query(None, alias="cursor"),
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    """A player's game lines, oldest first"""
+    cursor = conn.cursor()
+    query = f"SELECT {LINE_COLUMNS} FROM player_game_stats WHERE player_id = ?"
+    params = [player_id]
+    if season is not None:
+        query += " AND season = ?"
+        params.append(season)
+
+    if is_paginated(limit, page_cursor):
+        query, params = paged_query(query, params, ["id"], limit, page_cursor, descending=False)
+        cursor.execute(query, params)
+        return build_page(cursor.fetchall(), limit, lambda row: [row[0]], line_to_dict)
+
+    cursor.execute(query + " ORDER BY game_date, game_number", params)
+    return [line_to_dict(row) for row in cursor.fetchall()]
+
+
+@router.get("/players/{player_id}", dependencies=[Depends(conditional_get("player_game_stats"))])
+def get_player_seasons(player_id: int, season: int = None, conn: sqlite3.Connection = Depends(get_db)):
+    """Season totals and rates for a player, read from the rollup rather than summed from game lines"""
+    cursor = conn.cursor()
+    if season is not None:
+        cursor.execute(
+            f"SELECT {SEASON_COLUMNS} FROM player_season_stats WHERE player_id = ? AND season = ?",
+            (player_id, season)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            raise HTTPException(status_code=404, detail="No stats for this player and season")
+        return season_to_dict(row)
+
+    cursor.execute(
+        f"SELECT {SEASON_COLUMNS} FROM player_season_stats WHERE player_id = ? ORDER BY season",
+        (player_id,)
+    )
+    return [season_to_dict(row) for row in cursor.fetchall()]
+
+
+@router.get("/teams/{team_id}")
+def get_team_season(team_id: int, season: int, conn: sqlite3.Connection = Depends(get_db)):
+    """Season totals and rates for every player on a team who has stats that season"""
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""SELECT {", ".join(f"s.{c}" for c in ["player_id", "season", "games"] + STAT_COLUMNS)}
+            FROM players p
+            JOIN player_season_stats s ON s.player_id = p.id AND s.season = ?
+            WHERE p.team_id = ?
+            ORDER BY p.id""",
+        (season, team_id)
+    )
+    return [season_to_dict(row) for row in cursor.fetchall()]
+
+
+def leaderboard_value(stat, value):
+    if value is None:
+        return None
+    if stat in ("rbi", "hr"):
+        return value
+    return round(value, 2 if stat == "rcv" else 3)
+
+
+@router.get("/leaderboard")
+def get_leaderboard(
+    stat: Literal["ba", "obp", "slg", "qab", "rbi", "hr", "rcv"],
+    season: int,
+    team_id: Optional[int] = None,
+    limit: int = Query(10, ge=1, le=MAX_LIMIT),
+    min_pa: int = Query(0, ge=0),
+    player_id: Optional[int] = None,
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    """Top `limit` players for a stat in a season, league-wide or for one team.
+
+    Ordered by the stat, then plate appearances, then player id, all highest
+    first, straight off the stat's (season, stat, pa) index. With `player_id`
+    the response also carries that player's rank, counted along the same
+    index from the top down to them. Players with fewer than `min_pa` plate
+    appearances, or with no value (e.g. BA with no at-bats), are not ranked.
+    """
+    expression = LEADERBOARD_STATS[stat]
+    cursor = conn.cursor()
+    # The team form starts from the team's few players; the league form walks the stat index
+    if team_id is not None:
+        source = "players p JOIN player_season_stats ON player_id = p.id AND season = ? WHERE p.team_id = ?"
+        source_params = [season, team_id]
+    else:
+        source = "player_season_stats WHERE season = ?"
+        source_params = [season]
+
+    try:
+        cursor.execute(
+            f"""SELECT l.player_id, l.value, l.pa, p.first_name, p.last_name, p.team_id
+                FROM (SELECT player_id, {expression} AS value, pa FROM {source}
+                      AND {expression} IS NOT NULL AND pa >= ?
+                      ORDER BY {expression} DESC, pa DESC, player_id DESC LIMIT ?) l
+                LEFT JOIN players p ON p.id = l.player_id
+                ORDER BY l.value DESC, l.pa DESC, l.player_id DESC""",
+            source_params + [min_pa, limit]
+        )
+        leaders = [
+            {"rank": rank, "player_id": row[0], "value": leaderboard_value(stat, row[1]), "pa": row[2],
+             "first_name": row[3], "last_name": row[4], "team_id": row[5]}
+            for rank, row in enumerate(cursor.fetchall(), start=1)
+        ]
+        result = {"stat": stat, "season": season, "team_id": team_id, "leaders": leaders}
+
+        if player_id is not None:
+            cursor.execute(
+                f"SELECT {expression}, pa FROM {source} AND player_id = ?",
+                source_params + [player_id]
+            )
+            row = cursor.fetchone()
+            if row is None:
+                raise HTTPException(status_code=404, detail="No stats for this player and season" +
+                                    (" on this team" if team_id is not None else ""))
+            value, pa = row
+            rank = None
+            if value is not None and pa >= min_pa:
+                cursor.execute(
+                    f"""SELECT COUNT(*) FROM {source} AND pa >= ?
+                        AND {expression} >= ? AND ({expression}, pa, player_id) > (?, ?, ?)""",
+                    source_params + [min_pa, value, value, pa, player_id]
+                )
+                rank = cursor.fetchone()[0] + 1
+            result["player"] = {"player_id": player_id, "rank": rank, "value": leaderboard_value(stat, value), "pa": pa}
+
+        return result
+    except HTTPException:
+        raise
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+def team_exists(team_id):
+    with pool.connection() as conn:
+        return conn.execute("SELECT 1 FROM teams WHERE id = ?", (team_id,)).fetchone() is not None
+
+
+def closing_events(events, spool):
+    try:
+        for event in events:
+            yield json.dumps(event) + "\n"
+    finally:
+        spool.close()
+
+
+@router.post("/import")
+async def import_stats(
+    request: Request,
+    team_id: int,
+    game_date: str = None,
+    game_number: int = Query(1, ge=1),
+    create_players: bool = True,
+    progress: bool = False,
+):
+    """Import a GameChanger-style CSV sent as the raw request body (Content-Type: text/csv).
+
+    Each row becomes one game line for `team_id`, dated by the file's Date
+    column or `game_date`. Returns a summary with per-row errors; with
+    `progress=true` the response is NDJSON, one progress object per chunk
+    written, then the summary.
+    """
+    if game_date is not None:
+        try:
+            datetime.date.fromisoformat(game_date)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="game_date must be a YYYY-MM-DD date")
+    if not await run_in_threadpool(team_exists, team_id):
+        raise HTTPException(status_code=404, detail="Team not found")
+
+    # Spooled so a large file costs disk, not memory, and parsing never waits on the network
+    spool = tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES)
+    try:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > MAX_IMPORT_BYTES:
+                raise HTTPException(status_code=413, detail=f"CSV is larger than {MAX_IMPORT_BYTES} bytes")
+            spool.write(chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Request body is empty; send the CSV as the body")
+        spool.seek(0)
+
+        try:
+            events = await run_in_threadpool(import_stat_csv, spool, team_id, game_date, game_number, create_players)
+        except (ValueError, UnicodeDecodeError) as e:
+            raise HTTPException(status_code=400, detail=f"Unreadable CSV: {e}")
+    except BaseException:
+        spool.close()
+        raise
+
+    if progress:
+        return StreamingResponse(closing_events(events, spool), media_type="application/x-ndjson")
+
+    try:
+        summary = await run_in_threadpool(lambda: list(events)[-1])
+    except UnicodeDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Unreadable CSV: {e}")
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    finally:
+        spool.close()
+    del summary["type"]
+    return summary
@@ -1,30 +1,35 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Query
 import sqlite3
-from app.db import DB_NAME
+from app.db import get_db, writer
+from app.pagination import MAX_LIMIT, is_paginated, paged_query, build_page
 
 router = APIRouter()
 
 @router.post("/")
 def create_team(name: str, sport: str = None, age_group: str = None, coach_id: int = None):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute(
+    result = writer.execute(
         "INSERT INTO teams (name, sport, age_group, coach_id) VALUES (?, ?, ?, ?)",
         (name, sport, age_group, coach_id)
     )
-    conn.commit()
-    team_id = cursor.lastrowid
-    conn.close()
+    team_id = result.lastrowid
     return {"id": team_id, "name": name, "sport": sport, "age_group": age_group, "coach_id": coach_id}
 
+def team_to_dict(row):
+    return {"id": row[0], "name": row[1], "sport": row[2], "age_group": row[3], "coach_id": row[4]}
+
 @router.get("/")
-def list_teams():
-    conn = sqlite3.connect(DB_NAME)
+def list_teams(
+    limit: int = Query(None, ge=1, le=MAX_LIMIT),
+    page_cursor: str = Query(None, alias="cursor"),
+    conn: sqlite3.Connection = Depends(get_db),
+):
     cursor = conn.cursor()
-    cursor.execute("SELECT id, name, sport, age_group, coach_id FROM teams")
-    teams = [
-        {"id": row[0], "name": row[1], "sport": row[2], "age_group": row[3], "coach_id": row[4]}
-        for row in cursor.fetchall()
-    ]
-    conn.close()
-    return teams
+    query = "SELECT id, name, sport, age_group, coach_id FROM teams WHERE 1=1"
+
+    if is_paginated(limit, page_cursor):
+        query, params = paged_query(query, [], ["id"], limit, page_cursor, descending=False)
+        cursor.execute(query, params)
+        return build_page(cursor.fetchall(), limit, lambda row: [row[0]], team_to_dict)
+
+    cursor.execute(query)
+    return [team_to_dict(row) for row in cursor.fetchall()]
@@ -1,31 +1,47 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Query, HTTPException
 import sqlite3
-from app.db import DB_NAME
+from app.db import get_db, writer
+from app.pagination import MAX_LIMIT, is_paginated, paged_query, build_page
+from app.favorites import favorite_sets
 
 router = APIRouter()
 
 @router.post("/")
 def create_user(email: str, password_hash: str, first_name: str = None, last_name: str = None, role: str = None):
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-
-    cursor.execute(
+    result = writer.execute(
         "INSERT INTO users (email, password_hash, first_name, last_name, role) VALUES (?, ?, ?, ?, ?)",
         (email, password_hash, first_name, last_name, role)
     )
-    conn.commit()
-    user_id = cursor.lastrowid
-    conn.close()
+    user_id = result.lastrowid
     return {"id": user_id, "email": email, "first_name": first_name, "last_name": last_name, "role": role}
 
+def user_to_dict(row):
+    return {"id": row[0], "email": row[1], "first_name": row[2], "last_name": row[3], "role": row[4], "created_at": row[5]}
+
 @router.get("/")
-def list_users():
-    conn = sqlite3.connect(DB_NAME)
+def list_users(
+    limit: int = Query(None, ge=1, le=MAX_LIMIT),
+    page_cursor: str = Query(None, alias="cursor"),
+    conn: sqlite3.Connection = Depends(get_db),
+):
     cursor = conn.cursor()
-    cursor.execute("SELECT id, email, first_name, last_name, role, created_at FROM users")
-    users = [
-        {"id": row[0], "email": row[1], "first_name": row[2], "last_name": row[3], "role": row[4], "created_at": row[5]}
-        for row in cursor.fetchall()
-    ]
-    conn.close()
-    return users
+    query = "SELECT id, email, first_name, last_name, role, created_at FROM users WHERE 1=1"
+
+    if is_paginated(limit, page_cursor):
+        query, params = paged_query(query, [], ["id"], limit, page_cursor, descending=False)
+        cursor.execute(query, params)
+        return build_page(cursor.fetchall(), limit, lambda row: [row[0]], user_to_dict)
+
+    cursor.execute(query)
+    return [user_to_dict(row) for row in cursor.fetchall()]
+
+@router.get("/{user_id}/favorites")
+def get_user_favorite_ids(user_id: int, conn: sqlite3.Connection = Depends(get_db)):
+    """Ids of everything a user has favorited, as sorted arrays per kind - enough to draw the heart icons"""
+    if user_id <= 0:
+        raise HTTPException(status_code=400, detail="Invalid user ID")
+
+    try:
+        return {"user_id": user_id, **favorite_sets.get(conn, user_id)}
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -0,0 +1,265 @@
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import List, Optional
+from fastapi import HTTPException
+from pydantic import BaseModel, Field
+
+# Games per independently seeded chunk. Results depend only on the seed, never on how chunks are spread over workers.
+SIM_CHUNK_GAMES = 500
+MAX_SIM_GAMES = 100_000
+MAX_SIM_ORDERS = 50
+DEFAULT_INNINGS = 6
+# Most plate appearances one request may be expected to play, all orders together (a few million a second per core)
+MAX_SIM_PLATE_APPEARANCES = int(os.getenv("MAX_SIM_PLATE_APPEARANCES", str(30_000_000)))
+# Fewest outs per plate appearance, averaged over an order, worth simulating - below it nearly every
+# inning runs to the run cap
+MIN_ORDER_OUT_RATE = 0.05
+# Worker processes for large simulations; 0 runs everything in the calling thread
+SIM_WORKERS = int(os.getenv("SIM_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Smallest job (in expected plate appearances) worth shipping to the pool - below this, pickling
+# and process start-up cost more than they save
+SIM_POOL_MIN_PLATE_APPEARANCES = 1_000_000
+
+# Base-running assumptions. A runner's chance of taking the extra base grows with SPD (0-10).
+EXTRA_BASE_BASE = 0.2
+EXTRA_BASE_PER_SPD = 0.05
+# Chance a ball-in-play out with fewer than two outs moves every runner up a base
+PRODUCTIVE_OUT = 0.5
+# Runs after which an inning is called when there is no run rule. Every plate appearance is an
+# out, a run or a runner left on, so this also bounds an inning to MAX_INNING_RUNS + 6 plate
+# appearances - an order that almost never makes an out can't run for minutes.
+MAX_INNING_RUNS = 100
+
+
+class BattingStats(BaseModel):
+    """The raw counts from app/Lineups/strategies.md"""
+    pa: int = Field(..., ge=1)
+    h: int = Field(0, ge=0)
+    bb: int = Field(0, ge=0)
+    so: int = Field(0, ge=0)
+    xbh: int = Field(0, ge=0)
+    roe: int = Field(0, ge=0)
+    spd: float = Field(5, ge=0, le=10)
+
+
+class SimPlayer(BaseModel):
+    player_id: int
+    stats: BattingStats
+
+
+class SimulateRequest(BaseModel):
+    players: List[SimPlayer]
+    # Batting orders to compare, as player ids; defaults to the roster order
+    orders: Optional[List[List[int]]] = None
+    games: int = Field(2000, ge=1, le=MAX_SIM_GAMES)
+    innings: int = Field(DEFAULT_INNINGS, ge=1, le=12)
+    # Most runs a team may score in one inning (youth run rule); no cap when omitted
+    run_rule: Optional[int] = Field(None, ge=1)
+    # Fixed seed for repeatable results; a random one is chosen and returned when omitted
+    seed: Optional[int] = Field(None, ge=0)
+
+
+def rates(stats):
+    """Event thresholds for one batter: cumulative P(walk), P(XBH), P(single or ROE), P(strikeout), plus extra-base chance.
+
+    OBR = (H + BB + ROE) / PA; every XBH is played as a double; the rest
+    of the PA outcomes are balls in play that become outs.
+    """
+    if stats.h + stats.bb + stats.roe + stats.so > stats.pa:
+        raise ValueError("H + BB + ROE + SO exceeds PA")
+    if stats.xbh > stats.h:
+        raise ValueError("XBH exceeds H")
+    walk = stats.bb / stats.pa
+    double = walk + stats.xbh / stats.pa
+    single = double + (stats.h - stats.xbh + stats.roe) / stats.pa
+    strikeout = single + stats.so / stats.pa
+    return (walk, double, single, strikeout, EXTRA_BASE_BASE + EXTRA_BASE_PER_SPD * stats.spd)
+
+
+def out_rate(batters):
+    """Outs per plate appearance over an order, from rates() tuples: every PA past the single-or-ROE threshold is an out"""
+    return sum(1 - batter[2] for batter in batters) / len(batters)
+
+
+def expected_plate_appearances(batters, innings, run_rule, games):
+    """Rough plate appearances to play `games` games of an order: three outs an inning at its out rate,
+    no more than an inning capped at the run rule (or MAX_INNING_RUNS) can hold"""
+    cap = run_rule if run_rule is not None else MAX_INNING_RUNS
+    per_inning = min(3 / out_rate(batters), cap + 6)
+    return games * innings * per_inning
+
+
+def simulate_chunk(batters, innings, run_rule, seed, games):
+    """Play `games` games with one seeded generator; returns (total runs, total runs squared, plate appearances).
+
+    `batters` is the batting order as rates() tuples. Bases hold the runner's
+    extra-base chance, or None when empty.
+    """
+    rng = random.Random(seed).random
+    cap = run_rule if run_rule is not None else MAX_INNING_RUNS
+    n = len(batters)
+    total = total_sq = pas = 0
+
+    for _ in range(games):
+        runs = 0
+        up = 0
+        for _ in range(innings):
+            outs = inning_runs = 0
+            first = second = third = None
+            while outs < 3 and inning_runs < cap:
+                walk, double, single, strikeout, extra = batters[up]
+                up = up + 1 if up + 1 < n else 0
+                pas += 1
+                r = rng()
+                if r < walk:
+                    if first is not None:
+                        if second is not None:
+                            if third is not None:
+                                inning_runs += 1
+                            third = second
+                        second = first
+                    first = extra
+                elif r < double:
+                    inning_runs += (third is not None) + (second is not None)
+                    third = None
+                    if first is not None:
+                        if rng() < first:
+                            inning_runs += 1
+                        else:
+                            third = first
+                    second, first = extra, None
+                elif r < single:
+                    if third is not None:
+                        inning_runs += 1
+                        third = None
+                    if second is not None:
+                        if rng() < second:
+                            inning_runs += 1
+                        else:
+                            third = second
+                    second = None
+                    if first is not None:
+                        if third is None and rng() < first:
+                            third = first
+                        else:
+                            second = first
+                    first = extra
+                elif r < strikeout:
+                    outs += 1
+                else:
+                    if outs < 2 and rng() < PRODUCTIVE_OUT:
+                        if third is not None:
+                            inning_runs += 1
+                        first, second, third = None, first, second
+                    outs += 1
+            runs += min(inning_runs, cap)
+        total += runs
+        total_sq += runs * runs
+    return total, total_sq, pas
+
+
+_pool = None
+
+
+def get_pool():
+    global _pool
+    if _pool is None and SIM_WORKERS > 0:
+        # spawn, not fork: the server process has writer and pool threads a forked child would inherit half-held locks from
+        _pool = ProcessPoolExecutor(SIM_WORKERS, mp_context=get_context("spawn"))
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+def simulate(request: SimulateRequest):
+    """Expected runs per game and its variance for each batting order, best first.
+
+    Every order is played with the same seeds (common random numbers), so
+    differences between orders come from the order, not from luck.
+    """
+    by_id = {}
+    for player in request.players:
+        if player.player_id in by_id:
+            raise HTTPException(status_code=400, detail=f"Player {player.player_id} is listed more than once")
+        try:
+            by_id[player.player_id] = rates(player.stats)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Player {player.player_id}: {e}")
+
+    orders = request.orders or [[player.player_id for player in request.players]]
+    if not by_id:
+        raise HTTPException(status_code=400, detail="Roster is empty")
+    if len(orders) > MAX_SIM_ORDERS:
+        raise HTTPException(status_code=400, detail=f"Too many orders (max {MAX_SIM_ORDERS})")
+    for order in orders:
+        unknown = [player_id for player_id in order if player_id not in by_id]
+        if not order or unknown:
+            raise HTTPException(status_code=400, detail=f"Order {order} has players not on the roster: {unknown}")
+        if len(set(order)) != len(order):
+            raise HTTPException(status_code=400, detail=f"Order {order} lists a player more than once")
+        if out_rate([by_id[player_id] for player_id in order]) < MIN_ORDER_OUT_RATE:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Order {order} is too unlikely to make an out (under {MIN_ORDER_OUT_RATE:.0%} of plate appearances)"
+            )
+
+    work = sum(
+        expected_plate_appearances([by_id[player_id] for player_id in order], request.innings, request.run_rule,
+                                   request.games)
+        for order in orders
+    )
+    if work > MAX_SIM_PLATE_APPEARANCES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Simulation too large: about {round(work):,} plate appearances (max {MAX_SIM_PLATE_APPEARANCES:,}); "
+                   "use fewer games, orders or innings"
+        )
+
+    seed = request.seed if request.seed is not None else random.randrange(2 ** 32)
+    chunks = [(seed * 1_000_003 + i, min(SIM_CHUNK_GAMES, request.games - start))
+              for i, start in enumerate(range(0, request.games, SIM_CHUNK_GAMES))]
+    jobs = [([by_id[player_id] for player_id in order], request.innings, request.run_rule, chunk_seed, games)
+            for order in orders for chunk_seed, games in chunks]
+
+    started = time.perf_counter()
+    pool = get_pool() if work >= SIM_POOL_MIN_PLATE_APPEARANCES else None
+    if pool is not None:
+        outcomes = list(pool.map(simulate_chunk, *zip(*jobs)))
+    else:
+        outcomes = [simulate_chunk(*job) for job in jobs]
+    elapsed = time.perf_counter() - started
+
+    results = []
+    plate_appearances = 0
+    for i, order in enumerate(orders):
+        part = outcomes[i * len(chunks):(i + 1) * len(chunks)]
+        total = sum(o[0] for o in part)
+        total_sq = sum(o[1] for o in part)
+        plate_appearances += sum(o[2] for o in part)
+        mean = total / request.games
+        variance = (total_sq - total * mean) / (request.games - 1) if request.games > 1 else 0.0
+        results.append({
+            "order": order,
+            "expected_runs": round(mean, 4),
+            "variance": round(variance, 4),
+            "std_error": round((variance / request.games) ** 0.5, 4),
+        })
+    results.sort(key=lambda result: -result["expected_runs"])
+
+    return {
+        "seed": seed,
+        "games": request.games,
+        "innings": request.innings,
+        "results": results,
+        "plate_appearances": plate_appearances,
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "pa_per_second": round(plate_appearances / elapsed) if elapsed > 0 else None,
+    }
@@ -1,3 +1,4 @@
+-- Applied on every startup (app.db.ensure_schema), so every statement must be idempotent
 CREATE TABLE IF NOT EXISTS users (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     email TEXT UNIQUE NOT NULL,
@@ -114,3 +115,256 @@ CREATE TABLE IF NOT EXISTS equipment_favorites (
     FOREIGN KEY (equipment_id) REFERENCES equipment(id),
     UNIQUE(user_id, equipment_id)
 );
+
+-- Secondary indexes for the routers' lookups and sorts
+CREATE INDEX IF NOT EXISTS idx_players_team ON players(team_id);
+-- (team_id, game_date) serves both the team filter and a team's lineups by date; it replaces idx_lineups_team
+DROP INDEX IF EXISTS idx_lineups_team;
+CREATE INDEX IF NOT EXISTS idx_lineups_team_date ON lineups(team_id, game_date);
+CREATE INDEX IF NOT EXISTS idx_lineup_players_lineup ON lineup_players(lineup_id, batting_order);
+CREATE INDEX IF NOT EXISTS idx_drills_created ON drills(created_at);
+CREATE INDEX IF NOT EXISTS idx_drills_skill_created ON drills(skill_focus, created_at);
+CREATE INDEX IF NOT EXISTS idx_drill_favorites_drill ON drill_favorites(drill_id);
+CREATE INDEX IF NOT EXISTS idx_drill_favorites_user_created ON drill_favorites(user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_practice_plans_user_created ON practice_plans(user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_practice_plan_drills_plan ON practice_plan_drills(practice_plan_id, order_number, drill_id);
+CREATE INDEX IF NOT EXISTS idx_practice_plan_drills_drill ON practice_plan_drills(drill_id);
+CREATE INDEX IF NOT EXISTS idx_practice_plan_favorites_plan ON practice_plan_favorites(practice_plan_id);
+CREATE INDEX IF NOT EXISTS idx_practice_plan_favorites_user_created ON practice_plan_favorites(user_id, created_at);
+-- Covers list_equipment without touching the table
+CREATE INDEX IF NOT EXISTS idx_equipment_created ON equipment(created_at, name, link);
+CREATE INDEX IF NOT EXISTS idx_equipment_favorites_user_created ON equipment_favorites(user_id, created_at, equipment_id);
+CREATE INDEX IF NOT EXISTS idx_equipment_favorites_equipment ON equipment_favorites(equipment_id);
+
+-- Per-table change counters behind the ETags on list/detail reads, bumped by the triggers below
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+) WITHOUT ROWID;
+
+-- Counters start at a random value so a recreated database never reissues an ETag a client still holds
+INSERT OR IGNORE INTO table_versions (table_name, version) VALUES
+    ('drills', abs(random() % 1000000000)),
+    ('equipment', abs(random() % 1000000000)),
+    ('drill_favorites', abs(random() % 1000000000)),
+    ('equipment_favorites', abs(random() % 1000000000)),
+    ('practice_plans', abs(random() % 1000000000)),
+    ('practice_plan_drills', abs(random() % 1000000000)),
+    ('practice_plan_favorites', abs(random() % 1000000000));
+
+CREATE TRIGGER IF NOT EXISTS drills_version_insert AFTER INSERT ON drills
+BEGIN UPDATE table_versions SET version = version + 1 WHERE table_name = 'drills'; END;
+CREATE TRIGGER IF NOT EXISTS drills_version_update AFTER UPDATE ON drills
+BEGIN UPDATE table_versions SET version = version + 1 WHERE table_name = 'drills'; END;
+CREATE TRIGGER IF NOT EXISTS drills_version_delete AFTER DELETE ON drills
+BEGIN UPDATE table_versions SET version = version + 1 WHERE table_name = 'drills'; END;
+CREATE TRIGGER IF NOT EXISTS equipment_version_insert AFTER INSERT ON equipment
+BEGIN UPDATE table_versions SET version = version + 1 WHERE table_name = 'equipment'; END;
+CREATE TRIGGER IF NOT EXISTS equipment_version_update AFTER UPDATE ON equipment
+BEGIN UPDATE table_versions SET version = version + 1 WHERE table_name = 'equipment'; END;
+CREATE TRIGGER IF NOT EXISTS equipment_version_delete AFTER DELETE ON equipment
+BEGIN UPDATE table_versions SET version = version + 1 WHERE table_name = 'equipment'; END;
+CREATE TRIGGER IF NOT EXISTS drill_favorites_version_insert AFTER INSERT ON drill_favorites
+BEGIN UPDATE table_versions SET version = version + 1 WHERE table_name = 'drill_favorites'; END;
+CREATE TRIGGER IF NOT EXISTS drill_favorites_version_update AFTER UPDATE ON drill_favorites
+BEGIN UPDATE table_versions SET version = version + 1 WHERE table_name = 'drill_favorites'; END;
+CREATE TRIGGER IF NOT EXISTS drill_favorites_version_delete AFTER DELETE ON drill_favorites
+BEGIN UPDATE table_versions SET version = version + 1 WHERE table_name = 'drill_favorites'; END;
+CREATE TRIGGER IF NOT EXISTS equipment_favorites_version_insert AFTER INSERT ON equipment_favorites
+BEGIN UPDATE table_versions SET version = version + 1 WHERE table_name = 'equipment_favorites'; END;
+CREATE TRIGGER IF NOT EXISTS equipment_favorites_version_update AFTER UPDATE ON equipment_favorites
+BEGIN UPDATE table_versions SET version = version + 1 WHERE table_name = 'equipment_favorites'; END;
+CREATE TRIGGER IF NOT EXISTS equipment_favorites_version_delete AFTER DELETE ON equipment_favorites
+BEGIN UPDATE table_versions SET version = version + 1 WHERE table_name = 'equipment_favorites'; END;
+CREATE TRIGGER IF NOT EXISTS practice_plans_version_insert AFTER INSERT ON practice_plans
+BEGIN UPDATE table_versions SET version = version + 1 WHERE table_name = 'practice_plans'; END;
+CREATE TRIGGER IF NOT EXISTS practice_plans_version_update AFTER UPDATE ON practice_plans
+BEGIN UPDATE table_versions SET version = version + 1 WHERE table_name = 'practice_plans'; END;
+CREATE TRIGGER IF NOT EXISTS practice_plans_version_delete AFTER DELETE ON practice_plans
+BEGIN UPDATE table_versions SET version = version + 1 WHERE table_name = 'practice_plans'; END;
+CREATE TRIGGER IF NOT EXISTS practice_plan_drills_version_insert AFTER INSERT ON practice_plan_drills
+BEGIN UPDATE table_versions SET version = version + 1 WHERE table_name = 'practice_plan_drills'; END;
+CREATE TRIGGER IF NOT EXISTS practice_plan_drills_version_update AFTER UPDATE ON practice_plan_drills
+BEGIN UPDATE table_versions SET version = version + 1 WHERE table_name = 'practice_plan_drills'; END;
+CREATE TRIGGER IF NOT EXISTS practice_plan_drills_version_delete AFTER DELETE ON practice_plan_drills
+BEGIN UPDATE table_versions SET version = version + 1 WHERE table_name = 'practice_plan_drills'; END;
+CREATE TRIGGER IF NOT EXISTS practice_plan_favorites_version_insert AFTER INSERT ON practice_plan_favorites
+BEGIN UPDATE table_versions SET version = version + 1 WHERE table_name = 'practice_plan_favorites'; END;
+CREATE TRIGGER IF NOT EXISTS practice_plan_favorites_version_update AFTER UPDATE ON practice_plan_favorites
+BEGIN UPDATE table_versions SET version = version + 1 WHERE table_name = 'practice_plan_favorites'; END;
+CREATE TRIGGER IF NOT EXISTS practice_plan_favorites_version_delete AFTER DELETE ON practice_plan_favorites
+BEGIN UPDATE table_versions SET version = version + 1 WHERE table_name = 'practice_plan_favorites'; END;
+
+-- Responses from the YouTube / Google search APIs, kept past expiry so a throttled upstream can be answered stale
+CREATE TABLE IF NOT EXISTS search_cache (
+    cache_key TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_search_cache_expires ON search_cache(expires_at);
+
+-- Full-text index over drill titles and descriptions for /api/drills/search.
+-- External content: the text lives only in drills, and the triggers below keep the index in step with it.
+CREATE VIRTUAL TABLE IF NOT EXISTS drills_fts USING fts5(
+    title,
+    description,
+    content='drills',
+    content_rowid='id',
+    tokenize='porter unicode61',
+    prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS drills_fts_insert AFTER INSERT ON drills
+BEGIN INSERT INTO drills_fts (rowid, title, description) VALUES (new.id, new.title, new.description); END;
+CREATE TRIGGER IF NOT EXISTS drills_fts_delete AFTER DELETE ON drills
+BEGIN INSERT INTO drills_fts (drills_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description); END;
+CREATE TRIGGER IF NOT EXISTS drills_fts_update AFTER UPDATE OF title, description ON drills
+BEGIN
+    INSERT INTO drills_fts (drills_fts, rowid, title, description) VALUES ('delete', old.id, old.title, old.description);
+    INSERT INTO drills_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+END;
+
+-- Backfill drills that predate the index (only runs while the index is empty)
+INSERT INTO drills_fts (drills_fts) SELECT 'rebuild'
+WHERE NOT EXISTS (SELECT 1 FROM drills_fts_docsize) AND EXISTS (SELECT 1 FROM drills);
+
+-- Title matches outrank description matches in ORDER BY rank
+INSERT INTO drills_fts (drills_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)');
+
+-- Local equipment search: full-text over name and description, plus range filters on price and rating
+CREATE VIRTUAL TABLE IF NOT EXISTS equipment_fts USING fts5(
+    name,
+    description,
+    content='equipment',
+    content_rowid='id',
+    tokenize='porter unicode61',
+    prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS equipment_fts_insert AFTER INSERT ON equipment
+BEGIN INSERT INTO equipment_fts (rowid, name, description) VALUES (new.id, new.name, new.description); END;
+CREATE TRIGGER IF NOT EXISTS equipment_fts_delete AFTER DELETE ON equipment
+BEGIN INSERT INTO equipment_fts (equipment_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description); END;
+CREATE TRIGGER IF NOT EXISTS equipment_fts_update AFTER UPDATE OF name, description ON equipment
+BEGIN
+    INSERT INTO equipment_fts (equipment_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+    INSERT INTO equipment_fts (rowid, name, description) VALUES (new.id, new.name, new.description);
+END;
+
+INSERT INTO equipment_fts (equipment_fts) SELECT 'rebuild'
+WHERE NOT EXISTS (SELECT 1 FROM equipment_fts_docsize) AND EXISTS (SELECT 1 FROM equipment);
+
+INSERT INTO equipment_fts (equipment_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)');
+
+-- Each leads with the column it range-filters and sorts on, and carries the other for the second filter
+CREATE INDEX IF NOT EXISTS idx_equipment_price_rating ON equipment(price, rating);
+CREATE INDEX IF NOT EXISTS idx_equipment_rating_price ON equipment(rating, price);
+
+-- One batting line per player per game; game_number tells apart the games of a doubleheader
+CREATE TABLE IF NOT EXISTS player_game_stats (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    player_id INTEGER NOT NULL,
+    game_date TEXT NOT NULL,
+    game_number INTEGER NOT NULL DEFAULT 1,
+    season INTEGER NOT NULL,
+    pa INTEGER NOT NULL DEFAULT 0,
+    ab INTEGER NOT NULL DEFAULT 0,
+    h INTEGER NOT NULL DEFAULT 0,
+    doubles INTEGER NOT NULL DEFAULT 0,
+    triples INTEGER NOT NULL DEFAULT 0,
+    hr INTEGER NOT NULL DEFAULT 0,
+    bb INTEGER NOT NULL DEFAULT 0,
+    hbp INTEGER NOT NULL DEFAULT 0,
+    sf INTEGER NOT NULL DEFAULT 0,
+    so INTEGER NOT NULL DEFAULT 0,
+    rbi INTEGER NOT NULL DEFAULT 0,
+    roe INTEGER NOT NULL DEFAULT 0,
+    qab INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (player_id) REFERENCES players(id),
+    UNIQUE (player_id, game_date, game_number)
+);
+
+CREATE INDEX IF NOT EXISTS idx_player_game_stats_player_season ON player_game_stats(player_id, season);
+
+-- Running season totals per player, kept in step with player_game_stats by the triggers below
+CREATE TABLE IF NOT EXISTS player_season_stats (
+    player_id INTEGER NOT NULL,
+    season INTEGER NOT NULL,
+    games INTEGER NOT NULL DEFAULT 0,
+    pa INTEGER NOT NULL DEFAULT 0,
+    ab INTEGER NOT NULL DEFAULT 0,
+    h INTEGER NOT NULL DEFAULT 0,
+    doubles INTEGER NOT NULL DEFAULT 0,
+    triples INTEGER NOT NULL DEFAULT 0,
+    hr INTEGER NOT NULL DEFAULT 0,
+    bb INTEGER NOT NULL DEFAULT 0,
+    hbp INTEGER NOT NULL DEFAULT 0,
+    sf INTEGER NOT NULL DEFAULT 0,
+    so INTEGER NOT NULL DEFAULT 0,
+    rbi INTEGER NOT NULL DEFAULT 0,
+    roe INTEGER NOT NULL DEFAULT 0,
+    qab INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (player_id, season)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS player_game_stats_rollup_insert AFTER INSERT ON player_game_stats
+BEGIN
+    INSERT INTO player_season_stats (player_id, season, games, pa, ab, h, doubles, triples, hr, bb, hbp, sf, so, rbi, roe, qab)
+    VALUES (new.player_id, new.season, 1, new.pa, new.ab, new.h, new.doubles, new.triples, new.hr, new.bb, new.hbp, new.sf, new.so, new.rbi, new.roe, new.qab)
+    ON CONFLICT (player_id, season) DO UPDATE SET
+        games = games + 1, pa = pa + excluded.pa, ab = ab + excluded.ab, h = h + excluded.h,
+        doubles = doubles + excluded.doubles, triples = triples + excluded.triples, hr = hr + excluded.hr,
+        bb = bb + excluded.bb, hbp = hbp + excluded.hbp, sf = sf + excluded.sf, so = so + excluded.so,
+        rbi = rbi + excluded.rbi, roe = roe + excluded.roe, qab = qab + excluded.qab;
+END;
+
+CREATE TRIGGER IF NOT EXISTS player_game_stats_rollup_delete AFTER DELETE ON player_game_stats
+BEGIN
+    UPDATE player_season_stats SET
+        games = games - 1, pa = pa - old.pa, ab = ab - old.ab, h = h - old.h,
+        doubles = doubles - old.doubles, triples = triples - old.triples, hr = hr - old.hr,
+        bb = bb - old.bb, hbp = hbp - old.hbp, sf = sf - old.sf, so = so - old.so,
+        rbi = rbi - old.rbi, roe = roe - old.roe, qab = qab - old.qab
+    WHERE player_id = old.player_id AND season = old.season;
+    DELETE FROM player_season_stats WHERE player_id = old.player_id AND season = old.season AND games = 0;
+END;
+
+-- An edit is the old line taken out and the new one added, which also covers a line moving to another season
+CREATE TRIGGER IF NOT EXISTS player_game_stats_rollup_update AFTER UPDATE ON player_game_stats
+BEGIN
+    UPDATE player_season_stats SET
+        games = games - 1, pa = pa - old.pa, ab = ab - old.ab, h = h - old.h,
+        doubles = doubles - old.doubles, triples = triples - old.triples, hr = hr - old.hr,
+        bb = bb - old.bb, hbp = hbp - old.hbp, sf = sf - old.sf, so = so - old.so,
+        rbi = rbi - old.rbi, roe = roe - old.roe, qab = qab - old.qab
+    WHERE player_id = old.player_id AND season = old.season;
+    INSERT INTO player_season_stats (player_id, season, games, pa, ab, h, doubles, triples, hr, bb, hbp, sf, so, rbi, roe, qab)
+    VALUES (new.player_id, new.season, 1, new.pa, new.ab, new.h, new.doubles, new.triples, new.hr, new.bb, new.hbp, new.sf, new.so, new.rbi, new.roe, new.qab)
+    ON CONFLICT (player_id, season) DO UPDATE SET
+        games = games + 1, pa = pa + excluded.pa, ab = ab + excluded.ab, h = h + excluded.h,
+        doubles = doubles + excluded.doubles, triples = triples + excluded.triples, hr = hr + excluded.hr,
+        bb = bb + excluded.bb, hbp = hbp + excluded.hbp, sf = sf + excluded.sf, so = so + excluded.so,
+        rbi = rbi + excluded.rbi, roe = roe + excluded.roe, qab = qab + excluded.qab;
+    DELETE FROM player_season_stats WHERE player_id = old.player_id AND season = old.season AND games = 0;
+END;
+
+-- Leaderboards: one index per stat, the expression matching app.stat_lines.LEADERBOARD_STATS exactly.
+-- pa is carried for the minimum-PA filter and as the first tie-break.
+CREATE INDEX IF NOT EXISTS idx_player_season_ba ON player_season_stats(season, (h * 1.0 / ab), pa);
+CREATE INDEX IF NOT EXISTS idx_player_season_obp ON player_season_stats(season, ((h + bb + hbp) * 1.0 / (ab + bb + hbp + sf)), pa);
+CREATE INDEX IF NOT EXISTS idx_player_season_slg ON player_season_stats(season, ((h + doubles + 2 * triples + 3 * hr) * 1.0 / ab), pa);
+CREATE INDEX IF NOT EXISTS idx_player_season_qab ON player_season_stats(season, (qab * 1.0 / pa), pa);
+CREATE INDEX IF NOT EXISTS idx_player_season_rbi ON player_season_stats(season, rbi, pa);
+CREATE INDEX IF NOT EXISTS idx_player_season_hr ON player_season_stats(season, hr, pa);
+CREATE INDEX IF NOT EXISTS idx_player_season_rcv ON player_season_stats(season, (0.35 * IFNULL((h + bb + hbp) * 1.0 / (ab + bb + hbp + sf), 0) + 0.25 * IFNULL((h + doubles + 2 * triples + 3 * hr) * 1.0 / ab, 0) + 0.15 * IFNULL(h * 1.0 / ab, 0) + rbi * 1.0 / games + 0.10 * IFNULL(qab * 1.0 / pa, 0)), pa);
+
+INSERT OR IGNORE INTO table_versions (table_name, version) VALUES ('player_game_stats', abs(random() % 1000000000));
+
+CREATE TRIGGER IF NOT EXISTS player_game_stats_version_insert AFTER INSERT ON player_game_stats
+BEGIN UPDATE table_versions SET version = version + 1 WHERE table_name = 'player_game_stats'; END;
+CREATE TRIGGER IF NOT EXISTS player_game_stats_version_update AFTER UPDATE ON player_game_stats
+BEGIN UPDATE table_versions SET version = version + 1 WHERE table_name = 'player_game_stats'; END;
+CREATE TRIGGER IF NOT EXISTS player_game_stats_version_delete AFTER DELETE ON player_game_stats
+BEGIN UPDATE table_versions SET version = version + 1 WHERE table_name = 'player_game_stats'; END;
@@ -0,0 +1,123 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+import httpx
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from app.db import pool, writer
+from app.cache import caches
+
+# Seconds a search result is served without asking upstream again
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", str(6 * 60 * 60)))
+# Seconds an expired entry is kept as a fallback for a throttled upstream before it is pruned
+SEARCH_CACHE_STALE_TTL = int(os.getenv("SEARCH_CACHE_STALE_TTL", str(7 * 24 * 60 * 60)))
+# Upstream statuses that mean "out of quota" rather than "bad request"
+STALE_ON_STATUS = {403, 429}
+
+
+def normalize_query(query):
+    """Case- and whitespace-insensitive form of a search so "Bat  Grip" and "bat grip" share an entry"""
+    return " ".join(query.lower().split())
+
+
+def cache_key(namespace, **params):
+    raw = json.dumps(params, sort_keys=True, separators=(",", ":"))
+    return f"{namespace}:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+
+class SearchCache:
+    """SQLite-backed TTL cache for external search calls.
+
+    Concurrent requests for the same key share one upstream call: the first
+    one fetches, the rest await its result. If upstream fails with a status
+    in STALE_ON_STATUS and an expired entry is still on disk, that entry is
+    served instead of the error.
+    """
+
+    def __init__(self, name="search", ttl=SEARCH_CACHE_TTL):
+        self.ttl = ttl
+        self._inflight = {}
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._stale_served = 0
+        self._upstream_errors = 0
+        caches[name] = self
+
+    async def get_or_fetch(self, key, fetch, cache_if=None):
+        """Return the cached value for `key`, calling `await fetch()` to fill it.
+
+        `fetch` returns a JSON-serializable value or raises HTTPException (or
+        httpx.HTTPStatusError) with the upstream status. Fetched values for which `cache_if(value)` is
+        false are returned (and shared with waiting callers) but not stored.
+        """
+        pending = self._inflight.get(key)
+        if pending is None:
+            # Its own task, so a caller that goes away (e.g. the client disconnects) cancels only
+            # its own wait - the fetch carries on for everyone else sharing it
+            pending = asyncio.ensure_future(self._load(key, fetch, cache_if))
+            pending.add_done_callback(lambda task: self._finished(key, task))
+            # Registered before the first await so a concurrent caller always finds it
+            self._inflight[key] = pending
+        else:
+            self._coalesced += 1
+        return await asyncio.shield(pending)
+
+    def _finished(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved here so a failure nobody awaited doesn't log a warning
+
+    async def _load(self, key, fetch, cache_if):
+        entry = await run_in_threadpool(self._lookup, key)
+        now = time.time()
+        if entry is not None and entry["expires_at"] > now:
+            self._hits += 1
+            return json.loads(entry["payload"])
+
+        self._misses += 1
+        try:
+            value = await fetch()
+        except (HTTPException, httpx.HTTPStatusError) as e:
+            self._upstream_errors += 1
+            status = e.status_code if isinstance(e, HTTPException) else e.response.status_code
+            if entry is not None and status in STALE_ON_STATUS:
+                self._stale_served += 1
+                return json.loads(entry["payload"])
+            raise
+
+        if cache_if is not None and not cache_if(value):
+            return value
+
+        await writer.execute_async(
+            """INSERT OR REPLACE INTO search_cache (cache_key, payload, fetched_at, expires_at)
+               VALUES (?, ?, ?, ?)""",
+            (key, json.dumps(value), now, now + self.ttl)
+        )
+        await writer.execute_async(
+            "DELETE FROM search_cache WHERE expires_at < ?",
+            (now - SEARCH_CACHE_STALE_TTL,)
+        )
+        return value
+
+    def _lookup(self, key):
+        with pool.connection() as conn:
+            return conn.execute(
+                "SELECT payload, expires_at FROM search_cache WHERE cache_key = ?",
+                (key,)
+            ).fetchone()
+
+    def stats(self):
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "coalesced": self._coalesced,
+            "stale_served": self._stale_served,
+            "upstream_errors": self._upstream_errors,
+        }
+
+
+search_cache = SearchCache()
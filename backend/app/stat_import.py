@@ -0,0 +1,220 @@
+import csv
+import io
+import os
+import time
+from pydantic import ValidationError
+from app.db import pool, writer
+from app.stat_lines import STAT_COLUMNS, StatLine, check_stat_line, line_values
+
+# Rows written per transaction
+IMPORT_CHUNK_ROWS = 1000
+# Upload bytes held in memory before the spool moves to a temp file
+IMPORT_SPOOL_BYTES = 1024 * 1024
+MAX_IMPORT_BYTES = int(os.getenv("MAX_IMPORT_BYTES", str(50 * 1024 * 1024)))
+# Row errors listed in the summary; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+# GameChanger export headers -> player_game_stats columns
+CSV_COLUMNS = {
+    "PA": "pa", "AB": "ab", "H": "h", "2B": "doubles", "3B": "triples", "HR": "hr", "BB": "bb",
+    "HBP": "hbp", "SF": "sf", "SO": "so", "RBI": "rbi", "ROE": "roe", "QAB": "qab",
+}
+DATE_HEADERS = ("Date", "Game Date")
+GAME_HEADERS = ("Game", "Game #")
+# First cell of the rows GameChanger appends after the players
+FOOTER_MARKERS = ("Totals", "Glossary")
+
+UPSERT_LINE = f"""
+    INSERT INTO player_game_stats (player_id, game_date, game_number, season, {", ".join(STAT_COLUMNS)})
+    VALUES ({", ".join("?" for _ in range(4 + len(STAT_COLUMNS)))})
+    ON CONFLICT (player_id, game_date, game_number) DO UPDATE SET
+        {", ".join(f"{c} = excluded.{c}" for c in STAT_COLUMNS)}
+"""
+
+
+def header_index(header):
+    """First position of every header name. GameChanger repeats names like H and BB in its
+    pitching section further right, and the batting columns come first."""
+    index = {}
+    for i, name in enumerate(header):
+        index.setdefault(name.strip(), i)
+    return index
+
+
+def find_header(reader):
+    """The header row. GameChanger puts a row of section titles above the
+    real header (the app drops it too), so the header is the first row naming a player column."""
+    for row in reader:
+        if {"First", "Last", "Number"} & {cell.strip() for cell in row}:
+            return row
+        if reader.line_num >= 2:
+            break
+    raise ValueError("No header row with First, Last or Number columns in the first two lines")
+
+
+def count(value):
+    value = value.strip()
+    if value in ("", "-"):
+        return 0
+    try:
+        number = float(value)
+    except ValueError:
+        number = -1
+    if number < 0 or not number.is_integer():
+        raise ValueError(f"'{value}' is not a count")
+    return int(number)
+
+
+def validation_message(error):
+    """Short "field: message" for a row's first validation error, instead of pydantic's multi-line report"""
+    first = error.errors()[0]
+    field = ".".join(str(part) for part in first["loc"])
+    return f"{field}: {first['msg']}" if field else first["msg"]
+
+
+def load_roster(team_id):
+    """(by jersey number, by lowercase "first last") -> player id for the team's current players"""
+    with pool.connection() as conn:
+        rows = conn.execute(
+            "SELECT id, first_name, last_name, jersey_number FROM players WHERE team_id = ?", (team_id,)
+        ).fetchall()
+    by_number = {}
+    by_name = {}
+    for player_id, first, last, number in rows:
+        if number is not None:
+            by_number.setdefault(str(number), player_id)
+        by_name.setdefault(f"{first or ''} {last or ''}".strip().lower(), player_id)
+    return by_number, by_name
+
+
+def import_stat_csv(file, team_id, game_date=None, game_number=1, create_players=True):
+    """Parse a GameChanger-style CSV from a binary file and upsert its batting lines.
+
+    Rows are matched to the team's players by jersey number, then by name,
+    the way the app's importer does. Unmatched players are created unless
+    `create_players` is false. Each row is one game line, dated by its
+    Date column or `game_date`. Lines are written IMPORT_CHUNK_ROWS at a
+    time with executemany, one transaction per chunk; a line already on
+    file for the same player and game is overwritten, so re-importing a
+    file is safe. Bad rows are skipped and reported, never fatal.
+
+    The header is checked up front (ValueError if unusable); the rows are
+    imported as the returned generator is consumed. It yields
+    {"type": "progress", ...} after every chunk and a final
+    {"type": "done", ...} summary.
+    """
+    started = time.perf_counter()
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    reader = csv.reader(text)
+    header = find_header(reader)
+    columns = header_index(header)
+
+    date_column = next((columns[h] for h in DATE_HEADERS if h in columns), None)
+    game_column = next((columns[h] for h in GAME_HEADERS if h in columns), None)
+    if date_column is None and game_date is None:
+        raise ValueError("The CSV has no Date column, so game_date is required")
+    stat_columns = {column: (name, columns[name]) for name, column in CSV_COLUMNS.items() if name in columns}
+
+    by_number, by_name = load_roster(team_id)
+    summary = {"rows": 0, "lines": 0, "players_created": 0, "error_count": 0, "errors": []}
+
+    def fail(line_number, message):
+        summary["error_count"] += 1
+        if len(summary["errors"]) < MAX_REPORTED_ERRORS:
+            summary["errors"].append({"line": line_number, "error": message})
+
+    def cell(row, index):
+        return row[index].strip() if index is not None and index < len(row) else ""
+
+    def parse(row, line_number):
+        """(line number, player key, line values without player_id) for a row, or None after recording why not"""
+        number = cell(row, columns.get("Number"))
+        first, last = cell(row, columns.get("First")), cell(row, columns.get("Last"))
+        if not first and not last and not number:
+            fail(line_number, "No player name or number")
+            return None
+        date = cell(row, date_column) or game_date
+        if not date:
+            fail(line_number, "No game date")
+            return None
+        counts = {}
+        fields = list(stat_columns.items())
+        if game_column is not None:
+            fields.append(("game_number", (header[game_column].strip(), game_column)))
+        for column, (name, index) in fields:
+            try:
+                counts[column] = count(cell(row, index))
+            except ValueError as e:
+                fail(line_number, f"{name}: {e}")
+                return None
+        counts["game_number"] = counts.get("game_number") or game_number
+        try:
+            line = StatLine(player_id=0, game_date=date, **counts)
+            season = check_stat_line(line)
+        except ValidationError as e:
+            fail(line_number, validation_message(e))
+            return None
+        except ValueError as e:
+            fail(line_number, str(e))
+            return None
+        return line_number, (number, first, last), line_values(line, season)[1:]
+
+    def write(chunk):
+        """Resolve players (creating missing ones) and upsert one chunk of parsed rows in one transaction"""
+        def op(conn):
+            new_by_number = {}
+            new_by_name = {}
+            unmatched = []
+            rows = []
+            for line_number, (number, first, last), values in chunk:
+                name = f"{first} {last}".strip().lower()
+                player_id = (by_number.get(number) or new_by_number.get(number)) if number else None
+                if player_id is None:
+                    player_id = by_name.get(name) or new_by_name.get(name)
+                if player_id is None:
+                    if not create_players or not name:
+                        unmatched.append(line_number)
+                        continue
+                    player_id = conn.execute(
+                        "INSERT INTO players (team_id, first_name, last_name, jersey_number) VALUES (?, ?, ?, ?)",
+                        (team_id, first, last, int(number) if number.isdigit() else None)
+                    ).lastrowid
+                    new_by_name[name] = player_id
+                    if number:
+                        new_by_number[number] = player_id
+                rows.append((player_id, *values))
+            conn.executemany(UPSERT_LINE, rows)
+            return new_by_number, new_by_name, unmatched, len(rows)
+
+        new_by_number, new_by_name, unmatched, written = writer.run(op)
+        # Only after the commit, so a rolled-back chunk never leaves ids for players that don't exist
+        by_number.update(new_by_number)
+        by_name.update(new_by_name)
+        summary["players_created"] += len(new_by_name)
+        summary["lines"] += written
+        for line_number in unmatched:
+            fail(line_number, "No player on the team with this number or name")
+
+    def progress():
+        chunk = []
+        for row in reader:
+            line_number = reader.line_num
+            if not any(cell.strip() for cell in row):
+                continue
+            if row[0].strip().startswith(FOOTER_MARKERS):
+                break
+            summary["rows"] += 1
+            parsed = parse(row, line_number)
+            if parsed is not None:
+                chunk.append(parsed)
+            if len(chunk) >= IMPORT_CHUNK_ROWS:
+                write(chunk)
+                chunk = []
+                yield {"type": "progress", "rows": summary["rows"], "lines": summary["lines"],
+                       "error_count": summary["error_count"]}
+        if chunk:
+            write(chunk)
+
+        yield {"type": "done", **summary, "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    return progress()
@@ -0,0 +1,98 @@
+import datetime
+from pydantic import BaseModel, Field
+
+# Counting stats carried by a game line and summed into the season rollup, in table column order
+STAT_COLUMNS = ["pa", "ab", "h", "doubles", "triples", "hr", "bb", "hbp", "sf", "so", "rbi", "roe", "qab"]
+
+# Leaderboard stats as SQL over player_season_stats columns. Each one has an index on
+# (season, <expression>, pa) in schema.sql, which must repeat the expression exactly.
+BA_SQL = "h * 1.0 / ab"
+OBP_SQL = "(h + bb + hbp) * 1.0 / (ab + bb + hbp + sf)"
+SLG_SQL = "(h + doubles + 2 * triples + 3 * hr) * 1.0 / ab"
+QAB_SQL = "qab * 1.0 / pa"
+LEADERBOARD_STATS = {
+    "ba": BA_SQL,
+    "obp": OBP_SQL,
+    "slg": SLG_SQL,
+    "qab": QAB_SQL,
+    "rbi": "rbi",
+    "hr": "hr",
+    # The app's run-creation value (LineupAlgorithm.ts), with a missing rate counting as 0 like it does there
+    "rcv": (f"0.35 * IFNULL({OBP_SQL}, 0) + 0.25 * IFNULL({SLG_SQL}, 0) + 0.15 * IFNULL({BA_SQL}, 0)"
+            f" + rbi * 1.0 / games + 0.10 * IFNULL({QAB_SQL}, 0)"),
+}
+
+
+class StatCounts(BaseModel):
+    pa: int = Field(0, ge=0)
+    ab: int = Field(0, ge=0)
+    h: int = Field(0, ge=0)
+    doubles: int = Field(0, ge=0)
+    triples: int = Field(0, ge=0)
+    hr: int = Field(0, ge=0)
+    bb: int = Field(0, ge=0)
+    hbp: int = Field(0, ge=0)
+    sf: int = Field(0, ge=0)
+    so: int = Field(0, ge=0)
+    rbi: int = Field(0, ge=0)
+    roe: int = Field(0, ge=0)
+    qab: int = Field(0, ge=0)
+
+
+class StatLine(StatCounts):
+    player_id: int
+    game_date: str
+    game_number: int = Field(1, ge=1)
+
+
+def check_stat_line(line):
+    """Season for a line, or ValueError naming the first inconsistency in it"""
+    try:
+        season = datetime.date.fromisoformat(line.game_date).year
+    except ValueError:
+        raise ValueError(f"game_date '{line.game_date}' is not a YYYY-MM-DD date")
+    if line.h > line.ab:
+        raise ValueError("h exceeds ab")
+    if line.doubles + line.triples + line.hr > line.h:
+        raise ValueError("doubles + triples + hr exceeds h")
+    if line.ab + line.bb + line.hbp + line.sf > line.pa:
+        raise ValueError("ab + bb + hbp + sf exceeds pa")
+    if line.so + line.roe > line.ab:
+        raise ValueError("so + roe exceeds ab")
+    if line.qab > line.pa:
+        raise ValueError("qab exceeds pa")
+    return season
+
+
+def line_values(line, season):
+    """Row for INSERT INTO player_game_stats (player_id, game_date, game_number, season, *STAT_COLUMNS)"""
+    return (line.player_id, line.game_date, line.game_number, season, *(getattr(line, c) for c in STAT_COLUMNS))
+
+
+def ratio(numerator, denominator):
+    return round(numerator / denominator, 3) if denominator else 0.0
+
+
+def season_to_dict(row):
+    """player_season_stats row (player_id, season, games, *STAT_COLUMNS) with its rate stats.
+
+    `rates` uses the same keys and scale as the app's player stats (qab is
+    QAB% as a fraction), so it can go straight into the lineup optimizer.
+    """
+    player_id, season, games = row[0], row[1], row[2]
+    totals = dict(zip(STAT_COLUMNS, row[3:]))
+    totals["xbh"] = totals["doubles"] + totals["triples"] + totals["hr"]
+    total_bases = totals["h"] + totals["doubles"] + 2 * totals["triples"] + 3 * totals["hr"]
+    on_base_chances = totals["ab"] + totals["bb"] + totals["hbp"] + totals["sf"]
+    return {
+        "player_id": player_id,
+        "season": season,
+        "games": games,
+        "totals": totals,
+        "rates": {
+            "ba": ratio(totals["h"], totals["ab"]),
+            "obp": ratio(totals["h"] + totals["bb"] + totals["hbp"], on_base_chances),
+            "slg": ratio(total_bases, totals["ab"]),
+            "qab": ratio(totals["qab"], totals["pa"]),
+        },
+    }
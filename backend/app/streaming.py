@@ -0,0 +1,51 @@
+import json
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+# Rows pulled from the cursor per write - keeps memory flat however big the table gets
+STREAM_CHUNK_SIZE = 500
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def check_stream_args(stream, paginated):
+    if stream and paginated:
+        raise HTTPException(status_code=400, detail="stream cannot be combined with limit or cursor")
+
+
+def stream_query(conn, query, params, serialize, fmt="json"):
+    """Stream a query's rows as a JSON array ("json") or one object per line ("ndjson").
+
+    Rows are encoded chunk by chunk as the client reads them, so neither the
+    full result set nor the full response body is ever held in memory.
+
+    `conn` is the route's get_db connection, which FastAPI releases only once
+    the response has been sent, so a stream never needs a second one. The
+    query runs before the response starts, so a database error is still a 500.
+    """
+    cursor = conn.execute(query, params)
+    return StreamingResponse(_encode_rows(cursor, serialize, fmt), media_type=MEDIA_TYPES[fmt])
+
+
+def _encode_rows(cursor, serialize, fmt):
+    if fmt == "json":
+        yield "["
+
+    first = True
+    while True:
+        rows = cursor.fetchmany(STREAM_CHUNK_SIZE)
+        if not rows:
+            break
+
+        encoded = [json.dumps(serialize(row)) for row in rows]
+        if fmt == "ndjson":
+            yield "\n".join(encoded) + "\n"
+        else:
+            yield ("" if first else ",") + ",".join(encoded)
+        first = False
+
+    if fmt == "json":
+        yield "]"
@@ -0,0 +1,138 @@
+"""
+Outbound HTTP client check against a local stub server.
+
+Starts a keep-alive HTTP/1.1 stub that answers like the YouTube search API,
+points the app at it, and verifies that:
+  - repeated searches through the app reuse one pooled connection
+  - concurrent requests to one host never exceed the per-host cap
+
+Usage (from backend/):  python check_http_client.py
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+
+SEARCHES = 5
+CONCURRENT_REQUESTS = 12
+PER_HOST_CAP = 3
+STUB_DELAY = 0.05
+
+
+class StubState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = set()
+        self.active = 0
+        self.peak = 0
+
+
+def make_handler(state):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so reuse is observable
+
+        def do_GET(self):
+            with state.lock:
+                state.connections.add(self.client_address)
+                state.active += 1
+                state.peak = max(state.peak, state.active)
+            time.sleep(STUB_DELAY)
+            with state.lock:
+                state.active -= 1
+
+            body = json.dumps({"items": [{
+                "id": {"videoId": "stub"},
+                "snippet": {"title": "Stub", "description": "", "channelTitle": "Stub",
+                            "thumbnails": {"medium": {"url": "http://stub/thumb.jpg"}}},
+            }]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return StubHandler
+
+
+def check_reuse(stub_url, state, tmp):
+    """Distinct searches through the app should all ride one keep-alive connection"""
+    os.environ["YOUTUBE_SEARCH_URL"] = stub_url
+    os.environ.setdefault("YOUTUBE_API_KEY", "stub")
+
+    import app.db as db
+    db.DB_NAME = os.path.join(tmp, "http_check.db")
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as client:
+        for i in range(SEARCHES):
+            response = client.get(f"/api/drills/search/youtube?query=check+{i}")
+            if response.status_code != 200:
+                return [f"search {i} -> {response.status_code}"]
+        stats = client.get("/api/health/http").json()
+
+    problems = []
+    if len(state.connections) != 1:
+        problems.append(f"stub saw {len(state.connections)} connections for {SEARCHES} searches, expected 1")
+    if stats["connections_reused"] != SEARCHES - 1:
+        problems.append(f"client reported {stats['connections_reused']} reused connections, expected {SEARCHES - 1}")
+    return problems
+
+
+def check_per_host_cap(stub_url, state):
+    from app.http_client import create_http_client
+
+    async def run():
+        client, transport = create_http_client(max_per_host=PER_HOST_CAP)
+        try:
+            await asyncio.gather(*[client.get(stub_url) for _ in range(CONCURRENT_REQUESTS)])
+            return transport.stats()
+        finally:
+            await client.aclose()
+
+    state.peak = 0
+    stats = asyncio.run(run())
+
+    problems = []
+    if state.peak > PER_HOST_CAP:
+        problems.append(f"stub saw {state.peak} concurrent requests, cap is {PER_HOST_CAP}")
+    if stats["host_waits"] == 0:
+        problems.append("no request ever waited for a per-host slot")
+    if stats["in_flight"] != 0:
+        problems.append(f"{stats['in_flight']} requests still counted in flight")
+    return problems
+
+
+def main():
+    state = StubState()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stub_url = f"http://127.0.0.1:{server.server_port}/youtube/v3/search"
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            problems = check_reuse(stub_url, state, tmp)
+        problems += check_per_host_cap(stub_url, state)
+    finally:
+        server.shutdown()
+
+    for problem in problems:
+        print(f"  [FAIL] {problem}")
+    if problems:
+        sys.exit(1)
+    print(f"[OK] {SEARCHES} searches shared one connection; peak {state.peak} concurrent with a per-host cap of {PER_HOST_CAP}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""
+Query plan regression check.
+
+Builds a seeded throwaway database from app/schema.sql, drives every router
+endpoint through the FastAPI test client while tracing the SQL they issue, then
+runs EXPLAIN QUERY PLAN on each distinct statement. Exits non-zero if a
+filtered query falls back to a full table SCAN, so a missing index fails CI
+instead of showing up as latency later.
+
+Usage (from backend/):  python check_query_plans.py
+tests/test_query_plans.py runs the same check as part of the test suite.
+"""
+import os
+import re
+import sys
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+SCHEMA_PATH = os.path.join(BACKEND_DIR, "app", "schema.sql")
+sys.path.insert(0, BACKEND_DIR)
+
+# Rows per table - enough that the planner's cost estimates favour indexes the way they would in production
+SEED_USERS = 200
+SEED_TEAMS = 50
+SEED_PLAYERS_PER_TEAM = 15
+SEED_LINEUPS_PER_TEAM = 6
+SEED_DRILLS = 2000
+SEED_EQUIPMENT = 500
+SEED_PLANS_PER_USER = 3
+SEED_DRILLS_PER_PLAN = 8
+SEED_GAMES_PER_PLAYER = 10
+SKILLS = ["hitting", "fielding", "pitching", "baserunning"]
+POSITIONS = ["P", "C", "1B", "2B", "3B", "SS", "LF", "CF", "RF"]
+
+# Every endpoint worth checking, as (method, path, json body or raw bytes). Writes run last so reads see the seeded data.
+ROUTE_CALLS = [
+    ("GET", "/api/users/", None),
+    ("GET", "/api/teams/", None),
+    ("GET", "/api/players/", None),
+    ("GET", "/api/players/?team_id=3", None),
+    ("GET", "/api/lineups/", None),
+    ("GET", "/api/lineups/?team_id=3", None),
+    ("GET", "/api/lineup_players/5", None),
+    ("GET", "/api/lineups/team/3", None),
+    ("GET", "/api/lineups/team/3?from=2025-04-02&to=2025-04-04", None),
+    ("GET", "/api/drills", None),
+    ("GET", "/api/drills?skill_focus=hitting", None),
+    ("GET", "/api/drills/7", None),
+    ("GET", "/api/drills/favorites?user_id=4", None),
+    ("GET", "/api/equipment", None),
+    ("GET", "/api/equipment/favorites?user_id=4", None),
+    ("GET", "/api/practice-plans/user/4", None),
+    ("GET", "/api/practice-plans/user/4?include=drills", None),
+    ("GET", "/api/practice-plans/user/4?include=summary&limit=2", None),
+    ("GET", "/api/practice-plans/favorites?user_id=4", None),
+    ("GET", "/api/practice-plans/9", None),
+    ("GET", "/api/users/4/favorites", None),
+    ("GET", "/api/users/?limit=20", None),
+    ("GET", "/api/teams/?limit=20", None),
+    ("GET", "/api/players/?team_id=3&limit=5", None),
+    ("GET", "/api/lineups/?team_id=3&limit=2", None),
+    ("GET", "/api/drills?limit=20", None),
+    ("GET", "/api/drills?skill_focus=hitting&limit=20", None),
+    ("GET", "/api/drills/favorites?user_id=4&limit=3", None),
+    ("GET", "/api/equipment?limit=20", None),
+    ("GET", "/api/equipment/favorites?user_id=4&limit=3", None),
+    ("GET", "/api/practice-plans/user/4?limit=2", None),
+    ("GET", "/api/practice-plans/favorites?user_id=4&limit=3", None),
+    ("GET", "/api/drills?skill_focus=fielding&stream=ndjson", None),
+    ("GET", "/api/stats/games?player_id=40", None),
+    ("GET", "/api/stats/games?player_id=40&season=2025&limit=5", None),
+    ("GET", "/api/stats/players/40", None),
+    ("GET", "/api/stats/players/40?season=2025", None),
+    ("GET", "/api/stats/teams/3?season=2025", None),
+    ("GET", "/api/stats/leaderboard?stat=ba&season=2025", None),
+    ("GET", "/api/stats/leaderboard?stat=obp&season=2025&min_pa=20&player_id=40", None),
+    ("GET", "/api/stats/leaderboard?stat=slg&season=2025&player_id=40", None),
+    ("GET", "/api/stats/leaderboard?stat=qab&season=2025&limit=5", None),
+    ("GET", "/api/stats/leaderboard?stat=rbi&season=2025&player_id=40", None),
+    ("GET", "/api/stats/leaderboard?stat=hr&season=2025", None),
+    ("GET", "/api/stats/leaderboard?stat=rcv&season=2025&player_id=40", None),
+    ("GET", "/api/stats/leaderboard?stat=ba&season=2025&team_id=3&player_id=40", None),
+    ("GET", "/api/drills/search?q=description+dri", None),
+    ("GET", "/api/drills/search?q=drill&skill_focus=pitching&limit=5", None),
+    ("GET", "/api/equipment/search?q=bat", None),
+    ("GET", "/api/equipment/search?q=bat&min_price=50&max_price=100&sort=price_asc", None),
+    ("GET", "/api/equipment/search?min_price=100&max_price=150&sort=price_desc", None),
+    ("GET", "/api/equipment/search?min_rating=4&sort=rating&limit=10", None),
+    ("GET", "/api/equipment/search?min_price=100&max_price=150&min_rating=3", None),
+    ("GET", "/api/equipment/search?sort=price_asc&limit=5", None),
+    ("POST", "/api/users/?email=plan-check@example.com&password_hash=x", None),
+    ("POST", "/api/teams/?name=Plan+Check", None),
+    ("POST", "/api/players/?team_id=3&first_name=Plan&last_name=Check", None),
+    ("POST", "/api/lineups/?team_id=3&game_date=2025-06-01", None),
+    ("POST", "/api/lineup_players/?lineup_id=5&player_id=40&batting_order=10", None),
+    ("POST", "/api/lineups/with-players", {"team_id": 3, "game_date": "2025-06-03", "players": [
+        {"player_id": p, "batting_order": p - 30, "field_position": POSITIONS[p % 9]} for p in range(31, 40)]}),
+    ("POST", "/api/lineups/optimize", {"players": [{"player_id": p, "stats": {"obp": p / 100}} for p in range(31, 43)],
+                                       "locked": [{"player_id": 31, "batting_order": 1}], "team_id": 3, "game_date": "2025-06-02"}),
+    ("POST", "/api/lineups/defense", {"players": [{"player_id": p, "scores": dict.fromkeys(POSITIONS, p % 7)} for p in range(31, 43)],
+                                      "innings": 3, "lineup_id": 13}),
+    ("POST", "/api/stats/games", {"player_id": 40, "game_date": "2025-06-01", "pa": 4, "ab": 4, "h": 2}),
+    ("PUT", "/api/stats/games/3", {"pa": 4, "ab": 4, "h": 1}),
+    ("DELETE", "/api/stats/games/4", None),
+    ("POST", "/api/stats/import?team_id=3", b"Number,First,Last,Date,PA,AB,H\n2,P,Player3-2,2025-06-03,4,4,2\n99,New,Player,2025-06-03,3,3,0\n"),
+    ("POST", "/api/drills/create?title=Check&description=d&skill_focus=hitting&user_id=1", None),
+    ("POST", "/api/drills/create-from-youtube", {"video_id": "abc", "title": "Check", "description": "d", "skill_focus": "hitting", "user_id": 1}),
+    ("POST", "/api/drills/8/favorite", {"user_id": 5}),
+    ("DELETE", "/api/drills/8/favorite?user_id=5", None),
+    ("POST", "/api/equipment", {"title": "Check", "link": "https://example.com"}),
+    ("POST", "/api/equipment/8/favorite", {"user_id": 5}),
+    ("DELETE", "/api/equipment/8/favorite?user_id=5", None),
+    ("POST", "/api/practice-plans?user_id=5&name=Check", None),
+    ("POST", "/api/practice-plans/9/drills/8", {"order_number": 99}),
+    ("DELETE", "/api/practice-plans/9/drills/8", None),
+    ("PUT", "/api/practice-plans/9/drills", {"drill_ids": [5, 4, 3, 2]}),
+    ("PATCH", "/api/practice-plans/9/drills", {"remove": [4], "insert": [{"drill_id": 7, "position": 1}, {"drill_id": 2, "position": 2}]}),
+    ("POST", "/api/practice-plans/9/favorite", {"user_id": 150}),
+    ("DELETE", "/api/practice-plans/9/favorite?user_id=150", None),
+    ("POST", "/api/drills/favorites/bulk", {"user_id": 6, "add": [1, 2, 3, 999999], "remove": [4]}),
+    ("POST", "/api/equipment/favorites/bulk", {"user_id": 6, "add": [1, 2], "remove": [3]}),
+    ("POST", "/api/practice-plans/favorites/bulk", {"user_id": 6, "add": [1, 2], "remove": [3]}),
+    ("DELETE", "/api/drills/11", None),
+    ("DELETE", "/api/equipment/11", None),
+    ("DELETE", "/api/practice-plans/12", None),
+]
+
+# Plan lines that are fine even inside a filtered query. Scans of a subquery's result
+# (a CO-ROUTINE or MATERIALIZE in the same plan) are also allowed - the subquery's own lines are checked.
+ALLOWED_SCANS = [
+    re.compile(r"VIRTUAL TABLE"),  # FTS lookups report as a virtual table scan
+]
+
+
+def seed(path):
+    conn = sqlite3.connect(path)
+    with open(SCHEMA_PATH, 'r') as f:
+        conn.executescript(f.read())
+
+    start = datetime(2025, 1, 1)
+    stamp = lambda i: (start + timedelta(minutes=i)).isoformat()
+
+    conn.executemany(
+        "INSERT INTO users (id, email, password_hash, first_name, last_name, role, created_at) VALUES (?, ?, 'x', 'First', 'Last', 'coach', ?)",
+        [(u, f"user{u}@example.com", stamp(u)) for u in range(1, SEED_USERS + 1)]
+    )
+    conn.executemany(
+        "INSERT INTO teams (id, name, sport, age_group, coach_id) VALUES (?, ?, 'baseball', '12U', ?)",
+        [(t, f"Team {t}", t) for t in range(1, SEED_TEAMS + 1)]
+    )
+    conn.executemany(
+        "INSERT INTO players (team_id, first_name, last_name, jersey_number, position) VALUES (?, 'P', ?, ?, ?)",
+        [(t, f"Player{t}-{n}", n, POSITIONS[n % 9]) for t in range(1, SEED_TEAMS + 1) for n in range(SEED_PLAYERS_PER_TEAM)]
+    )
+    conn.executemany(
+        "INSERT INTO lineups (team_id, game_date, created_at) VALUES (?, ?, ?)",
+        [(t, f"2025-04-{g + 1:02d}", stamp(t * 10 + g)) for t in range(1, SEED_TEAMS + 1) for g in range(SEED_LINEUPS_PER_TEAM)]
+    )
+    conn.execute(
+        """INSERT INTO lineup_players (lineup_id, player_id, batting_order, field_position)
+           SELECT l.id, p.id, (p.id % 15) + 1, p.position FROM lineups l JOIN players p ON p.team_id = l.team_id"""
+    )
+    conn.executemany(
+        """INSERT INTO player_game_stats (player_id, game_date, season, pa, ab, h, doubles, bb, so, rbi, qab)
+           VALUES (?, ?, 2025, 4, 3, ?, ?, 1, ?, ?, ?)""",
+        [(p, f"2025-05-{g + 1:02d}", (p + g) % 4, (p + g) % 2, g % 3, p % 3, (p * g) % 5)
+         for p in range(1, SEED_TEAMS * SEED_PLAYERS_PER_TEAM + 1) for g in range(SEED_GAMES_PER_PLAYER)]
+    )
+    conn.executemany(
+        "INSERT INTO drills (title, description, skill_focus, video_url, created_at, created_by) VALUES (?, ?, ?, ?, ?, ?)",
+        [(f"Drill {d}", f"Description for drill {d}", SKILLS[d % 4], f"https://youtube.com/watch?v=d{d}", stamp(d), d % SEED_USERS + 1)
+         for d in range(1, SEED_DRILLS + 1)]
+    )
+    conn.executemany(
+        "INSERT INTO equipment (name, description, link, price, rating, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+        [(f"Bat {e}", f"Equipment {e}", f"https://example.com/{e}", 20 + e % 300, (e % 50) / 10, stamp(e))
+         for e in range(1, SEED_EQUIPMENT + 1)]
+    )
+    conn.executemany(
+        "INSERT INTO practice_plans (user_id, name, created_at) VALUES (?, ?, ?)",
+        [(u, f"Plan {u}-{p}", stamp(u * 10 + p)) for u in range(1, SEED_USERS + 1) for p in range(SEED_PLANS_PER_USER)]
+    )
+    conn.execute(
+        f"""WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < {SEED_DRILLS_PER_PLAN})
+            INSERT INTO practice_plan_drills (practice_plan_id, drill_id, order_number)
+            SELECT pp.id, ((pp.id * 7 + n.i) % {SEED_DRILLS}) + 1, n.i FROM practice_plans pp, n"""
+    )
+    for table, column, count in [("drill_favorites", "drill_id", SEED_DRILLS),
+                                 ("equipment_favorites", "equipment_id", SEED_EQUIPMENT),
+                                 ("practice_plan_favorites", "practice_plan_id", SEED_USERS * SEED_PLANS_PER_USER)]:
+        conn.executemany(
+            f"INSERT OR IGNORE INTO {table} (user_id, {column}, created_at) VALUES (?, ?, ?)",
+            [(u, (u * 13 + k) % count + 1, stamp(u + k)) for u in range(1, SEED_USERS + 1) for k in range(10)]
+        )
+
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+
+@contextmanager
+def traced_database(path):
+    """Point the app's pool and writer at the database at `path` and yield a list collecting every
+    statement their connections run. The previous database is back in use afterwards."""
+    import app.db as db
+    from app.cache import LRUCache, caches
+
+    statements = []
+    previous_name, untraced_connect = db.DB_NAME, db.connect
+
+    def traced_connect():
+        conn = untraced_connect()
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    def reset():
+        # Open connections and cached responses belong to the other database; both come back lazily
+        db.writer.close()
+        db.pool.close()
+        for cache in caches.values():
+            if isinstance(cache, LRUCache):
+                cache.clear()
+
+    reset()
+    db.DB_NAME, db.connect = path, traced_connect
+    try:
+        yield statements
+    finally:
+        reset()
+        db.DB_NAME, db.connect = previous_name, untraced_connect
+
+
+def capture_statements(client, statements):
+    """Run every route through `client` and return (the SQL they issued, the calls that failed)"""
+    # Only the routes' own statements are of interest, not startup's schema.sql
+    statements.clear()
+    failures = []
+    for method, url, body in ROUTE_CALLS:
+        body_arg = {"content": body} if isinstance(body, bytes) else {"json": body}
+        response = client.request(method, url, **body_arg)
+        if response.status_code >= 500:
+            failures.append(f"{method} {url} -> {response.status_code}")
+            continue
+
+        # Follow one page forward so the keyset seek query is checked too
+        if "limit=" not in url or not isinstance(response.json(), dict):
+            continue
+        if response.json().get("next_cursor"):
+            next_url = f"{url}&cursor={response.json()['next_cursor']}"
+            next_response = client.request(method, next_url)
+            if next_response.status_code >= 500:
+                failures.append(f"{method} {next_url} -> {next_response.status_code}")
+
+    return list(statements), failures
+
+
+def is_query(sql):
+    return re.match(r"\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", sql, re.IGNORECASE) is not None
+
+
+def is_filtered(sql):
+    # "WHERE 1=1" is only there so optional filters can be appended
+    sql = re.sub(r"WHERE 1=1\s*(?=ORDER|LIMIT|$)", "", sql.strip())
+    return re.search(r"\b(WHERE|ON)\b", sql, re.IGNORECASE) is not None
+
+
+def check_plans(path, statements):
+    conn = sqlite3.connect(path)
+    problems = []
+    checked = 0
+
+    for sql in dict.fromkeys(s for s in statements if is_query(s)):
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+        checked += 1
+        if not is_filtered(sql):
+            continue
+        subqueries = {line.split()[1] for line in plan if line.startswith(("CO-ROUTINE", "MATERIALIZE"))}
+        for line in plan:
+            if line.startswith("SCAN") and not any(allowed.search(line) for allowed in ALLOWED_SCANS) \
+                    and line.split()[1] not in subqueries:
+                problems.append((" ".join(sql.split()), plan))
+                break
+
+    conn.close()
+    return checked, problems
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "plan_check.db")
+        seed(path)
+        from fastapi.testclient import TestClient
+        from app.main import app
+        with traced_database(path) as statements, TestClient(app, raise_server_exceptions=False) as client:
+            statements, failures = capture_statements(client, statements)
+        checked, problems = check_plans(path, statements)
+
+    print(f"Checked {checked} distinct statements from {len(ROUTE_CALLS)} route calls")
+
+    for failure in failures:
+        print(f"  [ERR] {failure}")
+
+    for sql, plan in problems:
+        print(f"  [SCAN] {sql}")
+        for line in plan:
+            print(f"         {line}")
+
+    if failures or problems:
+        sys.exit(1)
+    print("All filtered queries use an index.")
+
+
+if __name__ == "__main__":
+    main()
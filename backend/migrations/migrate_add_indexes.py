@@ -0,0 +1,52 @@
+"""
+Migration script to add the secondary indexes from schema.sql to an existing database
+Safe to re-run - every index is created with IF NOT EXISTS
+"""
+import sqlite3
+import os
+
+# Get the correct path to the database and schema
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(BACKEND_DIR, "pickle.db")
+SCHEMA_PATH = os.path.join(BACKEND_DIR, "app", "schema.sql")
+
+
+def index_statements():
+    """Pull the CREATE INDEX statements out of schema.sql so the two never drift"""
+    with open(SCHEMA_PATH, 'r') as f:
+        return [line.strip() for line in f if line.startswith("CREATE INDEX")]
+
+
+def migrate():
+    print(f"Connecting to database at: {DB_PATH}")
+
+    if not os.path.exists(DB_PATH):
+        print("Database not found. Please run the backend first to create the database.")
+        return
+
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+
+    try:
+        for statement in index_statements():
+            name = statement.split(' ON ')[0].split()[-1]
+            try:
+                cursor.execute(statement)
+                print(f"  [OK] {name}")
+            except sqlite3.OperationalError as e:
+                # Tables added after this database was created come from schema.sql on the next startup
+                print(f"  [SKIP] {name}: {e}")
+
+        # Refresh planner statistics so the new indexes get picked up
+        cursor.execute("ANALYZE")
+        conn.commit()
+        print("\nMigration completed successfully!")
+    except Exception as e:
+        print(f"Error during migration: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    migrate()
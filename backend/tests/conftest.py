@@ -0,0 +1,39 @@
+import os
+import sys
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import app.db as db
+
+
+@pytest.fixture(scope="session")
+def client(tmp_path_factory):
+    """TestClient against an empty database built from schema.sql, shared by the whole run.
+
+    The pool and writer open their connections lazily, so pointing DB_NAME
+    elsewhere before the first request keeps pickle.db untouched.
+    """
+    db.DB_NAME = str(tmp_path_factory.mktemp("db") / "pickle.db")
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+
+@pytest.fixture
+def team_id(client):
+    """A fresh team, so tests never see each other's players or stats"""
+    return db.writer.execute("INSERT INTO teams (name) VALUES ('Test team')").lastrowid
+
+
+@pytest.fixture
+def make_player(team_id):
+    def make(first="Test", last="Player", jersey_number=None):
+        return db.writer.execute(
+            "INSERT INTO players (team_id, first_name, last_name, jersey_number) VALUES (?, ?, ?, ?)",
+            (team_id, first, last, jersey_number)
+        ).lastrowid
+    return make
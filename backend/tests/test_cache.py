@@ -0,0 +1,51 @@
+import app.db as db
+from app.cache import LRUCache
+from app.routes.drills import drill_cache
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache("cache_test", max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    stats = cache.stats()
+    assert (stats["size"], stats["evictions"], stats["hits"], stats["misses"]) == (2, 1, 3, 1)
+
+
+def test_set_after_an_invalidation_is_dropped():
+    cache = LRUCache("cache_test", max_size=4)
+    generation = cache.generation()
+    # A write invalidates while the reader is still querying; its result may predate the write
+    cache.invalidate("other")
+    cache.set("key", "stale", generation)
+    assert cache.get("key") is None
+
+    generation = cache.generation()
+    cache.set("key", "fresh", generation)
+    assert cache.get("key") == "fresh"
+
+
+def test_clear_and_update_also_move_the_generation():
+    cache = LRUCache("cache_test", max_size=4)
+    for change in (cache.clear, lambda: cache.update("key", str), lambda: cache.update_all(str)):
+        generation = cache.generation()
+        change()
+        cache.set("key", 1, generation)
+        assert cache.get("key") is None
+
+
+def test_drill_list_is_keyed_by_table_version(client):
+    assert client.get("/api/drills").status_code == 200
+    # Written straight to the table, so nothing invalidates drill_cache - only the drills version moves
+    drill_id = db.writer.execute(
+        "INSERT INTO drills (title, skill_focus, created_by) VALUES ('Version keyed', 'hitting', 1)"
+    ).lastrowid
+    assert drill_id in [drill["id"] for drill in client.get("/api/drills").json()]
+
+    assert client.get(f"/api/drills/{drill_id}").json()["title"] == "Version keyed"
+    db.writer.execute("UPDATE drills SET title = 'Renamed' WHERE id = ?", (drill_id,))
+    assert client.get(f"/api/drills/{drill_id}").json()["title"] == "Renamed"
+    assert drill_cache.stats()["size"] > 0
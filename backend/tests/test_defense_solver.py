@@ -0,0 +1,62 @@
+from app.defense_solver import POSITIONS, DefenseRequest, FieldingPlayer, solve_defense
+
+
+def everywhere(player_id, score=1.0):
+    return FieldingPlayer(player_id=player_id, scores={pos: score for pos in POSITIONS})
+
+
+def test_large_roster_has_no_bench_limit_by_default():
+    # 20 players and 9 spots: someone has to sit two innings running
+    players = [everywhere(i, 1 + i / 100) for i in range(20)]
+    result = solve_defense(DefenseRequest(players=players, innings=3))
+    assert len(result["innings"]) == 3
+    for inning in result["innings"]:
+        assert len(inning["bench"]) == 11
+
+
+def catchers_only_case():
+    # Nine players who can play anywhere, and two who can only catch, both weaker catchers than anyone
+    players = [everywhere(i, 1 + i / 10) for i in range(9)]
+    return players + [FieldingPlayer(player_id=10, scores={"C": 0.5}), FieldingPlayer(player_id=11, scores={"C": 0.4})]
+
+
+def test_backtracks_when_an_inning_leaves_the_next_one_stuck():
+    # Benching both catch-only players in inning 1 (the best single inning) would force both to catch in inning 2
+    result = solve_defense(DefenseRequest(players=catchers_only_case(), innings=3, max_consecutive_bench=1))
+    benches = [set(inning["bench"]) for inning in result["innings"]]
+    assert len(benches) == 3
+    for earlier, later in zip(benches, benches[1:]):
+        assert not earlier & later
+    catchers = [inning["positions"]["C"] for inning in result["innings"]]
+    assert {10, 11} & set(catchers)
+
+
+def test_takes_each_innings_best_assignment_when_nothing_has_to_be_undone():
+    players = [everywhere(i, 1 + i / 10) for i in range(11)]
+    result = solve_defense(DefenseRequest(players=players, innings=2))
+    best = sum(1 + i / 10 for i in range(2, 11))
+    assert [inning["score"] for inning in result["innings"]] == [round(best, 4)] * 2
+    assert all(sorted(inning["bench"]) == [0, 1] for inning in result["innings"])
+
+
+def test_position_caps_are_respected():
+    players = [everywhere(i, 1 + i / 10) for i in range(12)]
+    result = solve_defense(DefenseRequest(players=players, innings=6, max_innings_at_position={"P": 2}))
+    pitchers = [inning["positions"]["P"] for inning in result["innings"]]
+    assert max(pitchers.count(p) for p in pitchers) <= 2
+
+
+def test_impossible_rotation_is_rejected(client):
+    # Two catchers, each allowed one inning behind the plate, can't cover three innings
+    players = [{"player_id": i, "scores": {pos: 1 for pos in POSITIONS if pos != "C"}} for i in range(9)]
+    players += [{"player_id": 10, "scores": {"C": 1}}, {"player_id": 11, "scores": {"C": 1}}]
+    response = client.post("/api/lineups/defense", json={
+        "players": players, "innings": 3, "max_innings_at_position": {"C": 1},
+    })
+    assert response.status_code == 400
+
+
+def test_too_many_players_for_the_bench_limit(client):
+    players = [{"player_id": i, "scores": {pos: 1 for pos in POSITIONS}} for i in range(19)]
+    response = client.post("/api/lineups/defense", json={"players": players, "innings": 2, "max_consecutive_bench": 1})
+    assert response.status_code == 400
@@ -0,0 +1,68 @@
+import asyncio
+import json
+import time
+import httpx
+import pytest
+import app.db as db
+from app.main import app
+from app.http_client import get_http_client
+from app.routes import equipment
+from app.search_cache import cache_key, normalize_query
+
+STALE_RESULTS = [{"title": "Cached bat", "link": "https://www.justbats.com/bat", "display_link": "www.justbats.com"}]
+
+
+@pytest.fixture
+def google(monkeypatch):
+    """Route the web search to `pages`, a {start index: async handler} map standing in for Google"""
+    pages = {}
+
+    async def handler(request):
+        return await pages[int(request.url.params["start"])]()
+
+    monkeypatch.setenv("GOOGLE_API_KEY", "test")
+    monkeypatch.setenv("GOOGLE_SEARCH_ENGINE_ID", "test")
+    monkeypatch.setattr(equipment, "WEB_SEARCH_BUDGET", 0.3)
+    app.dependency_overrides[get_http_client] = lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    yield pages
+    del app.dependency_overrides[get_http_client]
+
+
+def status(code):
+    async def respond():
+        return httpx.Response(code, json={"items": []})
+    return respond
+
+
+async def too_slow():
+    await asyncio.sleep(2)
+    return httpx.Response(200, json={"items": []})
+
+
+def store_stale(query):
+    key = cache_key("equipment_web", q=normalize_query(query), pages=equipment.WEB_SEARCH_PAGES)
+    payload = json.dumps({"results": STALE_RESULTS, "dropped_pages": []})
+    db.writer.execute(
+        "INSERT OR REPLACE INTO search_cache (cache_key, payload, fetched_at, expires_at) VALUES (?, ?, ?, ?)",
+        (key, payload, time.time() - 100, time.time() - 10)
+    )
+
+
+def test_quota_error_on_a_later_page_serves_stale(client, google):
+    # Page 1 times out (504) and page 11 is out of quota: the 429 decides, so the expired entry is served
+    google[1] = too_slow
+    google[11] = status(429)
+    store_stale("stale quota bat")
+    response = client.get("/api/equipment/search/web", params={"query": "stale quota bat"})
+    assert response.status_code == 200
+    assert response.json() == STALE_RESULTS
+
+
+def test_fallback_names_only_the_pages_that_failed(client, google):
+    # Page 1 answers (with nothing from a trusted site), page 11 fails
+    google[1] = status(200)
+    google[11] = status(500)
+    response = client.get("/api/equipment/search/web", params={"query": "no trusted glove"})
+    assert response.status_code == 200
+    assert response.headers["X-Dropped-Pages"] == "11"
+    assert all(item["title"].startswith("no trusted glove at ") for item in response.json())
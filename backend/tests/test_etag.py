@@ -0,0 +1,29 @@
+def test_unchanged_list_is_answered_with_304(client):
+    first = client.get("/api/equipment")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    again = client.get("/api/equipment", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["ETag"] == etag
+
+    # Any tag in a list, or *, matches too
+    assert client.get("/api/equipment", headers={"If-None-Match": f'"other", {etag}'}).status_code == 304
+    assert client.get("/api/equipment", headers={"If-None-Match": "*"}).status_code == 304
+
+
+def test_write_changes_the_etag(client):
+    etag = client.get("/api/equipment").headers["ETag"]
+    created = client.post("/api/equipment", json={"title": "ETag bat", "link": "https://example.com/etag"})
+    assert created.status_code == 200
+
+    after = client.get("/api/equipment", headers={"If-None-Match": etag})
+    assert after.status_code == 200
+    assert after.headers["ETag"] != etag
+    assert created.json()["id"] in [item["id"] for item in after.json()]
+    assert client.get("/api/equipment", headers={"If-None-Match": after.headers["ETag"]}).status_code == 304
+
+
+def test_etag_depends_on_the_query(client):
+    assert client.get("/api/equipment").headers["ETag"] != client.get("/api/equipment?limit=5").headers["ETag"]
@@ -0,0 +1,23 @@
+import asyncio
+import httpx
+from app.http_client import MeteredTransport, create_http_client
+
+
+def test_stats_come_from_the_clients_own_transport():
+    async def run():
+        client, transport = create_http_client(httpx.MockTransport(lambda request: httpx.Response(200)))
+        try:
+            for _ in range(3):
+                await client.get("https://upstream.test/")
+            return transport
+        finally:
+            await client.aclose()
+
+    transport = asyncio.run(run())
+    assert isinstance(transport, MeteredTransport)
+    assert transport.stats()["requests"] == 3
+
+
+def test_health_endpoint_reports_the_shared_client(client):
+    stats = client.get("/api/health/http").json()
+    assert {"requests", "connections_reused", "in_flight", "max_per_host"} <= set(stats)
@@ -0,0 +1,123 @@
+import random
+import pytest
+import app.db as db
+
+SEASON = 2031
+
+
+def add_line(client, player_id, game_number, season=SEASON, **counts):
+    response = client.post("/api/stats/games", json={
+        "player_id": player_id, "game_date": f"{season}-05-01", "game_number": game_number, **counts,
+    })
+    assert response.status_code == 200
+
+
+def random_counts(rng):
+    pa = rng.randint(0, 5)
+    bb = rng.randint(0, pa)
+    ab = pa - bb
+    h = rng.randint(0, ab)
+    return {"pa": pa, "ab": ab, "h": h, "bb": bb, "hr": rng.randint(0, h), "rbi": rng.randint(0, 3)}
+
+
+@pytest.fixture(scope="module")
+def league(client):
+    """Two teams' season totals in SEASON, by player id, built from random game lines"""
+    rng = random.Random(23)
+    teams = [db.writer.execute("INSERT INTO teams (name) VALUES ('Leaderboard team')").lastrowid for _ in range(2)]
+    totals = {}
+    for i in range(30):
+        team = teams[i % 2]
+        player_id = db.writer.execute(
+            "INSERT INTO players (team_id, first_name, last_name) VALUES (?, 'Lead', ?)", (team, str(i))
+        ).lastrowid
+        total = {"team_id": team, "pa": 0, "ab": 0, "h": 0, "bb": 0, "hr": 0, "rbi": 0}
+        # Few short games, so ties on the stat (and on PA) are common
+        for game in range(1, rng.randint(1, 4) + 1):
+            counts = random_counts(rng)
+            add_line(client, player_id, game, **counts)
+            for column, value in counts.items():
+                total[column] += value
+        totals[player_id] = total
+    return teams, totals
+
+
+def value(stat, total):
+    if stat == "ba":
+        return total["h"] * 1.0 / total["ab"] if total["ab"] else None
+    return total[stat]
+
+
+def ranking(totals, stat, team_id=None, min_pa=0):
+    """Player ids in leaderboard order, computed the slow way"""
+    ranked = [
+        player_id for player_id, total in totals.items()
+        if (team_id is None or total["team_id"] == team_id)
+        and value(stat, total) is not None and total["pa"] >= min_pa
+    ]
+    return sorted(ranked, key=lambda p: (value(stat, totals[p]), totals[p]["pa"], p), reverse=True)
+
+
+def leaderboard(client, **params):
+    response = client.get("/api/stats/leaderboard", params={"season": SEASON} | params)
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.mark.parametrize("stat", ["ba", "hr", "rbi"])
+@pytest.mark.parametrize("min_pa", [0, 6])
+def test_top_k_matches_sorting_everyone(client, league, stat, min_pa):
+    teams, totals = league
+    result = leaderboard(client, stat=stat, limit=8, min_pa=min_pa)
+    assert [leader["player_id"] for leader in result["leaders"]] == ranking(totals, stat, min_pa=min_pa)[:8]
+    assert [leader["rank"] for leader in result["leaders"]] == list(range(1, len(result["leaders"]) + 1))
+
+
+@pytest.mark.parametrize("stat", ["ba", "rbi"])
+def test_team_leaderboard_only_ranks_that_team(client, league, stat):
+    teams, totals = league
+    result = leaderboard(client, stat=stat, team_id=teams[1], limit=50)
+    assert [leader["player_id"] for leader in result["leaders"]] == ranking(totals, stat, teams[1])
+    assert {leader["team_id"] for leader in result["leaders"]} == {teams[1]}
+
+
+@pytest.mark.parametrize("stat", ["ba", "hr"])
+@pytest.mark.parametrize("team", [None, 0])
+def test_player_rank_is_position_in_the_full_order(client, league, stat, team):
+    teams, totals = league
+    team_id = None if team is None else teams[team]
+    order = ranking(totals, stat, team_id, min_pa=3)
+    for player_id, total in totals.items():
+        if team_id is not None and total["team_id"] != team_id:
+            continue
+        params = {"stat": stat, "limit": 1, "min_pa": 3, "player_id": player_id}
+        if team_id is not None:
+            params["team_id"] = team_id
+        player = leaderboard(client, **params)["player"]
+        expected = order.index(player_id) + 1 if player_id in order else None
+        assert player["rank"] == expected
+        assert player["pa"] == total["pa"]
+
+
+def test_unranked_players_get_no_rank(client, make_player):
+    # A season of its own, so the league above stays as built
+    no_at_bats = make_player()
+    add_line(client, no_at_bats, 1, season=SEASON - 1, pa=2, bb=2)
+    params = {"season": SEASON - 1, "player_id": no_at_bats}
+    assert leaderboard(client, stat="ba", **params)["player"]["rank"] is None
+    assert leaderboard(client, stat="hr", **params)["player"]["rank"] == 1
+    assert leaderboard(client, stat="hr", min_pa=3, **params)["player"]["rank"] is None
+
+
+def test_player_without_stats_is_not_found(client, league, make_player):
+    teams, totals = league
+    response = client.get("/api/stats/leaderboard", params={
+        "stat": "ba", "season": SEASON, "player_id": make_player(),
+    })
+    assert response.status_code == 404
+    # On the wrong team too
+    player_id = next(p for p, total in totals.items() if total["team_id"] == teams[0])
+    response = client.get("/api/stats/leaderboard", params={
+        "stat": "ba", "season": SEASON, "team_id": teams[1], "player_id": player_id,
+    })
+    assert response.status_code == 404
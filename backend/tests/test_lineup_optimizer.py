@@ -0,0 +1,110 @@
+import itertools
+import random
+import pytest
+from fastapi import HTTPException
+from app.lineup_optimizer import (
+    CandidateGenerator, PlayerStats, RosterPlayer, ScoreLineupsRequest, SlotLock,
+    lineup_score, optimize_lineup, rcv, score_lineups, slot_weight,
+)
+
+
+def roster(size, seed=0):
+    rng = random.Random(seed)
+    return [
+        RosterPlayer(player_id=i, stats=PlayerStats(
+            obp=round(rng.uniform(.2, .5), 3), slg=round(rng.uniform(.2, .7), 3), ba=round(rng.uniform(.15, .4), 3),
+            rbi=rng.randint(0, 20), games=rng.randint(1, 20), qab=round(rng.uniform(.2, .7), 3),
+        ))
+        for i in range(size)
+    ]
+
+
+def brute_force(players, size, fixed=None):
+    fixed = fixed or {}
+    scores = {p.player_id: rcv(p.stats) for p in players}
+    best = -1.0
+    for order in itertools.permutations(scores, size):
+        if all(order[slot] == pid for slot, pid in fixed.items()):
+            best = max(best, sum(slot_weight(s) * scores[pid] for s, pid in enumerate(order)))
+    return round(best, 4)
+
+
+def test_rcv_rounds_like_to_fixed():
+    # 1 RBI in 8 games is exactly 0.125: toFixed(2) rounds it up, Python's round() to even would give 0.12
+    assert rcv(PlayerStats(rbi=1, games=8)) == 0.13
+    # 0.35 * .1 + 0.25 * .1 + 0.15 * .1 is just under 0.075 in binary, so toFixed(2) gives 0.07
+    assert rcv(PlayerStats(obp=.1, slg=.1, ba=.1)) == 0.07
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_optimum_matches_brute_force(seed):
+    players = roster(7, seed)
+    result = optimize_lineup(players, lineup_size=5)
+    assert result["score"] == brute_force(players, 5)
+    assert len(result["lineup"]) == 5
+    assert sorted([p["player_id"] for p in result["lineup"]] + result["bench"]) == list(range(7))
+
+
+def test_locked_slots_are_kept_and_the_rest_optimized():
+    players = roster(7, 11)
+    locked = [SlotLock(player_id=6, batting_order=1), SlotLock(player_id=0, batting_order=4)]
+    result = optimize_lineup(players, lineup_size=5, locked=locked)
+    assert result["lineup"][0]["player_id"] == 6
+    assert result["lineup"][3]["player_id"] == 0
+    assert result["score"] == brute_force(players, 5, {0: 6, 3: 0})
+
+
+def test_nine_player_lineup_from_a_full_roster():
+    result = optimize_lineup(roster(15, 3))
+    assert len(result["lineup"]) == 9
+    assert len(result["bench"]) == 6
+
+
+@pytest.mark.parametrize("locked, detail", [
+    ([SlotLock(player_id=99, batting_order=1)], "not on the roster"),
+    ([SlotLock(player_id=1, batting_order=10)], "Batting order must be between"),
+    ([SlotLock(player_id=1, batting_order=1), SlotLock(player_id=2, batting_order=1)], "locked more than once"),
+])
+def test_bad_locks_are_rejected(locked, detail):
+    with pytest.raises(HTTPException) as error:
+        optimize_lineup(roster(9), locked=locked)
+    assert error.value.status_code == 400
+    assert detail in error.value.detail
+
+
+def test_listed_candidates_are_ranked_with_ties_in_submission_order():
+    players = roster(9, 4)
+    scores = {p.player_id: rcv(p.stats) for p in players}
+    base = list(range(9))
+    candidates = [base, list(reversed(base)), base[1:] + base[:1], base]
+    result = score_lineups(ScoreLineupsRequest(players=players, candidates=candidates, top_k=4))
+    assert result["evaluated"] == 4
+    expected = sorted(range(4), key=lambda i: (-round(lineup_score(candidates[i], scores), 4), i))
+    assert [entry["order"] for entry in result["top"]] == [candidates[i] for i in expected]
+
+
+@pytest.mark.parametrize("kind", ["swaps", "bench"])
+def test_generated_candidates_match_scoring_each_one(kind):
+    players = roster(12, 5)
+    scores = {p.player_id: rcv(p.stats) for p in players}
+    base = [7, 2, 9, 0, 4, 11, 1, 5, 3]
+    request = ScoreLineupsRequest(players=players, generate=CandidateGenerator(kind=kind, base=base), top_k=5)
+    result = score_lineups(request)
+
+    if kind == "swaps":
+        expected = 9 * 8 // 2
+    else:
+        expected = 9 * 3
+    assert result["evaluated"] == expected
+    assert result["base_score"] == round(lineup_score(base, scores), 4)
+    for entry in result["top"]:
+        # The O(1) delta score agrees with scoring the built order from scratch
+        assert entry["score"] == round(lineup_score(entry["order"], scores), 4)
+    top_scores = [entry["score"] for entry in result["top"]]
+    assert top_scores == sorted(top_scores, reverse=True)
+
+
+def test_candidates_off_the_roster_are_rejected():
+    with pytest.raises(HTTPException) as error:
+        score_lineups(ScoreLineupsRequest(players=roster(9), candidates=[[0, 1, 99]]))
+    assert error.value.status_code == 400
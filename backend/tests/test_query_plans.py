@@ -0,0 +1,14 @@
+import check_query_plans as plans
+
+
+def test_filtered_queries_use_an_index(client, tmp_path):
+    # Its own seeded database: the plan check needs realistic row counts and the fixed ids its route calls use
+    path = str(tmp_path / "plan_check.db")
+    plans.seed(path)
+    with plans.traced_database(path) as statements:
+        statements, failures = plans.capture_statements(client, statements)
+    assert failures == []
+
+    checked, problems = plans.check_plans(path, statements)
+    assert checked > 0
+    assert [sql for sql, plan in problems] == []
@@ -0,0 +1,130 @@
+import pytest
+from fastapi import HTTPException
+import app.run_simulator as run_simulator
+from app.run_simulator import (
+    MAX_INNING_RUNS, MAX_SIM_GAMES, MAX_SIM_ORDERS, BattingStats, SimPlayer, SimulateRequest, rates, simulate,
+    simulate_chunk,
+)
+
+
+def player(player_id, **stats):
+    return SimPlayer(player_id=player_id, stats=BattingStats(**stats))
+
+
+def roster():
+    # A spread from a strong top of the order to weak bottom hitters
+    return [player(i, pa=40, h=16 - i, bb=4, so=6 + i, xbh=max(0, 6 - i), roe=1, spd=8 - i % 5) for i in range(9)]
+
+
+def test_same_seed_gives_same_results():
+    request = SimulateRequest(players=roster(), games=1500, seed=42)
+    first = simulate(request)
+    second = simulate(request)
+    assert first["seed"] == 42
+    assert first["results"] == second["results"]
+    assert first["plate_appearances"] == second["plate_appearances"]
+
+
+def test_different_seeds_differ():
+    a = simulate(SimulateRequest(players=roster(), games=1500, seed=1))
+    b = simulate(SimulateRequest(players=roster(), games=1500, seed=2))
+    assert a["results"][0]["expected_runs"] != b["results"][0]["expected_runs"]
+
+
+def test_result_depends_only_on_the_seed():
+    # Games are played in seeded chunks, so the run matches playing its one chunk directly
+    players = roster()
+    batters = [rates(p.stats) for p in players]
+    total, _, pas = simulate_chunk(batters, 6, None, 7 * 1_000_003, 500)
+    result = simulate(SimulateRequest(players=players, games=500, seed=7))
+    assert result["results"][0]["expected_runs"] == round(total / 500, 4)
+    assert result["plate_appearances"] == pas
+
+
+def test_orders_ranked_best_first():
+    players = roster()
+    strong_first = [p.player_id for p in players]
+    request = SimulateRequest(players=players, orders=[list(reversed(strong_first)), strong_first], games=4000, seed=3)
+    results = simulate(request)["results"]
+    assert [r["expected_runs"] for r in results] == sorted((r["expected_runs"] for r in results), reverse=True)
+    assert results[0]["order"] == strong_first
+
+
+def test_all_strikeouts_never_score():
+    players = [player(i, pa=10, so=10) for i in range(9)]
+    result = simulate(SimulateRequest(players=players, games=200, innings=6, seed=0))
+    assert result["results"][0]["expected_runs"] == 0
+    assert result["results"][0]["variance"] == 0
+    # Three strikeouts an inning, exactly
+    assert result["plate_appearances"] == 200 * 6 * 3
+
+
+def test_run_rule_caps_each_inning():
+    players = [player(0, pa=10, h=10, xbh=10), player(1, pa=10, so=10)]
+    result = simulate(SimulateRequest(players=players, games=100, innings=3, run_rule=2, seed=0))
+    assert result["results"][0]["expected_runs"] <= 3 * 2
+
+
+def test_order_that_cannot_make_an_out_is_rejected():
+    players = [player(i, pa=2, h=1, bb=1) for i in range(9)]
+    with pytest.raises(HTTPException) as error:
+        simulate(SimulateRequest(players=players, games=10, seed=0))
+    assert error.value.status_code == 400
+    assert "make an out" in error.value.detail
+
+
+def test_nearly_out_free_order_is_rejected():
+    # One strikeout in 1,000 plate appearances passes the never-out check but would play every inning to the cap
+    players = [player(i, pa=1000, h=600, bb=399, so=1) for i in range(9)]
+    with pytest.raises(HTTPException) as error:
+        simulate(SimulateRequest(players=players, games=10, seed=0))
+    assert error.value.status_code == 400
+    assert "make an out" in error.value.detail
+
+
+def test_nearly_out_free_innings_are_called():
+    # One out in 10,000 plate appearances: innings end at the run cap instead of running on
+    batters = [rates(BattingStats(pa=10_000, h=9_999))] * 9
+    total, _, pas = simulate_chunk(batters, 2, None, 0, 2)
+    assert total == 2 * 2 * MAX_INNING_RUNS
+    assert pas <= 2 * 2 * (MAX_INNING_RUNS + 6)
+
+
+def test_oversized_simulation_is_rejected():
+    players = roster()
+    orders = [[p.player_id for p in players]] * MAX_SIM_ORDERS
+    with pytest.raises(HTTPException) as error:
+        simulate(SimulateRequest(players=players, orders=orders, games=MAX_SIM_GAMES, innings=12, seed=0))
+    assert error.value.status_code == 400
+    assert "too large" in error.value.detail
+
+
+def test_worker_pool_gives_the_same_results(monkeypatch):
+    request = SimulateRequest(players=roster(), games=1200, seed=9)
+    inline = simulate(request)
+    monkeypatch.setattr(run_simulator, "SIM_WORKERS", 2)
+    monkeypatch.setattr(run_simulator, "SIM_POOL_MIN_PLATE_APPEARANCES", 0)
+    try:
+        pooled = simulate(request)
+        assert run_simulator._pool is not None
+    finally:
+        run_simulator.shutdown_pool()
+    assert pooled["results"] == inline["results"]
+    assert pooled["plate_appearances"] == inline["plate_appearances"]
+
+
+def test_inconsistent_counts_are_rejected(client):
+    response = client.post("/api/lineups/simulate", json={
+        "players": [{"player_id": 1, "stats": {"pa": 5, "h": 4, "bb": 2}}],
+        "seed": 0,
+    })
+    assert response.status_code == 400
+    assert "exceeds PA" in response.json()["detail"]
+
+
+def test_endpoint_rejects_out_free_order(client):
+    response = client.post("/api/lineups/simulate", json={
+        "players": [{"player_id": i, "stats": {"pa": 2, "h": 1, "bb": 1}} for i in range(9)],
+        "seed": 0,
+    })
+    assert response.status_code == 400
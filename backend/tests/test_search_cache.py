@@ -0,0 +1,127 @@
+import asyncio
+import time
+import httpx
+import pytest
+import app.db as db
+from app.search_cache import SEARCH_CACHE_STALE_TTL, SearchCache
+
+
+class FakeUpstream:
+    """A fetch function that counts its calls, optionally waits for `release`, then returns or raises"""
+
+    def __init__(self, value=None, status=None):
+        self.value = value
+        self.status = status
+        self.calls = 0
+        self.release = None
+
+    async def __call__(self):
+        self.calls += 1
+        if self.release is not None:
+            await self.release.wait()
+        if self.status is not None:
+            request = httpx.Request("GET", "https://upstream.test/search")
+            raise httpx.HTTPStatusError("upstream error", request=request, response=httpx.Response(self.status, request=request))
+        return self.value
+
+
+@pytest.fixture
+def cache(client):
+    return SearchCache(name="search_test")
+
+
+def stored_keys():
+    with db.pool.connection() as conn:
+        return {row[0] for row in conn.execute("SELECT cache_key FROM search_cache")}
+
+
+def test_concurrent_misses_share_one_fetch(cache):
+    upstream = FakeUpstream({"items": [1, 2]})
+
+    async def scenario():
+        upstream.release = asyncio.Event()
+        waiters = [asyncio.create_task(cache.get_or_fetch("coalesce", upstream)) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        upstream.release.set()
+        return await asyncio.gather(*waiters)
+
+    assert asyncio.run(scenario()) == [{"items": [1, 2]}] * 5
+    assert upstream.calls == 1
+    assert cache.stats()["coalesced"] == 4
+    # Now cached: no further upstream calls
+    assert asyncio.run(cache.get_or_fetch("coalesce", upstream)) == {"items": [1, 2]}
+    assert upstream.calls == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_fetch(cache):
+    upstream = FakeUpstream(["value"])
+
+    async def scenario():
+        upstream.release = asyncio.Event()
+        first = asyncio.create_task(cache.get_or_fetch("cancel", upstream))
+        await asyncio.sleep(0.05)
+        second = asyncio.create_task(cache.get_or_fetch("cancel", upstream))
+        await asyncio.sleep(0.01)
+        # The caller that started the fetch goes away
+        first.cancel()
+        await asyncio.sleep(0.01)
+        upstream.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == ["value"]
+    assert upstream.calls == 1
+    assert "cancel" in stored_keys()
+
+
+@pytest.mark.parametrize("status", [403, 429])
+def test_quota_errors_serve_the_expired_entry(client, status):
+    key = f"stale-{status}"
+    # A negative TTL stores the entry already expired
+    asyncio.run(SearchCache(name="search_test", ttl=-1).get_or_fetch(key, FakeUpstream(["old"])))
+    cache = SearchCache(name="search_test")
+    upstream = FakeUpstream(status=status)
+    assert asyncio.run(cache.get_or_fetch(key, upstream)) == ["old"]
+    assert upstream.calls == 1
+    assert cache.stats()["stale_served"] == 1
+
+
+def test_other_errors_are_raised_even_with_an_expired_entry(client):
+    asyncio.run(SearchCache(name="search_test", ttl=-1).get_or_fetch("stale-500", FakeUpstream(["old"])))
+    cache = SearchCache(name="search_test")
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(cache.get_or_fetch("stale-500", FakeUpstream(status=500)))
+    assert cache.stats()["upstream_errors"] == 1
+
+
+def test_quota_error_without_an_entry_is_raised(cache):
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(cache.get_or_fetch("never-fetched", FakeUpstream(status=429)))
+    # The failure isn't remembered: the next call goes upstream again
+    assert asyncio.run(cache.get_or_fetch("never-fetched", FakeUpstream(["fresh"]))) == ["fresh"]
+
+
+def test_values_failing_cache_if_are_not_stored(cache):
+    upstream = FakeUpstream({"partial": True})
+    for _ in range(2):
+        asyncio.run(cache.get_or_fetch("partial", upstream, cache_if=lambda value: not value["partial"]))
+    assert upstream.calls == 2
+    assert "partial" not in stored_keys()
+
+
+def test_entries_past_the_stale_ttl_are_pruned(cache):
+    now = time.time()
+    db.writer.execute(
+        "INSERT OR REPLACE INTO search_cache (cache_key, payload, fetched_at, expires_at) VALUES (?, '[]', ?, ?)",
+        ("ancient", now - 2 * SEARCH_CACHE_STALE_TTL, now - SEARCH_CACHE_STALE_TTL - 60)
+    )
+    db.writer.execute(
+        "INSERT OR REPLACE INTO search_cache (cache_key, payload, fetched_at, expires_at) VALUES (?, '[]', ?, ?)",
+        ("recently-expired", now - 120, now - 60)
+    )
+    asyncio.run(cache.get_or_fetch("prune-trigger", FakeUpstream(["new"])))
+    keys = stored_keys()
+    assert "ancient" not in keys
+    assert {"recently-expired", "prune-trigger"} <= keys
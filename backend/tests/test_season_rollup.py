@@ -0,0 +1,119 @@
+import random
+import app.db as db
+from app.stat_lines import STAT_COLUMNS
+
+SUMS = ", ".join(f"SUM({c})" for c in STAT_COLUMNS)
+TOTALS = ", ".join(STAT_COLUMNS)
+
+
+def rollup_matches_game_lines(player_ids):
+    """True when player_season_stats holds exactly the sums of the players' game lines"""
+    placeholders = ", ".join("?" for _ in player_ids)
+    with db.pool.connection() as conn:
+        summed = conn.execute(
+            f"""SELECT player_id, season, COUNT(*), {SUMS} FROM player_game_stats
+                WHERE player_id IN ({placeholders}) GROUP BY player_id, season ORDER BY player_id, season""",
+            player_ids
+        ).fetchall()
+        rollup = conn.execute(
+            f"""SELECT player_id, season, games, {TOTALS} FROM player_season_stats
+                WHERE player_id IN ({placeholders}) ORDER BY player_id, season""",
+            player_ids
+        ).fetchall()
+    return [tuple(row) for row in summed] == [tuple(row) for row in rollup]
+
+
+def line(player_id, game_date, **counts):
+    return {"player_id": player_id, "game_date": game_date, **counts}
+
+
+def test_insert_update_delete_through_the_api(client, make_player):
+    player = make_player()
+    first = client.post("/api/stats/games", json=line(player, "2025-04-01", pa=4, ab=3, h=2, doubles=1, bb=1, rbi=2, qab=3))
+    second = client.post("/api/stats/games", json=line(player, "2025-04-08", pa=3, ab=3, h=1, hr=1, rbi=1, qab=1))
+    assert first.status_code == second.status_code == 200
+
+    season = client.get(f"/api/stats/players/{player}?season=2025").json()
+    assert season["games"] == 2
+    assert season["totals"]["pa"] == 7 and season["totals"]["h"] == 3 and season["totals"]["xbh"] == 2
+    assert season["rates"]["ba"] == round(3 / 6, 3)
+
+    assert client.put(f"/api/stats/games/{first.json()['id']}", json={"pa": 4, "ab": 4, "h": 0}).status_code == 200
+    season = client.get(f"/api/stats/players/{player}?season=2025").json()
+    assert season["games"] == 2
+    assert season["totals"]["h"] == 1 and season["totals"]["doubles"] == 0 and season["totals"]["rbi"] == 1
+
+    assert client.delete(f"/api/stats/games/{first.json()['id']}").status_code == 200
+    assert client.get(f"/api/stats/players/{player}?season=2025").json()["games"] == 1
+    assert client.delete(f"/api/stats/games/{second.json()['id']}").status_code == 200
+    # The season row goes with its last line
+    assert client.get(f"/api/stats/players/{player}?season=2025").status_code == 404
+    assert rollup_matches_game_lines([player])
+
+
+def test_line_moved_to_another_season_and_player(client, make_player):
+    a, b = make_player("A"), make_player("B")
+    line_id = client.post("/api/stats/games", json=line(a, "2024-06-01", pa=5, ab=4, h=2, bb=1)).json()["id"]
+    client.post("/api/stats/games", json=line(a, "2025-06-01", pa=2, ab=2, h=1))
+
+    db.writer.execute("UPDATE player_game_stats SET game_date = '2025-06-02', season = 2025 WHERE id = ?", (line_id,))
+    assert client.get(f"/api/stats/players/{a}?season=2024").status_code == 404
+    assert client.get(f"/api/stats/players/{a}?season=2025").json()["totals"]["pa"] == 7
+
+    db.writer.execute("UPDATE player_game_stats SET player_id = ? WHERE id = ?", (b, line_id))
+    assert client.get(f"/api/stats/players/{a}?season=2025").json()["games"] == 1
+    assert client.get(f"/api/stats/players/{b}?season=2025").json()["totals"]["pa"] == 5
+    assert rollup_matches_game_lines([a, b])
+
+
+def test_upsert_replaces_a_line_in_the_rollup(client, make_player):
+    # The CSV import re-writes lines with INSERT ... ON CONFLICT DO UPDATE, which fires the update trigger
+    from app.stat_import import UPSERT_LINE
+    player = make_player()
+    values = [player, "2025-05-01", 1, 2025] + [0] * len(STAT_COLUMNS)
+    values[4] = 3  # pa
+    db.writer.execute(UPSERT_LINE, values)
+    values[4] = 5
+    db.writer.execute(UPSERT_LINE, values)
+    season = client.get(f"/api/stats/players/{player}?season=2025").json()
+    assert season["games"] == 1 and season["totals"]["pa"] == 5
+
+
+def test_random_edits_keep_the_rollup_equal_to_the_sums(client, make_player):
+    rng = random.Random(21)
+    players = [make_player(str(i)) for i in range(4)]
+    live = {}
+
+    def random_counts():
+        h = rng.randint(0, 3)
+        ab = h + rng.randint(0, 2)
+        bb = rng.randint(0, 2)
+        return {"pa": ab + bb, "ab": ab, "h": h, "bb": bb, "rbi": rng.randint(0, 3), "qab": rng.randint(0, ab + bb)}
+
+    for step in range(200):
+        action = rng.random()
+        if action < 0.5 or not live:
+            date = f"{rng.choice([2024, 2025])}-0{rng.randint(4, 8)}-{rng.randint(10, 28)}"
+            game_line = line(rng.choice(players), date, game_number=rng.randint(1, 3), **random_counts())
+            response = client.post("/api/stats/games", json=game_line)
+            if response.status_code == 200:
+                live[response.json()["id"]] = game_line
+            else:
+                assert response.status_code == 409
+        elif action < 0.75:
+            line_id = rng.choice(list(live))
+            assert client.put(f"/api/stats/games/{line_id}", json=random_counts()).status_code == 200
+        elif action < 0.85:
+            line_id = rng.choice(list(live))
+            season = rng.choice([2024, 2025])
+            db.writer.execute(
+                """UPDATE OR IGNORE player_game_stats SET player_id = ?, game_date = ?, season = ?
+                   WHERE id = ?""",
+                (rng.choice(players), f"{season}-09-{rng.randint(10, 28)}", season, line_id)
+            )
+        else:
+            line_id = rng.choice(list(live))
+            assert client.delete(f"/api/stats/games/{line_id}").status_code == 200
+            del live[line_id]
+
+    assert rollup_matches_game_lines(players)
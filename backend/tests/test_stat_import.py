@@ -0,0 +1,39 @@
+from pydantic import ValidationError
+from app.stat_import import validation_message
+from app.stat_lines import StatLine
+
+
+def import_csv(client, team_id, body):
+    response = client.post(
+        f"/api/stats/import?team_id={team_id}&game_date=2032-04-01",
+        content=body.encode(), headers={"Content-Type": "text/csv"},
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_row_errors_are_one_short_line_naming_the_column(client, team_id):
+    summary = import_csv(client, team_id, "\n".join([
+        "Number,Last,First,PA,AB,H,BB",
+        "1,Ames,Ann,4,3,x,1",
+        "2,Bell,Bo,4,3,1.5,1",
+        "3,Cole,Cy,4,3,inf,1",
+        "4,Dunn,Di,4,3,4,1",
+        "5,Eng,Ed,4,3,1,1",
+    ]))
+    assert summary["lines"] == 1
+    assert [e["error"] for e in summary["errors"]] == [
+        "H: 'x' is not a count",
+        "H: '1.5' is not a count",
+        "H: 'inf' is not a count",
+        "h exceeds ab",
+    ]
+
+
+def test_validation_message_is_field_and_message():
+    try:
+        StatLine(player_id=1, game_date="2032-04-01", game_number=0, h=-1)
+    except ValidationError as e:
+        message = validation_message(e)
+    assert "\n" not in message
+    assert message.startswith("game_number: ") or message.startswith("h: ")
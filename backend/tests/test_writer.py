@@ -0,0 +1,113 @@
+import sqlite3
+import threading
+from concurrent.futures import Future
+import pytest
+import app.db as db
+from app.db import Writer
+
+
+@pytest.fixture
+def table(client):
+    db.writer.execute("CREATE TABLE IF NOT EXISTS writer_test (value TEXT PRIMARY KEY)")
+    db.writer.execute("DELETE FROM writer_test")
+
+
+@pytest.fixture
+def writer(table):
+    """A writer of its own on the test database, with a long window so submissions land in one batch"""
+    writer = Writer(window=0.2)
+    yield writer
+    writer.close()
+
+
+def stored():
+    with db.pool.connection() as conn:
+        return {row[0] for row in conn.execute("SELECT value FROM writer_test")}
+
+
+def insert(value):
+    return lambda conn: conn.execute("INSERT INTO writer_test (value) VALUES (?)", (value,)).rowcount
+
+
+def test_writes_in_one_window_share_a_transaction(writer):
+    before = writer.stats()["batches"]
+    futures = [writer.submit(insert(str(i))) for i in range(5)]
+    assert [future.result(timeout=5) for future in futures] == [1] * 5
+    stats = writer.stats()
+    assert stats["batches"] == before + 1
+    assert stats["largest_batch"] == 5
+    assert stored() == {"0", "1", "2", "3", "4"}
+
+
+def test_a_failing_op_is_rolled_back_alone(writer):
+    def half_done_then_fails(conn):
+        conn.execute("INSERT INTO writer_test (value) VALUES ('partial')")
+        raise ValueError("bad op")
+
+    good = writer.submit(insert("good"))
+    bad = writer.submit(half_done_then_fails)
+    duplicate = writer.submit(insert("good"))
+    after = writer.submit(insert("after"))
+
+    assert good.result(timeout=5) == 1
+    with pytest.raises(ValueError, match="bad op"):
+        bad.result(timeout=5)
+    with pytest.raises(sqlite3.IntegrityError):
+        duplicate.result(timeout=5)
+    assert after.result(timeout=5) == 1
+    assert stored() == {"good", "after"}
+    assert writer.stats()["failed_commits"] == 0
+
+
+def test_execute_all_is_all_or_nothing(writer):
+    with pytest.raises(sqlite3.IntegrityError):
+        writer.execute_all([
+            ("INSERT INTO writer_test (value) VALUES (?)", ("a",)),
+            ("INSERT INTO writer_test (value) VALUES (?)", ("b",)),
+            ("INSERT INTO writer_test (value) VALUES (?)", ("a",)),
+        ])
+    assert stored() == set()
+
+    results = writer.execute_all([("INSERT INTO writer_test (value) VALUES (?)", (v,)) for v in "ab"])
+    assert [result.rowcount for result in results] == [1, 1]
+    assert stored() == {"a", "b"}
+
+
+def test_close_flushes_queued_writes(table):
+    writer = Writer(window=5)
+    futures = [writer.submit(insert(v)) for v in "xyz"]
+    # Well inside the window: close() has to commit the pending batch, not drop it
+    writer.close()
+    assert all(future.done() for future in futures)
+    assert [future.result() for future in futures] == [1, 1, 1]
+    assert stored() == {"x", "y", "z"}
+
+
+def test_writer_survives_an_unexpected_error(writer):
+    # A future already marked running makes set_running_or_notify_cancel() raise RuntimeError inside the batch
+    broken = Future()
+    broken.set_running_or_notify_cancel()
+    writer.submit(insert("warm-up")).result(timeout=5)
+    writer._queue.put((insert("lost"), broken))
+
+    with pytest.raises(RuntimeError):
+        broken.result(timeout=5)
+    assert writer.stats()["failed_commits"] == 1
+    # The thread is still there to take the next write
+    assert writer.run(insert("next"), timeout=5) == 1
+    assert stored() == {"warm-up", "next"}
+
+
+def test_concurrent_callers_all_get_their_own_result(writer):
+    results = {}
+
+    def call(i):
+        results[i] = writer.execute("INSERT INTO writer_test (value) VALUES (?)", (f"t{i}",)).lastrowid
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 20
+    assert len(stored()) == 20